@@ -1,3 +1,4 @@
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -11,7 +12,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # Import your models and Base
 from app.core.database import Base
-from app.models.models import User, Musician, Venue, Caption, Favorite
+from app.models.models import (
+    User, Musician, Venue, Caption, CaptionHashtag, CaptionObject, CaptionMusician, Favorite,
+    UserAnalytics, UserAnalyticsCount, AnalysisCacheEntry, BatchJob, BatchJobItem
+)
 
 # this is the Alembic Config object
 config = context.config
@@ -23,12 +27,22 @@ if config.config_file_name is not None:
 # Set target metadata for autogenerate
 target_metadata = Base.metadata
 
+# Search indexes kept outside the models (FTS5 tables and their shadow tables on
+# SQLite, pg_trgm indexes on PostgreSQL); autogenerate would report them as removed
+SEARCH_INDEX_NAMES = re.compile(r"^(musicians|venues)_fts(_\w+)?$|^ix_(musicians|venues)_\w+_trgm$")
+
+def include_name(name, type_, parent_names) -> bool:
+    if type_ in ("table", "index"):
+        return not SEARCH_INDEX_NAMES.match(name)
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -47,7 +61,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,56 @@
+"""Per-user analytics rollups, caption language and model
+
+Revision ID: 03b6688e75be
+Revises: f3a10bd95fd5
+Create Date: 2026-10-17 07:10:00.000000
+
+Fill the rollups for existing captions with `python backfill_analytics.py`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '03b6688e75be'
+down_revision = 'f3a10bd95fd5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_all at startup may already have made the tables (not the columns)
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    caption_columns = {column['name'] for column in inspector.get_columns('captions')}
+
+    for name in ('language', 'model'):
+        if name not in caption_columns:
+            op.add_column('captions', sa.Column(name, sa.String(), nullable=True))
+
+    if 'user_analytics' not in tables:
+        op.create_table(
+            'user_analytics',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('total_captions', sa.Integer(), nullable=False),
+            sa.Column('total_caption_chars', sa.Integer(), nullable=False),
+            sa.Column('total_hashtags', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+
+    if 'user_analytics_counts' not in tables:
+        op.create_table(
+            'user_analytics_counts',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('dimension', sa.String(), primary_key=True),
+            sa.Column('value', sa.String(), primary_key=True),
+            sa.Column('count', sa.Integer(), nullable=False)
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('user_analytics_counts')
+    op.drop_table('user_analytics')
+    with op.batch_alter_table('captions') as batch_op:
+        batch_op.drop_column('model')
+        batch_op.drop_column('language')
@@ -0,0 +1,105 @@
+"""Normalized caption hashtags, detected objects and musicians
+
+Revision ID: 1926c0a3e54e
+Revises: 03b6688e75be
+Create Date: 2026-10-17 07:40:00.000000
+
+Backfills the link tables from the JSON columns of existing captions.
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1926c0a3e54e'
+down_revision = '03b6688e75be'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK = 5000
+
+
+def _tag(value):
+    tag = "".join(value.split()).lower()
+    if not tag.strip("#"):
+        return None
+    return tag if tag.startswith("#") else f"#{tag}"
+
+
+def _object(value):
+    return " ".join(value.split()).lower() or None
+
+
+def _musician(value):
+    return " ".join(value.split()).lower() or None
+
+
+# table, value column, index, captions JSON column, normalizer (same rules as app/services/caption_store.py)
+LINK_TABLES = [
+    ('caption_hashtags', 'tag', 'ix_caption_hashtags_user_tag', 'suggested_tags', _tag),
+    ('caption_objects', 'name', 'ix_caption_objects_user_name', 'detected_objects', _object),
+    ('caption_musicians', 'name', 'ix_caption_musicians_user_name', 'musicians', _musician),
+]
+
+
+def _json_list(text):
+    try:
+        values = json.loads(text) if text else []
+    except ValueError:
+        return []
+    return values if isinstance(values, list) else []
+
+
+def _backfill(bind, table, value_column, source_column, normalize):
+    """Link every caption not linked yet (create_all may have made the table and new captions wrote their own links)"""
+    captions = sa.table('captions', sa.column('id'), sa.column('user_id'), sa.column(source_column))
+    links = sa.table(table, sa.column('caption_id'), sa.column('user_id'), sa.column(value_column))
+    last_id = 0
+
+    while True:
+        rows = bind.execute(
+            sa.select(captions.c.id, captions.c.user_id, captions.c[source_column])
+            .where(
+                captions.c.id > last_id,
+                captions.c[source_column].isnot(None),
+                ~sa.exists().where(links.c.caption_id == captions.c.id)
+            )
+            .order_by(captions.c.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not rows:
+            return
+
+        values = []
+        for caption_id, user_id, source in rows:
+            normalized = (normalize(str(value)) for value in _json_list(source) if value is not None)
+            for value in dict.fromkeys(v for v in normalized if v):
+                values.append({'caption_id': caption_id, 'user_id': user_id, value_column: value})
+        if values:
+            bind.execute(links.insert(), values)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    for table, value_column, index, source_column, normalize in LINK_TABLES:
+        if table not in tables:
+            op.create_table(
+                table,
+                sa.Column('caption_id', sa.Integer(), sa.ForeignKey('captions.id', ondelete='CASCADE'), primary_key=True),
+                sa.Column(value_column, sa.String(), primary_key=True),
+                sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False)
+            )
+            op.create_index(index, table, ['user_id', value_column, 'caption_id'])
+        _backfill(bind, table, value_column, source_column, normalize)
+
+
+def downgrade() -> None:
+    for table, _, index, _, _ in reversed(LINK_TABLES):
+        op.drop_index(index, table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,104 @@
+"""Search indexes for musicians and venues
+
+Revision ID: 40bec7aef42e
+Revises: 1926c0a3e54e
+Create Date: 2026-10-17 08:10:00.000000
+
+pg_trgm GIN indexes on Postgres, FTS5 tables and sync triggers on SQLite.
+The DDL is idempotent: the API runs the same statements at startup.
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40bec7aef42e'
+down_revision = '1926c0a3e54e'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+TRIGRAM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_musicians_name_trgm ON musicians USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_musicians_instrument_trgm ON musicians USING gin (instrument gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_musicians_style_trgm ON musicians USING gin (style gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_venues_name_trgm ON venues USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_venues_city_trgm ON venues USING gin (city gin_trgm_ops)",
+]
+
+TRIGRAM_INDEXES = [
+    'ix_musicians_name_trgm', 'ix_musicians_instrument_trgm', 'ix_musicians_style_trgm',
+    'ix_venues_name_trgm', 'ix_venues_city_trgm',
+]
+
+FTS5_DDL = {
+    'musicians': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS musicians_fts USING fts5("
+        "name, instrument, style, content='musicians', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS musicians_fts_insert AFTER INSERT ON musicians BEGIN "
+        "INSERT INTO musicians_fts(rowid, name, instrument, style) VALUES (new.id, new.name, new.instrument, new.style); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS musicians_fts_delete AFTER DELETE ON musicians BEGIN "
+        "INSERT INTO musicians_fts(musicians_fts, rowid, name, instrument, style) "
+        "VALUES ('delete', old.id, old.name, old.instrument, old.style); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS musicians_fts_update AFTER UPDATE ON musicians BEGIN "
+        "INSERT INTO musicians_fts(musicians_fts, rowid, name, instrument, style) "
+        "VALUES ('delete', old.id, old.name, old.instrument, old.style); "
+        "INSERT INTO musicians_fts(rowid, name, instrument, style) VALUES (new.id, new.name, new.instrument, new.style); "
+        "END",
+    ],
+    'venues': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS venues_fts USING fts5("
+        "name, city, content='venues', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS venues_fts_insert AFTER INSERT ON venues BEGIN "
+        "INSERT INTO venues_fts(rowid, name, city) VALUES (new.id, new.name, new.city); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS venues_fts_delete AFTER DELETE ON venues BEGIN "
+        "INSERT INTO venues_fts(venues_fts, rowid, name, city) VALUES ('delete', old.id, old.name, old.city); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS venues_fts_update AFTER UPDATE ON venues BEGIN "
+        "INSERT INTO venues_fts(venues_fts, rowid, name, city) VALUES ('delete', old.id, old.name, old.city); "
+        "INSERT INTO venues_fts(rowid, name, city) VALUES (new.id, new.name, new.city); "
+        "END",
+    ],
+}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        try:
+            with bind.begin_nested():
+                for statement in TRIGRAM_DDL:
+                    op.execute(statement)
+        except sa.exc.DBAPIError as e:
+            # e.g. pg_trgm not allowed: search falls back to ILIKE scans
+            logger.warning("Trigram indexes not created: %s", e)
+    elif bind.dialect.name == 'sqlite':
+        for table, statements in FTS5_DDL.items():
+            exists = bind.execute(
+                sa.text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': f'{table}_fts'}
+            ).first()
+            for statement in statements:
+                op.execute(statement)
+            if not exists:
+                # Index the rows written before the triggers existed
+                op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for index in TRIGRAM_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {index}")
+    elif bind.dialect.name == 'sqlite':
+        for table in FTS5_DDL:
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
@@ -0,0 +1,61 @@
+"""Batch caption jobs and their items
+
+Revision ID: 6ec0609cef15
+Revises: c38df876bd13
+Create Date: 2026-10-17 05:53:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6ec0609cef15'
+down_revision = 'c38df876bd13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_all at startup may already have made the tables
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'batch_jobs' not in tables:
+        op.create_table(
+            'batch_jobs',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('total_items', sa.Integer(), nullable=False),
+            sa.Column('completed_items', sa.Integer(), nullable=False),
+            sa.Column('failed_items', sa.Integer(), nullable=False),
+            sa.Column('options', sa.Text()),
+            sa.Column('error', sa.Text()),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True)),
+            sa.Column('finished_at', sa.DateTime(timezone=True))
+        )
+        op.create_index('ix_batch_jobs_user_id', 'batch_jobs', ['user_id'])
+
+    if 'batch_job_items' not in tables:
+        op.create_table(
+            'batch_job_items',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('job_id', sa.String(), sa.ForeignKey('batch_jobs.id'), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('filename', sa.String(), nullable=False),
+            sa.Column('content_type', sa.String()),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('caption_text', sa.Text()),
+            sa.Column('hashtags', sa.Text()),
+            sa.Column('analysis', sa.Text()),
+            sa.Column('error', sa.Text()),
+            sa.Column('finished_at', sa.DateTime(timezone=True))
+        )
+        op.create_index('ix_batch_job_items_id', 'batch_job_items', ['id'])
+        op.create_index('ix_batch_job_items_job_id', 'batch_job_items', ['job_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('batch_job_items')
+    op.drop_table('batch_jobs')
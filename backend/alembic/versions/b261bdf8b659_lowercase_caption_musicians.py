@@ -0,0 +1,70 @@
+"""Case-fold caption musician links
+
+Revision ID: b261bdf8b659
+Revises: 40bec7aef42e
+Create Date: 2026-10-17 09:30:00.000000
+
+Musician links are now lowercased like objects; links written before that
+are folded, dropping the ones that collide with an existing lowercase link.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b261bdf8b659'
+down_revision = '40bec7aef42e'
+branch_labels = None
+depends_on = None
+
+CHUNK = 5000
+
+
+def _musician(value):
+    # Same rule as normalize_musician in app/services/caption_store.py
+    return " ".join(value.split()).lower() or None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    links = sa.table('caption_musicians', sa.column('caption_id'), sa.column('user_id'), sa.column('name'))
+    last_id = 0
+
+    while True:
+        caption_ids = bind.execute(
+            sa.select(links.c.caption_id).distinct()
+            .where(links.c.caption_id > last_id)
+            .order_by(links.c.caption_id)
+            .limit(CHUNK)
+        ).scalars().all()
+        if not caption_ids:
+            return
+
+        rows = bind.execute(
+            sa.select(links.c.caption_id, links.c.user_id, links.c.name)
+            .where(links.c.caption_id.in_(caption_ids))
+        ).all()
+        existing = {(caption_id, name) for caption_id, _, name in rows}
+        stale, folded = [], {}
+        for caption_id, user_id, name in rows:
+            value = _musician(name)
+            if value == name:
+                continue
+            stale.append((caption_id, name))
+            if value and (caption_id, value) not in existing:
+                folded[(caption_id, value)] = user_id
+
+        for caption_id, name in stale:
+            bind.execute(links.delete().where(links.c.caption_id == caption_id, links.c.name == name))
+        if folded:
+            bind.execute(links.insert(), [
+                {'caption_id': caption_id, 'user_id': user_id, 'name': name}
+                for (caption_id, name), user_id in folded.items()
+            ])
+        last_id = caption_ids[-1]
+
+
+def downgrade() -> None:
+    # The original casing is not kept
+    pass
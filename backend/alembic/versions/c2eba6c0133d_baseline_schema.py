@@ -0,0 +1,107 @@
+"""Baseline schema: users, musicians, venues, captions, favorites
+
+Revision ID: c2eba6c0133d
+Revises:
+Create Date: 2026-10-17 05:45:00.000000
+
+The tables as create_all made them before migrations were introduced.
+Databases that already have them just record this revision.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2eba6c0133d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('username', sa.String(), nullable=False),
+            sa.Column('hashed_password', sa.String(), nullable=False),
+            sa.Column('full_name', sa.String()),
+            sa.Column('is_active', sa.Boolean()),
+            sa.Column('is_superuser', sa.Boolean()),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True))
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    if 'musicians' not in tables:
+        op.create_table(
+            'musicians',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('instrument', sa.String(), nullable=False),
+            sa.Column('style', sa.String(), nullable=False),
+            sa.Column('bio', sa.Text()),
+            sa.Column('image_url', sa.String()),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True))
+        )
+        op.create_index('ix_musicians_id', 'musicians', ['id'])
+        op.create_index('ix_musicians_name', 'musicians', ['name'])
+
+    if 'venues' not in tables:
+        op.create_table(
+            'venues',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('city', sa.String(), nullable=False),
+            sa.Column('type', sa.String(), nullable=False),
+            sa.Column('address', sa.String()),
+            sa.Column('description', sa.Text()),
+            sa.Column('website', sa.String()),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True))
+        )
+        op.create_index('ix_venues_id', 'venues', ['id'])
+        op.create_index('ix_venues_name', 'venues', ['name'])
+
+    if 'captions' not in tables:
+        op.create_table(
+            'captions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('caption_text', sa.Text(), nullable=False),
+            sa.Column('media_filename', sa.String()),
+            sa.Column('media_url', sa.String()),
+            sa.Column('detected_objects', sa.Text()),
+            sa.Column('suggested_tags', sa.Text()),
+            sa.Column('confidence', sa.Float()),
+            sa.Column('musicians', sa.Text()),
+            sa.Column('venue', sa.String()),
+            sa.Column('style', sa.String()),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('ix_captions_id', 'captions', ['id'])
+
+    if 'favorites' not in tables:
+        op.create_table(
+            'favorites',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('caption_id', sa.Integer(), sa.ForeignKey('captions.id'), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('ix_favorites_id', 'favorites', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('favorites')
+    op.drop_table('captions')
+    op.drop_table('venues')
+    op.drop_table('musicians')
+    op.drop_table('users')
@@ -0,0 +1,38 @@
+"""Analysis cache table
+
+Revision ID: c38df876bd13
+Revises: c2eba6c0133d
+Create Date: 2026-10-17 05:45:10.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c38df876bd13'
+down_revision = 'c2eba6c0133d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_all at startup may already have made it
+    if 'analysis_cache' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'analysis_cache',
+        sa.Column('cache_key', sa.String(), primary_key=True),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('analysis', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False)
+    )
+    op.create_index('ix_analysis_cache_created_at', 'analysis_cache', ['created_at'])
+    op.create_index('ix_analysis_cache_expires_at', 'analysis_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('analysis_cache')
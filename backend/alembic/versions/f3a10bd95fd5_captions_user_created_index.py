@@ -0,0 +1,33 @@
+"""Composite index for keyset pagination of caption history
+
+Revision ID: f3a10bd95fd5
+Revises: 6ec0609cef15
+Create Date: 2026-10-17 06:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a10bd95fd5'
+down_revision = '6ec0609cef15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built without locking out writes on Postgres; databases created by
+    # create_all at startup may already have it
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_captions_user_created_id',
+            'captions',
+            ['user_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_captions_user_created_id', table_name='captions', if_exists=True)
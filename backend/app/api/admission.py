@@ -0,0 +1,125 @@
+"""
+Admission control for AI endpoints
+Works out which providers a request will call and who is calling before the
+handler runs, and holds the provider slots until the response (streams
+included) has been sent. Batch jobs only spend a token here; their items take
+slots from the same controller as they run
+"""
+import math
+from collections import Counter
+from typing import List
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.services.admission import admission_controller, AdmissionRejected
+from app.services.ai_service import AIModel
+from app.services.model_router import model_router, ANALYZE, GENERATE
+
+# Provider calls per route: (phase, query parameter choosing the models, default models)
+# Several models in one phase run at the same time and take one slot each
+AI_ROUTE_MODELS = {
+    "/analyze-media": [(ANALYZE, None, (AIModel.GPT4_VISION,))],
+    "/analyze-and-generate": [(ANALYZE, None, (AIModel.GPT4_VISION,)), (GENERATE, None, (AIModel.GPT4,))],
+    "/generate-caption": [(GENERATE, None, (AIModel.GPT4,))],
+    "/ai/analyze-advanced": [(ANALYZE, "model", (AIModel.GPT4_VISION,))],
+    "/ai/generate-styled-caption": [(GENERATE, "model", (AIModel.GPT4,))],
+    "/ai/generate-styled-caption/stream": [(GENERATE, "model", (AIModel.GPT4,))],
+    "/ai/generate-caption-variants": [(GENERATE, "model", (AIModel.GPT4,))],
+    "/ai/analyze-and-generate-pro": [
+        (ANALYZE, "analysis_model", (AIModel.GPT4_VISION,)),
+        (GENERATE, "caption_model", (AIModel.GPT4,))
+    ],
+    "/ai/analyze-and-generate-pro/stream": [
+        (ANALYZE, "analysis_model", (AIModel.GPT4_VISION,)),
+        (GENERATE, "caption_model", (AIModel.GPT4,))
+    ],
+    "/ai/compare-models": [(ANALYZE, "models", (AIModel.GPT4_VISION, AIModel.CLAUDE_SONNET))]
+}
+
+# Routes starting background AI work: the caller spends a token, and each
+# provider call takes a slot when it runs (batch_service)
+RATE_LIMITED_ROUTES = {("POST", "/batch/jobs")}
+
+def request_providers(path: str, query: dict) -> List[str]:
+    """
+    Provider slots an AI route needs for these query parameters, one entry per
+    concurrent provider call (empty for other routes). Phases run one after
+    the other, so each provider needs as many slots as its busiest phase
+    """
+    slots = Counter()
+    budget_ms = query.get("latency_budget_ms", [""])[0]
+    budget = int(budget_ms) / 1000 if budget_ms.isdigit() else settings.ROUTER_DEFAULT_LATENCY_BUDGET_MS / 1000
+
+    for phase, param, defaults in AI_ROUTE_MODELS.get(path.rstrip("/"), ()):
+        models = set()
+        for value in query.get(param, ()) or [model.value for model in defaults]:
+            try:
+                model = AIModel(value)
+            except ValueError:
+                continue  # rejected with a 422 by the route itself
+            if model == AIModel.AUTO:
+                model = model_router.plan(phase, budget)[0]
+            models.add(model)
+        slots |= Counter(model.provider for model in models)
+    return sorted(slots.elements())
+
+def caller_key(scope) -> str:
+    """Token bucket key: the token subject for authenticated callers, else the client IP"""
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = decode_access_token(token)
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+def _too_many_requests(rejection: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        {"detail": rejection.detail, "reason": rejection.reason},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(rejection.retry_after)))}
+    )
+
+class AdmissionControlMiddleware:
+    """
+    Fast 429 instead of a slow timeout when AI capacity is exhausted
+    Each caller spends one token per AI request, then waits (briefly, in a
+    bounded queue) for a free slot on every provider the request will use
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if (scope["method"], scope["path"].rstrip("/")) in RATE_LIMITED_ROUTES:
+            try:
+                await admission_controller.take_token(caller_key(scope))
+            except AdmissionRejected as rejection:
+                await _too_many_requests(rejection)(scope, receive, send)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        providers = request_providers(scope["path"], query)
+        if not providers:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            leases = await admission_controller.acquire(caller_key(scope), providers)
+        except AdmissionRejected as rejection:
+            await _too_many_requests(rejection)(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await admission_controller.release(leases)
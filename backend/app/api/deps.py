@@ -0,0 +1,50 @@
+"""
+Shared API dependencies
+"""
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_db
+from app.core.principal_cache import principal_cache, Principal
+from app.core.security import decode_access_token
+from app.models.models import User
+
+# OAuth2
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+# Dependency to get current user
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """
+    Get current authenticated user
+    Served from the principal cache when possible; the session only
+    opens a connection on a cache miss
+    """
+    payload = decode_access_token(token)
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    principal = principal_cache.get(username)
+    # A token for a since-recreated username must not resolve to the new account
+    if principal is not None and payload.get("uid") not in (None, principal.id):
+        principal = None
+
+    if principal is None:
+        user = await db.scalar(select(User).where(User.username == username))
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        principal = Principal.from_user(user)
+        principal_cache.set(username, principal)
+
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    return principal
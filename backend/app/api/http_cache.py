@@ -0,0 +1,105 @@
+"""
+HTTP caching for reference data
+Responses are serialized once and kept as bytes with a strong ETag (hash of
+the body); clients revalidate with If-None-Match and get a bodyless 304 while
+the data is unchanged. ResponseCache keeps the serialized pages in-process,
+dropped per kind when a row of that kind is written
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+@dataclass(frozen=True)
+class CachedBody:
+    """Pre-serialized JSON body and its strong ETag"""
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_payload(cls, payload) -> "CachedBody":
+        # Same encoding as FastAPI's JSONResponse
+        body = json.dumps(
+            payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()}"')
+
+CACHE_CONTROL = f"public, max-age={settings.REFERENCE_CACHE_MAX_AGE_SECONDS}, must-revalidate"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/"x" matches "x" """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+def conditional_response(request: Request, cached: CachedBody) -> Response:
+    """200 with the cached body, or 304 when the client already has this version"""
+    headers = {"ETag": cached.etag, "Cache-Control": CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = settings.REFERENCE_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.REFERENCE_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # (kind, key) -> (expires_at epoch seconds, body)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Bumped by invalidate; a body built from a read older than the last
+        # write of its kind is not stored
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, kind: str) -> int:
+        return self._generations.get(kind, 0)
+
+    def get(self, kind: str, key: Hashable) -> Optional[CachedBody]:
+        entry = self._entries.get((kind, key))
+        if entry is None or entry[0] <= time.time():
+            self._entries.pop((kind, key), None)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end((kind, key))
+        self.hits += 1
+        return entry[1]
+
+    def set(self, kind: str, key: Hashable, cached: CachedBody, generation: int) -> None:
+        if self.ttl_seconds <= 0 or generation != self.generation(kind):
+            return
+        self._entries[(kind, key)] = (time.time() + self.ttl_seconds, cached)
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, kind: str) -> None:
+        """Drop every cached page of a kind (call after committing a write)"""
+        self._generations[kind] = self.generation(kind) + 1
+        for entry_key in [k for k in self._entries if k[0] == kind]:
+            del self._entries[entry_key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries)
+        }
+
+# Singleton instance (only this worker's writes invalidate it; other workers
+# converge within the TTL)
+reference_cache = ResponseCache()
@@ -2,19 +2,34 @@
 Advanced AI Routes
 Multi-model, multi-style, multi-language caption generation
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-import json
+import asyncio
+import time
 
-from app.core.database import get_db
-from app.models.models import User, Caption
+from app.api.sse import format_sse, SSE_HEADERS
+from app.api.http_cache import CachedBody, conditional_response, reference_cache
+from app.api.uploads import read_upload
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.models.models import User
+from app.schemas.schemas import Analysis
 from app.services.ai_service import (
     multi_model_ai_service,
+    analysis_flight,
     AIModel,
     CaptionStyle,
     Language
 )
+from app.services.analysis_cache import analysis_cache
+from app.services.caption_store import save_captions
+from app.services.prompts import prompt_registry
+from app.services.image_preprocessing import MediaPayload
+from app.services.model_router import model_router, GENERATE
+from app.services.resilience import health_snapshot
+from app.services.admission import admission_controller
 
 router = APIRouter(prefix="/ai", tags=["AI Advanced"])
 
@@ -23,10 +38,127 @@ async def get_current_user_optional():
     """Optional user dependency - returns None if not authenticated"""
     return None  # TODO: Implement proper auth dependency
 
+async def _save_caption(
+    db: AsyncSession,
+    current_user: User,
+    filename: str,
+    analysis: Analysis,
+    caption_result: dict,
+    musicians_list: Optional[List[str]],
+    venue: Optional[str],
+    language: Language,
+    model: str
+):
+    """Save a generated caption to the user's history (and analytics rollups)"""
+    await save_captions(db, [{
+        "user_id": current_user.id,
+        "caption_text": caption_result["caption"],
+        "media_filename": filename,
+        "detected_objects": analysis.detected_objects,
+        "suggested_tags": analysis.suggested_tags,
+        "confidence": analysis.confidence,
+        "musicians": musicians_list,
+        "venue": venue,
+        "style": analysis.genre or "music",
+        "language": language.value,
+        "model": model
+    }])
+    await db.commit()
+
+def _latency_budget_query():
+    return Query(
+        None,
+        ge=500,
+        le=120000,
+        description="Latency budget in ms for `auto` model selection"
+    )
+
+def _remaining_budget(latency_budget_ms: Optional[int], started: float) -> Optional[int]:
+    """What is left of a request's budget for its next phase"""
+    if latency_budget_ms is None:
+        return None
+    return max(500, latency_budget_ms - round((time.perf_counter() - started) * 1000))
+
+async def _analyze(
+    payload: MediaPayload,
+    filename: str,
+    model: AIModel,
+    latency_budget_ms: Optional[int]
+) -> tuple:
+    """Analyze with a model, or through the router for `auto`; returns (analysis, model used, routing)"""
+    if model is AIModel.AUTO:
+        analysis, routing = await model_router.route_analysis(payload, filename, latency_budget_ms)
+        return analysis, routing["selected"] or "fallback", routing
+
+    analysis = await multi_model_ai_service.analyze_image_with_model(payload, filename, model=model)
+    return analysis, model.value, None
+
+async def _generate(
+    analysis: Analysis,
+    style: CaptionStyle,
+    language: Language,
+    musicians_list: Optional[List[str]],
+    venue: Optional[str],
+    custom_context: Optional[str],
+    model: AIModel,
+    latency_budget_ms: Optional[int]
+) -> tuple:
+    """Generate with a model, or through the router for `auto`; returns (caption result, model used, routing)"""
+    if model is AIModel.AUTO:
+        caption_result, routing = await model_router.route_caption(
+            analysis, style, language, musicians_list, venue, custom_context, latency_budget_ms
+        )
+        return caption_result, routing["selected"] or "fallback", routing
+
+    caption_result = await multi_model_ai_service.generate_caption_with_style(
+        analysis=analysis,
+        style=style,
+        language=language,
+        musicians=musicians_list,
+        venue=venue,
+        custom_context=custom_context,
+        model=model
+    )
+    return caption_result, model.value, None
+
+def _pro_response(
+    filename: str,
+    analysis: Analysis,
+    caption_result: dict,
+    style: CaptionStyle,
+    language: Language,
+    analysis_model: str,
+    caption_model: str,
+    saved_to_db: bool,
+    routing: Optional[dict] = None
+) -> dict:
+    """Response body shared by the JSON and streaming PRO endpoints"""
+    models_used = {
+        "analysis": analysis_model,
+        "caption": caption_model
+    }
+    if routing:
+        models_used["routing"] = routing
+
+    return {
+        "filename": filename,
+        "analysis": {
+            **analysis.to_dict(),
+            "model_used": analysis_model
+        },
+        "caption": caption_result["caption"],
+        "hashtags": caption_result["hashtags"],
+        "style": style.value,
+        "language": language.value,
+        "models_used": models_used,
+        "saved_to_db": saved_to_db
+    }
+
 @router.post("/analyze-advanced")
 async def analyze_media_advanced(
     file: UploadFile = File(...),
     model: AIModel = Query(AIModel.GPT4_VISION, description="AI model to use for analysis"),
+    latency_budget_ms: Optional[int] = _latency_budget_query(),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """
@@ -37,26 +169,28 @@ async def analyze_media_advanced(
     - `gpt-4`: OpenAI GPT-4 (text-based fallback)
     - `claude-3-5-sonnet-20241022`: Claude 3.5 Sonnet (excellent reasoning)
     - `claude-3-5-haiku-20241022`: Claude 3.5 Haiku (fast and efficient)
+    - `auto`: cheapest model expected to answer within `latency_budget_ms`
     """
     try:
         if not file.content_type.startswith(('image/', 'video/')):
             raise HTTPException(status_code=400, detail="File must be an image or video")
 
-        content = await file.read()
+        payload = await read_upload(file)
 
-        analysis = await multi_model_ai_service.analyze_image_with_model(
-            content,
-            file.filename,
-            model=model
-        )
+        analysis, model_used, routing = await _analyze(payload, file.filename, model, latency_budget_ms)
 
-        return {
+        response = {
             "filename": file.filename,
             "content_type": file.content_type,
-            "model_used": model.value,
-            "analysis": analysis
+            "model_used": model_used,
+            "analysis": analysis.to_dict()
         }
+        if routing:
+            response["models_used"] = {"analysis": model_used, "routing": {"analysis": routing}}
+        return response
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -64,13 +198,14 @@ async def analyze_media_advanced(
 
 @router.post("/generate-styled-caption")
 async def generate_styled_caption(
-    analysis: dict,
+    analysis: Analysis,
     style: CaptionStyle = Query(CaptionStyle.CASUAL, description="Caption style"),
     language: Language = Query(Language.FRENCH, description="Output language"),
     model: AIModel = Query(AIModel.GPT4, description="AI model for generation"),
     musicians: Optional[str] = Query(None, description="Comma-separated musician names"),
     venue: Optional[str] = Query(None, description="Venue name"),
     custom_context: Optional[str] = Query(None, description="Additional context"),
+    latency_budget_ms: Optional[int] = _latency_budget_query(),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """
@@ -94,15 +229,11 @@ async def generate_styled_caption(
     try:
         musicians_list = musicians.split(',') if musicians else None
 
-        result = await multi_model_ai_service.generate_caption_with_style(
-            analysis=analysis,
-            style=style,
-            language=language,
-            musicians=musicians_list,
-            venue=venue,
-            custom_context=custom_context,
-            model=model
+        result, model_used, routing = await _generate(
+            analysis, style, language, musicians_list, venue, custom_context, model, latency_budget_ms
         )
+        if routing:
+            result["models_used"] = {"caption": model_used, "routing": {"caption": routing}}
 
         return result
 
@@ -111,6 +242,51 @@ async def generate_styled_caption(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@router.post("/generate-caption-variants")
+async def generate_caption_variants(
+    analysis: Analysis,
+    styles: List[CaptionStyle] = Query([CaptionStyle.CASUAL], description="Caption styles"),
+    languages: List[Language] = Query([Language.FRENCH], description="Output languages"),
+    model: AIModel = Query(AIModel.GPT4, description="AI model for generation"),
+    musicians: Optional[str] = Query(None, description="Comma-separated musician names"),
+    venue: Optional[str] = Query(None, description="Venue name"),
+    custom_context: Optional[str] = Query(None, description="Additional context"),
+    latency_budget_ms: Optional[int] = _latency_budget_query()
+):
+    """
+    Generate every style x language combination in one go
+
+    The analysis context is sent once per provider call and variants come
+    back as one JSON object; more than `CAPTION_VARIANTS_PER_CALL` variants
+    are split across concurrent calls. Results are keyed `style:language`
+    (e.g. `casual:fr`).
+    """
+    try:
+        musicians_list = musicians.split(',') if musicians else None
+        pairs = [(style, language) for style in dict.fromkeys(styles) for language in dict.fromkeys(languages)]
+
+        routing = None
+        if model is AIModel.AUTO:
+            model, routing = model_router.choose(GENERATE, latency_budget_ms)
+
+        variants = await multi_model_ai_service.generate_caption_variants(
+            analysis, pairs, musicians_list, venue, custom_context, model
+        )
+
+        response = {
+            "variants": variants,
+            "model_used": model.value,
+            "count": len(variants)
+        }
+        if routing:
+            response["models_used"] = {"caption": model.value, "routing": {"caption": routing}}
+        return response
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
 @router.post("/analyze-and-generate-pro")
 async def analyze_and_generate_pro(
     file: UploadFile = File(...),
@@ -122,8 +298,9 @@ async def analyze_and_generate_pro(
     venue: Optional[str] = Query(None, description="Venue name"),
     custom_context: Optional[str] = Query(None, description="Additional context"),
     save_to_db: bool = Query(True, description="Save to database"),
+    latency_budget_ms: Optional[int] = _latency_budget_query(),
     current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Complete workflow: Analyze with one model, generate caption with another
@@ -139,174 +316,355 @@ async def analyze_and_generate_pro(
     - Analysis: `claude-3-5-sonnet-20241022`, Caption: `gpt-4` (Claude's reasoning + GPT's creativity)
     - Analysis: `gpt-4-vision-preview`, Caption: `gpt-4` (OpenAI stack)
     - Fast: `claude-3-5-haiku-20241022` for both (quick results)
+    - `auto` for either step: the router picks by `latency_budget_ms` (shared by both steps)
+      and reports its decisions in `models_used.routing`
     """
     try:
         if not file.content_type.startswith(('image/', 'video/')):
             raise HTTPException(status_code=400, detail="File must be an image or video")
 
+        started = time.perf_counter()
+        routing = {}
+
         # Step 1: Analyze image
-        content = await file.read()
-        analysis = await multi_model_ai_service.analyze_image_with_model(
-            content,
-            file.filename,
-            model=analysis_model
+        payload = await read_upload(file)
+        analysis, analysis_model_used, routing["analysis"] = await _analyze(
+            payload, file.filename, analysis_model, latency_budget_ms
         )
 
         # Step 2: Generate caption
         musicians_list = musicians.split(',') if musicians else None
-        caption_result = await multi_model_ai_service.generate_caption_with_style(
-            analysis=analysis,
-            style=style,
-            language=language,
-            musicians=musicians_list,
-            venue=venue,
-            custom_context=custom_context,
-            model=caption_model
+        caption_result, caption_model_used, routing["caption"] = await _generate(
+            analysis, style, language, musicians_list, venue, custom_context,
+            caption_model, _remaining_budget(latency_budget_ms, started)
         )
 
         # Step 3: Save to database (if user is authenticated and wants to save)
         if save_to_db and current_user and db:
-            db_caption = Caption(
-                user_id=current_user.id,
-                caption_text=caption_result["caption"],
-                media_filename=file.filename,
-                detected_objects=json.dumps(analysis.get("detected_objects", [])),
-                suggested_tags=json.dumps(analysis.get("suggested_tags", [])),
-                confidence=analysis.get("confidence"),
-                musicians=json.dumps(musicians_list) if musicians_list else None,
-                venue=venue,
-                style=analysis.get("genre", "music")
+            await _save_caption(
+                db, current_user, file.filename, analysis, caption_result, musicians_list, venue,
+                language, caption_model_used
             )
-            db.add(db_caption)
-            db.commit()
 
-        return {
-            "filename": file.filename,
-            "analysis": {
-                **analysis,
-                "model_used": analysis_model.value
-            },
-            "caption": caption_result["caption"],
-            "hashtags": caption_result["hashtags"],
-            "style": style.value,
-            "language": language.value,
-            "models_used": {
-                "analysis": analysis_model.value,
-                "caption": caption_model.value
-            },
-            "saved_to_db": save_to_db and current_user is not None
-        }
+        return _pro_response(
+            file.filename, analysis, caption_result, style, language,
+            analysis_model_used, caption_model_used, save_to_db and current_user is not None,
+            {phase: decision for phase, decision in routing.items() if decision}
+        )
 
+    except HTTPException:
+        raise
     except ValueError as e:
         if db:
-            db.rollback()
+            await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         if db:
-            db.rollback()
+            await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@router.post("/generate-styled-caption/stream")
+async def generate_styled_caption_stream(
+    analysis: Analysis,
+    style: CaptionStyle = Query(CaptionStyle.CASUAL, description="Caption style"),
+    language: Language = Query(Language.FRENCH, description="Output language"),
+    model: AIModel = Query(AIModel.GPT4, description="AI model for generation"),
+    musicians: Optional[str] = Query(None, description="Comma-separated musician names"),
+    venue: Optional[str] = Query(None, description="Venue name"),
+    custom_context: Optional[str] = Query(None, description="Additional context"),
+    latency_budget_ms: Optional[int] = _latency_budget_query(),
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    Streaming version of `/ai/generate-styled-caption` (Server-Sent Events)
+
+    **Events:**
+    - `token`: caption text delta (`{"text": ...}`)
+    - `hashtag`: a hashtag as soon as it is complete (`{"tag": ...}`)
+    - `done`: same JSON as `/ai/generate-styled-caption`
+
+    With `auto` the model is picked once up front; a stream is not failed over.
+    """
+    musicians_list = musicians.split(',') if musicians else None
+    routing = None
+    if model is AIModel.AUTO:
+        model, routing = model_router.choose(GENERATE, latency_budget_ms)
+
+    async def events():
+        try:
+            async for event in multi_model_ai_service.stream_caption_with_style(
+                analysis=analysis,
+                style=style,
+                language=language,
+                musicians=musicians_list,
+                venue=venue,
+                custom_context=custom_context,
+                model=model
+            ):
+                event_type = event.pop("type")
+                if event_type == "done" and routing:
+                    event["models_used"] = {"caption": model.value, "routing": {"caption": routing}}
+                yield format_sse(event_type, event)
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/analyze-and-generate-pro/stream")
+async def analyze_and_generate_pro_stream(
+    file: UploadFile = File(...),
+    analysis_model: AIModel = Query(AIModel.GPT4_VISION, description="Model for analysis"),
+    caption_model: AIModel = Query(AIModel.GPT4, description="Model for caption generation"),
+    style: CaptionStyle = Query(CaptionStyle.CASUAL, description="Caption style"),
+    language: Language = Query(Language.FRENCH, description="Output language"),
+    musicians: Optional[str] = Query(None, description="Comma-separated musician names"),
+    venue: Optional[str] = Query(None, description="Venue name"),
+    custom_context: Optional[str] = Query(None, description="Additional context"),
+    save_to_db: bool = Query(True, description="Save to database"),
+    latency_budget_ms: Optional[int] = _latency_budget_query(),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streaming version of `/ai/analyze-and-generate-pro` (Server-Sent Events)
+
+    **Events:**
+    - `analysis`: the image analysis, once available
+    - `token`: caption text delta (`{"text": ...}`)
+    - `hashtag`: a hashtag as soon as it is complete (`{"tag": ...}`)
+    - `done`: same JSON as `/ai/analyze-and-generate-pro`
+    """
+    if not file.content_type.startswith(('image/', 'video/')):
+        raise HTTPException(status_code=400, detail="File must be an image or video")
+
+    # The spooled upload stays open until the response has been sent
+    payload = await read_upload(file)
+    musicians_list = musicians.split(',') if musicians else None
+
+    async def events():
+        try:
+            started = time.perf_counter()
+            routing = {}
+
+            analysis, analysis_model_used, routing["analysis"] = await _analyze(
+                payload, file.filename, analysis_model, latency_budget_ms
+            )
+            yield format_sse("analysis", {**analysis.to_dict(), "model_used": analysis_model_used})
+
+            model = caption_model
+            if model is AIModel.AUTO:
+                model, routing["caption"] = model_router.choose(
+                    GENERATE, _remaining_budget(latency_budget_ms, started)
+                )
+
+            caption_result = None
+            async for event in multi_model_ai_service.stream_caption_with_style(
+                analysis=analysis,
+                style=style,
+                language=language,
+                musicians=musicians_list,
+                venue=venue,
+                custom_context=custom_context,
+                model=model
+            ):
+                event_type = event.pop("type")
+                if event_type == "done":
+                    caption_result = event
+                else:
+                    yield format_sse(event_type, event)
+
+            if save_to_db and current_user and db:
+                await _save_caption(
+                    db, current_user, file.filename, analysis, caption_result, musicians_list, venue,
+                    language, model.value
+                )
+
+            yield format_sse("done", _pro_response(
+                file.filename, analysis, caption_result, style, language,
+                analysis_model_used, model.value, save_to_db and current_user is not None,
+                {phase: decision for phase, decision in routing.items() if decision}
+            ))
+        except Exception as e:
+            if db:
+                await db.rollback()
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/compare-models")
 async def compare_models(
     file: UploadFile = File(...),
     models: List[AIModel] = Query(
         [AIModel.GPT4_VISION, AIModel.CLAUDE_SONNET],
         description="Models to compare"
+    ),
+    timeout: float = Query(
+        settings.COMPARE_MODEL_TIMEOUT_SECONDS,
+        gt=0,
+        description="Per-model timeout in seconds"
     )
 ):
     """
     Compare multiple AI models on the same image
 
-    Returns analysis from each model side-by-side for comparison
+    Models run concurrently; each gets its own timeout, so a slow or failing
+    provider only affects its own entry. Returns analysis from each model
+    side-by-side with per-model status and timing.
     """
     try:
         if not file.content_type.startswith(('image/', 'video/')):
             raise HTTPException(status_code=400, detail="File must be an image or video")
 
-        content = await file.read()
-        results = {}
+        if AIModel.AUTO in models:
+            raise HTTPException(status_code=400, detail="Pick explicit models to compare (auto is not comparable)")
+
+        # Hashed and encoded once, shared by every model
+        payload = await read_upload(file)
+        models = list(dict.fromkeys(models))
 
-        for model in models:
+        async def run_model(model: AIModel):
+            started = time.perf_counter()
             try:
-                analysis = await multi_model_ai_service.analyze_image_with_model(
-                    content,
-                    file.filename,
-                    model=model
+                result = await asyncio.wait_for(
+                    multi_model_ai_service.analyze_image_with_model(payload, file.filename, model=model),
+                    timeout=timeout
                 )
-                results[model.value] = analysis
+                analysis, status = result.to_dict(), "fallback" if result.failed else "ok"
+            except asyncio.TimeoutError:
+                analysis, status = {"error": f"Timed out after {timeout}s"}, "timeout"
             except Exception as e:
-                results[model.value] = {"error": str(e)}
+                analysis, status = {"error": str(e)}, "error"
+            return model, analysis, status, round((time.perf_counter() - started) * 1000, 1)
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(run_model(model) for model in models))
 
         return {
             "filename": file.filename,
-            "comparisons": results,
+            "comparisons": {model.value: analysis for model, analysis, _, _ in outcomes},
+            "status": {model.value: status for model, _, status, _ in outcomes},
+            "timings_ms": {model.value: elapsed for model, _, _, elapsed in outcomes},
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
             "models_compared": [m.value for m in models]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+# Static, so serialized (and hashed) once at import instead of per request
+AVAILABLE_OPTIONS = CachedBody.from_payload({
+    "models": {
+        "analysis": [
+            {
+                "value": AIModel.GPT4_VISION.value,
+                "name": "GPT-4 Vision",
+                "provider": "OpenAI",
+                "description": "Best for detailed visual analysis"
+            },
+            {
+                "value": AIModel.CLAUDE_SONNET.value,
+                "name": "Claude 3.5 Sonnet",
+                "provider": "Anthropic",
+                "description": "Excellent reasoning and understanding"
+            },
+            {
+                "value": AIModel.CLAUDE_HAIKU.value,
+                "name": "Claude 3.5 Haiku",
+                "provider": "Anthropic",
+                "description": "Fast and efficient"
+            },
+            {
+                "value": AIModel.AUTO.value,
+                "name": "Auto",
+                "provider": "Router",
+                "description": "Cheapest model that fits the latency budget"
+            }
+        ],
+        "caption": [
+            {
+                "value": AIModel.GPT4.value,
+                "name": "GPT-4",
+                "provider": "OpenAI",
+                "description": "Creative and engaging captions"
+            },
+            {
+                "value": AIModel.CLAUDE_SONNET.value,
+                "name": "Claude 3.5 Sonnet",
+                "provider": "Anthropic",
+                "description": "Sophisticated and nuanced writing"
+            },
+            {
+                "value": AIModel.CLAUDE_HAIKU.value,
+                "name": "Claude 3.5 Haiku",
+                "provider": "Anthropic",
+                "description": "Quick caption generation"
+            },
+            {
+                "value": AIModel.AUTO.value,
+                "name": "Auto",
+                "provider": "Router",
+                "description": "Cheapest model that fits the latency budget"
+            }
+        ]
+    },
+    "styles": [
+        {"value": CaptionStyle.PROFESSIONAL.value, "name": "Professional", "description": "Formal and polished"},
+        {"value": CaptionStyle.CASUAL.value, "name": "Casual", "description": "Friendly and relatable"},
+        {"value": CaptionStyle.POETIC.value, "name": "Poetic", "description": "Artistic and lyrical"},
+        {"value": CaptionStyle.ENERGETIC.value, "name": "Energetic", "description": "High-energy and enthusiastic"},
+        {"value": CaptionStyle.MINIMAL.value, "name": "Minimal", "description": "Short and concise"},
+        {"value": CaptionStyle.STORYTELLING.value, "name": "Storytelling", "description": "Narrative and engaging"}
+    ],
+    "languages": [
+        {"value": Language.FRENCH.value, "name": "Français", "flag": "🇫🇷"},
+        {"value": Language.ENGLISH.value, "name": "English", "flag": "🇬🇧"},
+        {"value": Language.SPANISH.value, "name": "Español", "flag": "🇪🇸"},
+        {"value": Language.GERMAN.value, "name": "Deutsch", "flag": "🇩🇪"},
+        {"value": Language.ITALIAN.value, "name": "Italiano", "flag": "🇮🇹"}
+    ]
+})
+
 @router.get("/available-options")
-async def get_available_options():
+async def get_available_options(request: Request):
     """
     Get all available AI options (models, styles, languages)
     """
+    return conditional_response(request, AVAILABLE_OPTIONS)
+
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """
+    Analysis and reference data cache hit/miss counters, coalesced provider
+    calls and the prompt versions cache keys are built from
+    """
     return {
-        "models": {
-            "analysis": [
-                {
-                    "value": AIModel.GPT4_VISION.value,
-                    "name": "GPT-4 Vision",
-                    "provider": "OpenAI",
-                    "description": "Best for detailed visual analysis"
-                },
-                {
-                    "value": AIModel.CLAUDE_SONNET.value,
-                    "name": "Claude 3.5 Sonnet",
-                    "provider": "Anthropic",
-                    "description": "Excellent reasoning and understanding"
-                },
-                {
-                    "value": AIModel.CLAUDE_HAIKU.value,
-                    "name": "Claude 3.5 Haiku",
-                    "provider": "Anthropic",
-                    "description": "Fast and efficient"
-                }
-            ],
-            "caption": [
-                {
-                    "value": AIModel.GPT4.value,
-                    "name": "GPT-4",
-                    "provider": "OpenAI",
-                    "description": "Creative and engaging captions"
-                },
-                {
-                    "value": AIModel.CLAUDE_SONNET.value,
-                    "name": "Claude 3.5 Sonnet",
-                    "provider": "Anthropic",
-                    "description": "Sophisticated and nuanced writing"
-                },
-                {
-                    "value": AIModel.CLAUDE_HAIKU.value,
-                    "name": "Claude 3.5 Haiku",
-                    "provider": "Anthropic",
-                    "description": "Quick caption generation"
-                }
-            ]
-        },
-        "styles": [
-            {"value": CaptionStyle.PROFESSIONAL.value, "name": "Professional", "description": "Formal and polished"},
-            {"value": CaptionStyle.CASUAL.value, "name": "Casual", "description": "Friendly and relatable"},
-            {"value": CaptionStyle.POETIC.value, "name": "Poetic", "description": "Artistic and lyrical"},
-            {"value": CaptionStyle.ENERGETIC.value, "name": "Energetic", "description": "High-energy and enthusiastic"},
-            {"value": CaptionStyle.MINIMAL.value, "name": "Minimal", "description": "Short and concise"},
-            {"value": CaptionStyle.STORYTELLING.value, "name": "Storytelling", "description": "Narrative and engaging"}
-        ],
-        "languages": [
-            {"value": Language.FRENCH.value, "name": "Français", "flag": "🇫🇷"},
-            {"value": Language.ENGLISH.value, "name": "English", "flag": "🇬🇧"},
-            {"value": Language.SPANISH.value, "name": "Español", "flag": "🇪🇸"},
-            {"value": Language.GERMAN.value, "name": "Deutsch", "flag": "🇩🇪"},
-            {"value": Language.ITALIAN.value, "name": "Italiano", "flag": "🇮🇹"}
-        ]
+        "analysis_cache": analysis_cache.stats(),
+        "reference_cache": reference_cache.stats(),
+        "single_flight": analysis_flight.stats(),
+        "prompts": prompt_registry.snapshot()
     }
+
+@router.get("/router-stats")
+async def get_router_stats():
+    """
+    Rolling latency, error rate and cost per model used by `auto` selection
+    """
+    return model_router.snapshot()
+
+@router.get("/provider-health")
+async def get_provider_health():
+    """
+    Circuit breaker state per AI provider
+    While a circuit is open, calls to that provider fall back immediately
+    """
+    return health_snapshot()
+
+@router.get("/admission-stats")
+async def get_admission_stats():
+    """
+    AI calls in flight per provider, queued requests and the configured limits
+    """
+    return await admission_controller.snapshot(["openai", "anthropic"])
@@ -0,0 +1,126 @@
+"""
+Batch Routes
+Analyze and caption many files (or a zip archive) in one background job
+"""
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List
+import asyncio
+
+from app.api.deps import get_current_user
+from app.api.sse import format_sse, SSE_HEADERS
+from app.core.database import get_async_db
+from app.core.principal_cache import Principal
+from app.services.ai_service import AIModel, CaptionStyle, Language
+from app.services.batch_service import (
+    batch_service,
+    serialize_job,
+    BatchError,
+    FINISHED_STATUSES
+)
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+# Seconds between progress checks on the events stream
+EVENTS_POLL_INTERVAL = 1.0
+
+@router.post("/jobs", status_code=202)
+async def create_batch_job(
+    files: List[UploadFile] = File(..., description="Images/videos, or zip archives of them"),
+    analysis_model: AIModel = Query(AIModel.GPT4_VISION, description="Model for analysis"),
+    caption_model: AIModel = Query(AIModel.GPT4, description="Model for caption generation"),
+    style: CaptionStyle = Query(CaptionStyle.CASUAL, description="Caption style"),
+    language: Language = Query(Language.FRENCH, description="Output language"),
+    musicians: Optional[str] = Query(None, description="Comma-separated musician names"),
+    venue: Optional[str] = Query(None, description="Venue name"),
+    custom_context: Optional[str] = Query(None, description="Additional context"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Start a batch analyze-and-generate job
+
+    Files are processed in the background with bounded concurrency per
+    provider. Poll `GET /batch/jobs/{job_id}` or stream
+    `GET /batch/jobs/{job_id}/events` for per-item results. Captions are
+    saved to your history in one bulk insert when the job finishes.
+    """
+    try:
+        workdir, entries = await asyncio.to_thread(
+            batch_service.spool_uploads,
+            [(f.filename, f.content_type, f.file) for f in files]
+        )
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    options = {
+        "analysis_model": analysis_model.value,
+        "caption_model": caption_model.value,
+        "style": style.value,
+        "language": language.value,
+        "musicians": musicians.split(',') if musicians else None,
+        "venue": venue,
+        "custom_context": custom_context
+    }
+
+    job = await batch_service.create_job(db, current_user.id, entries, options)
+    batch_service.start(job.id, workdir, entries)
+
+    return serialize_job(job, include_items=False)
+
+@router.get("/jobs/{job_id}")
+async def get_batch_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    """Get job progress and per-item results"""
+    snapshot = await batch_service.get_job_snapshot(job_id, current_user.id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return snapshot
+
+@router.get("/jobs/{job_id}/events")
+async def stream_batch_job(
+    job_id: str,
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Stream job progress as Server-Sent Events
+
+    **Events:**
+    - `item`: one finished item (caption, hashtags or error)
+    - `progress`: updated job counters
+    - `done`: final job state
+    """
+    snapshot = await batch_service.get_job_snapshot(job_id, current_user.id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    async def events(snapshot):
+        sent_items = set()
+        last_progress = None
+
+        while True:
+            for item in snapshot["items"]:
+                if item["status"] != "pending" and item["id"] not in sent_items:
+                    sent_items.add(item["id"])
+                    yield format_sse("item", item)
+
+            progress = (snapshot["status"], snapshot["completed_items"], snapshot["failed_items"])
+            if progress != last_progress:
+                last_progress = progress
+                yield format_sse("progress", {
+                    key: value for key, value in snapshot.items() if key != "items"
+                })
+
+            if snapshot["status"] in FINISHED_STATUSES or await request.is_disconnected():
+                break
+
+            await asyncio.sleep(EVENTS_POLL_INTERVAL)
+            snapshot = await batch_service.get_job_snapshot(job_id, current_user.id)
+
+        yield format_sse("done", {key: value for key, value in snapshot.items() if key != "items"})
+
+    return StreamingResponse(events(snapshot), media_type="text/event-stream", headers=SSE_HEADERS)
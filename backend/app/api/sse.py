@@ -0,0 +1,13 @@
+"""
+Server-Sent Events helpers
+"""
+import json
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # disable proxy buffering (nginx)
+}
+
+def format_sse(event: str, data) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,77 @@
+"""
+Upload ingestion
+Request bodies are size-limited while they stream in; multipart files are
+spooled to a temp file by Starlette and hashed in one chunked pass, so
+handlers never hold a whole upload in memory
+"""
+import asyncio
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.services.image_preprocessing import MediaPayload, MediaTooLarge, hash_stream
+
+# Room for multipart boundaries and form fields around a single file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Request body exceeds the {limit // (1024 * 1024)} MB limit"
+    )
+
+def request_body_limit(path: str) -> int:
+    """Largest accepted request body for a path"""
+    if path.startswith("/batch/"):
+        return settings.BATCH_MAX_REQUEST_BYTES
+    return settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized request bodies before they are buffered
+    Requests announcing a larger Content-Length are refused without reading
+    the body; chunked bodies are cut off as soon as they cross the limit
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Every method is checked: /ai/compare-models takes its upload on a GET
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = request_body_limit(scope["path"])
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": _too_large(limit).detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Surfaces through FastAPI's body parsing as a 413 response
+                    raise _too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def read_upload(file: UploadFile) -> MediaPayload:
+    """
+    Wrap a spooled upload in a MediaPayload without reading it into memory
+    Enforces MAX_UPLOAD_BYTES and computes the content hash in one chunked
+    read. Decoding reads the file a second time, on analysis-cache misses
+    only: the hash is the cache key, so it is needed before deciding to decode
+    """
+    try:
+        digest, _ = await asyncio.to_thread(hash_stream, file.file, settings.MAX_UPLOAD_BYTES)
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return MediaPayload(file.file, file.filename, digest=digest, content_type=file.content_type)
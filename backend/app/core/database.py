@@ -1,18 +1,58 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-# Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=True  # Set to False in production
-)
+# Async drivers used by the request path
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def _async_url(url: str) -> str:
+    """Swap the sync driver in DATABASE_URL for its async counterpart"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def _engine_options(url: str, use_async: bool) -> dict:
+    """Pool sizing and statement timeout (Postgres only; SQLite keeps its default pool)"""
+    options = {
+        "pool_pre_ping": True,
+        "echo": settings.DB_ECHO
+    }
+    if url.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = (
+            {"server_settings": {"statement_timeout": timeout}} if use_async
+            else {"options": f"-c statement_timeout={timeout}"}
+        )
+    return options
+
+# Sync engine (migrations, init_db, scripts)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL, use_async=False))
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (route handlers and background jobs)
+async_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL),
+    **_engine_options(settings.DATABASE_URL, use_async=True)
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -23,3 +63,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,188 @@
+"""
+AI provider instrumentation
+Per-call latency, token usage, payload size, cache and fallback metrics,
+exported in Prometheus format on /metrics and logged one line per call
+"""
+import logging
+import time
+from typing import Any, Callable, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+logger = logging.getLogger("app.ai")
+
+# Vision calls take seconds; buckets reach the 60s client timeout
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60)
+PAYLOAD_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000)
+
+PROVIDER_LABELS = ("provider", "model", "phase")
+
+provider_latency = Histogram(
+    "ai_provider_request_duration_seconds",
+    "Provider call latency (streams: until the last chunk)",
+    PROVIDER_LABELS,
+    buckets=LATENCY_BUCKETS
+)
+provider_first_token = Histogram(
+    "ai_provider_time_to_first_token_seconds",
+    "Time until the first streamed chunk",
+    PROVIDER_LABELS,
+    buckets=LATENCY_BUCKETS
+)
+provider_calls = Counter(
+    "ai_provider_calls_total",
+    "Provider calls by outcome (ok, fallback, error, timeout, short_circuit, cancelled)",
+    PROVIDER_LABELS + ("outcome",)
+)
+provider_tokens = Counter(
+    "ai_provider_tokens_total",
+    "Tokens reported by the provider",
+    PROVIDER_LABELS + ("direction",)
+)
+provider_payload_bytes = Histogram(
+    "ai_provider_payload_bytes",
+    "Request payload size (encoded image or prompt text)",
+    PROVIDER_LABELS,
+    buckets=PAYLOAD_BUCKETS
+)
+analysis_cache_lookups = Counter(
+    "ai_analysis_cache_lookups_total",
+    "Analysis cache lookups",
+    ("model", "result")
+)
+circuit_state = Gauge(
+    "ai_provider_circuit_state",
+    "Provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ("provider",)
+)
+provider_retries = Counter(
+    "ai_provider_retries_total",
+    "Provider calls retried after a transient error",
+    ("provider",)
+)
+provider_short_circuits = Counter(
+    "ai_provider_short_circuits_total",
+    "Provider calls refused because the circuit was open",
+    ("provider",)
+)
+admission_decisions = Counter(
+    "ai_admission_decisions_total",
+    "AI request admission decisions (admitted, queued, rate_limited, saturated)",
+    ("result",)
+)
+admission_wait = Histogram(
+    "ai_admission_wait_seconds",
+    "Time queued requests waited for a provider slot",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10)
+)
+
+# Cancellation message of a call abandoned for running over its time limit
+# (recorded as outcome "timeout" instead of "cancelled")
+ATTEMPT_TIMEOUT = "attempt_timeout"
+
+# Callbacks run with every finished ProviderCall (e.g. the model router's statistics)
+_call_observers: List[Callable[["ProviderCall"], None]] = []
+
+def add_call_observer(observer: Callable[["ProviderCall"], None]) -> None:
+    """Register a callback invoked after every provider call"""
+    _call_observers.append(observer)
+
+class ProviderCall:
+    """
+    Measures one provider call; use through track_provider_call()
+    An exception leaving the block is recorded as an error
+    """
+    def __init__(self, provider: str, model: str, phase: str, payload_bytes: int = 0):
+        self.provider = provider
+        self.model = model
+        self.phase = phase
+        self.payload_bytes = payload_bytes
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+        self.fallback = False
+        self.outcome: Optional[str] = None
+        self.elapsed = 0.0
+        self._started = 0.0
+        self._first_token_at: Optional[float] = None
+
+    @property
+    def _labels(self) -> tuple:
+        return self.provider, self.model, self.phase
+
+    def record_usage(self, usage: Any) -> None:
+        """Read token counts from an OpenAI or Anthropic usage object"""
+        if usage is None:
+            return
+        input_tokens = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", None)
+        output_tokens = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None)
+        if input_tokens is not None:
+            self.input_tokens = input_tokens
+        if output_tokens is not None:
+            self.output_tokens = output_tokens
+
+    def first_token(self) -> None:
+        """Mark the arrival of the first streamed chunk"""
+        if self._first_token_at is None:
+            self._first_token_at = time.perf_counter()
+
+    def mark_fallback(self) -> None:
+        """The response could not be used and a fallback result was served"""
+        self.fallback = True
+
+    def __enter__(self) -> "ProviderCall":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self._started
+        if exc_type is None:
+            outcome = "fallback" if self.fallback else "ok"
+        elif not issubclass(exc_type, Exception):
+            # CancelledError, or a stream closed early by its consumer
+            outcome = "timeout" if exc is not None and exc.args[:1] == (ATTEMPT_TIMEOUT,) else "cancelled"
+        elif getattr(exc, "short_circuited", False):
+            # Refused by an open circuit breaker without reaching the provider
+            outcome = "short_circuit"
+            self.fallback = True
+        else:
+            outcome = "error"
+            self.fallback = True
+        self.outcome, self.elapsed = outcome, elapsed
+
+        provider_latency.labels(*self._labels).observe(elapsed)
+        provider_calls.labels(*self._labels, outcome).inc()
+        if self.payload_bytes:
+            provider_payload_bytes.labels(*self._labels).observe(self.payload_bytes)
+        if self.input_tokens:
+            provider_tokens.labels(*self._labels, "input").inc(self.input_tokens)
+        if self.output_tokens:
+            provider_tokens.labels(*self._labels, "output").inc(self.output_tokens)
+        if self._first_token_at is not None:
+            provider_first_token.labels(*self._labels).observe(self._first_token_at - self._started)
+
+        logger.info(
+            "provider=%s model=%s phase=%s outcome=%s latency_ms=%.1f input_tokens=%s "
+            "output_tokens=%s payload_bytes=%d fallback=%s",
+            self.provider, self.model, self.phase, outcome, elapsed * 1000,
+            self.input_tokens, self.output_tokens, self.payload_bytes, self.fallback
+        )
+
+        for observer in _call_observers:
+            try:
+                observer(self)
+            except Exception as e:
+                logger.warning("Provider call observer error: %s", e)
+        return False
+
+def track_provider_call(provider: str, model: str, phase: str, payload_bytes: int = 0) -> ProviderCall:
+    """Context manager recording latency, tokens, payload size and outcome of a provider call"""
+    return ProviderCall(provider, model, phase, payload_bytes)
+
+def record_cache_lookup(model: str, hit: bool) -> None:
+    analysis_cache_lookups.labels(model, "hit" if hit else "miss").inc()
+    if hit:
+        logger.debug("model=%s phase=analyze cache_hit=True", model)
+
+def render_metrics() -> tuple:
+    """Prometheus exposition body and content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
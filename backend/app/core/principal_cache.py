@@ -0,0 +1,93 @@
+"""
+Authenticated principal cache
+Keeps a short-lived snapshot of the user row behind each token subject so
+authenticated requests skip the users table on the hot path
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models.models import User
+
+@dataclass(frozen=True)
+class Principal:
+    """Immutable snapshot of the fields request handlers need from User"""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=bool(user.is_active),
+            created_at=user.created_at
+        )
+
+class PrincipalCache:
+    def __init__(
+        self,
+        max_entries: int = settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.PRINCIPAL_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # subject -> (expires_at epoch seconds, principal)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        entry = self._entries.get(subject)
+        if entry is None or entry[0] <= time.time():
+            self._entries.pop(subject, None)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, subject: str, principal: Principal) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[subject] = (time.time() + self.ttl_seconds, principal)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached subject that resolves to this user"""
+        for subject in [s for s, (_, p) in self._entries.items() if p.id == user_id]:
+            del self._entries[subject]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries)
+        }
+
+# Singleton instance
+principal_cache = PrincipalCache()
+
+# Any ORM update/delete of a user in this worker (deactivation, rename, password
+# rehash...) evicts it immediately; other workers converge within the TTL.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
@@ -1,11 +1,28 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max rounds pinned to the configured cost so hashes made with any other
+# cost are flagged by verify_and_update() and transparently rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt is deliberately slow and releases the GIL, so it runs in its own
+# bounded pool instead of on the event loop or the shared default executor
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
@@ -15,6 +32,28 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def _run_in_password_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, func, *args)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await _run_in_password_pool(pwd_context.hash, password)
+
+async def verify_and_update_password_async(
+    plain_password: str,
+    hashed_password: Optional[str]
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password off the event loop
+    Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost.
+    With no stored hash (unknown user) a dummy verification keeps response timing uniform.
+    """
+    if hashed_password is None:
+        await _run_in_password_pool(pwd_context.dummy_verify)
+        return False, None
+    return await _run_in_password_pool(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -2,30 +2,56 @@
 Enhanced Caption Generator API with OpenAI and PostgreSQL
 This is the production-ready version with all features
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import json
+import logging
 
 from app.core.config import settings
-from app.core.database import get_db, engine
-from app.core.security import verify_password, create_access_token, get_password_hash, decode_access_token
+from app.core.metrics import render_metrics
+from app.core.database import get_async_db, engine, async_engine
+from app.core.security import create_access_token, hash_password_async, verify_and_update_password_async
 from app.models import models, User, Musician, Venue, Caption
 from app.schemas import schemas
 from app.services.openai_service import openai_service
-from app.api.routes import ai_routes
+from app.services.analytics import user_analytics
+from app.services.reference_search import reference_search
+from app.services.caption_store import save_captions, top_links, captions_linked_to
+from app.services.ai_clients import close_ai_clients
+from app.services.video_keyframes import shutdown_video_workers
+from app.api.deps import get_current_user
+from app.api.uploads import UploadSizeLimitMiddleware, read_upload
+from app.api.pagination import encode_cursor, decode_cursor
+from app.api.http_cache import CachedBody, conditional_response, reference_cache
+from app.api.admission import AdmissionControlMiddleware
+from app.services.admission import close_admission_state
+from app.core.principal_cache import Principal
+from app.api.routes import ai_routes, batch_routes
+
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
 
 # Create tables (in production, use Alembic migrations)
 models.Base.metadata.create_all(bind=engine)
 
+# Search indexes (pg_trgm on Postgres, FTS5 on SQLite)
+with engine.begin() as connection:
+    reference_search.ensure_indexes(connection)
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="🎵 AI-powered Instagram caption generator for musicians"
 )
 
+# Cap AI calls in flight and per-user request rates (inside CORS so 429s stay readable)
+app.add_middleware(AdmissionControlMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -35,41 +61,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Refuse oversized uploads before they are buffered
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Include AI advanced routes
 app.include_router(ai_routes.router)
+app.include_router(batch_routes.router)
 
-# OAuth2
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+@app.on_event("shutdown")
+async def shutdown_ai_clients():
+    """Release the shared AI provider connection pool"""
+    await close_ai_clients()
 
-# Dependency to get current user
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+@app.on_event("shutdown")
+async def shutdown_video_extraction():
+    """Stop the keyframe extraction process pool"""
+    shutdown_video_workers()
 
-    username: str = payload.get("sub")
-    if username is None:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+@app.on_event("shutdown")
+async def shutdown_admission():
+    """Close the shared admission-control store"""
+    await close_admission_state()
 
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+@app.on_event("shutdown")
+async def shutdown_database():
+    """Close pooled database connections"""
+    await async_engine.dispose()
 
-    return user
+# ============ MONITORING ============
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (AI provider latency, tokens, cache hits, fallbacks)"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 # ============ AUTHENTICATION ENDPOINTS ============
 
 @app.post("/register", response_model=schemas.UserResponse)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(
+    existing_user = await db.scalar(select(User).where(
         (User.email == user.email) | (User.username == user.username)
-    ).first()
+    ))
 
     if existing_user:
         raise HTTPException(status_code=400, detail="Email or username already registered")
@@ -79,53 +114,62 @@ async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         email=user.email,
         username=user.username,
         full_name=user.full_name,
-        hashed_password=get_password_hash(user.password)
+        hashed_password=await hash_password_async(user.password)
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     return db_user
 
 @app.post("/token", response_model=schemas.Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login and get access token"""
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await db.scalar(select(User).where(User.username == form_data.username))
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password_async(
+        form_data.password,
+        user.hashed_password if user else None
+    )
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    access_token = create_access_token(data={"sub": user.username})
+    # Transparent rehash when BCRYPT_ROUNDS changed since the hash was made
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/me", response_model=schemas.UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     """Get current user info"""
     return current_user
 
 # ============ CAPTION GENERATION ENDPOINTS ============
 
-@app.post("/analyze-media", response_model=schemas.AnalysisResponse)
+@app.post("/analyze-media", response_model=schemas.AnalysisResponse, response_model_exclude_none=True)
 async def analyze_media(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Analyze a media file using OpenAI Vision"""
     try:
         if not file.content_type.startswith(('image/', 'video/')):
             raise HTTPException(status_code=400, detail="File must be an image or video")
 
-        # Read file
-        content = await file.read()
+        # Stream the upload (size-checked and hashed, never read whole into memory)
+        payload = await read_upload(file)
 
         # Analyze with OpenAI
-        analysis = await openai_service.analyze_image(content, file.filename)
+        analysis = await openai_service.analyze_image(payload, file.filename)
 
         return {
             "filename": file.filename,
@@ -133,23 +177,27 @@ async def analyze_media(
             "analysis": analysis
         }
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @app.post("/generate-caption", response_model=schemas.CaptionGenerationResponse)
 async def generate_caption(
     data: schemas.CaptionGenerationRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Generate a caption based on provided context"""
     try:
         # Mock analysis for now (in real use, this would come from analyze_media)
-        mock_analysis = {
-            "instruments": ["guitar", "drums"],
-            "scene_type": "live_performance",
-            "mood": "energetic",
-            "style": data.style or "jazz"
-        }
+        mock_analysis = schemas.Analysis(
+            instruments=["guitar", "drums"],
+            scene_type="live_performance",
+            mood="energetic",
+            style=data.style or "jazz"
+        )
 
         result = await openai_service.generate_caption(
             analysis=mock_analysis,
@@ -164,25 +212,25 @@ async def generate_caption(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-@app.post("/analyze-and-generate", response_model=schemas.AnalyzeAndGenerateResponse)
+@app.post("/analyze-and-generate", response_model=schemas.AnalyzeAndGenerateResponse, response_model_exclude_none=True)
 async def analyze_and_generate(
     file: UploadFile = File(...),
     musicians: Optional[str] = None,
     venue: Optional[str] = None,
     style: Optional[str] = "jazz",
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Analyze media and generate caption in one step (saves to database)"""
     try:
         if not file.content_type.startswith(('image/', 'video/')):
             raise HTTPException(status_code=400, detail="File must be an image or video")
 
-        # Read file
-        content = await file.read()
+        # Stream the upload (size-checked and hashed, never read whole into memory)
+        payload = await read_upload(file)
 
         # Analyze with OpenAI
-        analysis = await openai_service.analyze_image(content, file.filename)
+        analysis = await openai_service.analyze_image(payload, file.filename)
 
         # Parse musicians
         musicians_list = musicians.split(',') if musicians else None
@@ -195,20 +243,21 @@ async def analyze_and_generate(
             style=style
         )
 
-        # Save to database
-        db_caption = Caption(
-            user_id=current_user.id,
-            caption_text=caption_result["caption"],
-            media_filename=file.filename,
-            detected_objects=json.dumps(analysis.get("detected_objects", [])),
-            suggested_tags=json.dumps(analysis.get("suggested_tags", [])),
-            confidence=analysis.get("confidence"),
-            musicians=json.dumps(musicians_list) if musicians_list else None,
-            venue=venue,
-            style=style
-        )
-        db.add(db_caption)
-        db.commit()
+        # Save to database (with its hashtag/object links and analytics rollups)
+        await save_captions(db, [{
+            "user_id": current_user.id,
+            "caption_text": caption_result["caption"],
+            "media_filename": file.filename,
+            "detected_objects": analysis.detected_objects,
+            "suggested_tags": analysis.suggested_tags,
+            "confidence": analysis.confidence,
+            "musicians": musicians_list,
+            "venue": venue,
+            "style": style,
+            "language": caption_result.get("language", "fr"),
+            "model": "gpt-4"
+        }])
+        await db.commit()
 
         return {
             "filename": file.filename,
@@ -217,20 +266,52 @@ async def analyze_and_generate(
             "hashtags": caption_result["hashtags"]
         }
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 # ============ MUSICIANS ENDPOINTS ============
 
 @app.get("/musicians", response_model=dict)
 async def get_musicians(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get list of musicians (ETag / If-None-Match aware)"""
+    cached = reference_cache.get("musicians", (skip, limit))
+    if cached is None:
+        generation = reference_cache.generation("musicians")
+        musicians = (await db.scalars(select(Musician).offset(skip).limit(limit))).all()
+        cached = CachedBody.from_payload({
+            "musicians": [
+                {
+                    "id": m.id,
+                    "name": m.name,
+                    "instrument": m.instrument,
+                    "style": m.style,
+                    "bio": m.bio
+                } for m in musicians
+            ],
+            "count": len(musicians)
+        })
+        reference_cache.set("musicians", (skip, limit), cached, generation)
+    return conditional_response(request, cached)
+
+@app.get("/musicians/search", response_model=dict)
+async def search_musicians(
+    q: str = Query(..., min_length=2, max_length=100, description="Name, instrument or style"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of musicians"""
-    musicians = db.query(Musician).offset(skip).limit(limit).all()
+    """Ranked prefix/fuzzy search over musicians (for autocomplete)"""
+    musicians = await reference_search.search(db, "musicians", q, limit)
     return {
         "musicians": [
             {
@@ -247,26 +328,55 @@ async def get_musicians(
 @app.post("/musicians", response_model=schemas.MusicianResponse)
 async def create_musician(
     musician: schemas.MusicianCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new musician"""
     db_musician = Musician(**musician.dict())
     db.add(db_musician)
-    db.commit()
-    db.refresh(db_musician)
+    await db.commit()
+    await db.refresh(db_musician)
+    reference_cache.invalidate("musicians")
     return db_musician
 
 # ============ VENUES ENDPOINTS ============
 
 @app.get("/venues", response_model=dict)
 async def get_venues(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of venues"""
-    venues = db.query(Venue).offset(skip).limit(limit).all()
+    """Get list of venues (ETag / If-None-Match aware)"""
+    cached = reference_cache.get("venues", (skip, limit))
+    if cached is None:
+        generation = reference_cache.generation("venues")
+        venues = (await db.scalars(select(Venue).offset(skip).limit(limit))).all()
+        cached = CachedBody.from_payload({
+            "venues": [
+                {
+                    "id": v.id,
+                    "name": v.name,
+                    "city": v.city,
+                    "type": v.type,
+                    "address": v.address,
+                    "description": v.description
+                } for v in venues
+            ],
+            "count": len(venues)
+        })
+        reference_cache.set("venues", (skip, limit), cached, generation)
+    return conditional_response(request, cached)
+
+@app.get("/venues/search", response_model=dict)
+async def search_venues(
+    q: str = Query(..., min_length=2, max_length=100, description="Name or city"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked prefix/fuzzy search over venues (for autocomplete)"""
+    venues = await reference_search.search(db, "venues", q, limit)
     return {
         "venues": [
             {
@@ -284,63 +394,103 @@ async def get_venues(
 @app.post("/venues", response_model=schemas.VenueResponse)
 async def create_venue(
     venue: schemas.VenueCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new venue"""
     db_venue = Venue(**venue.dict())
     db.add(db_venue)
-    db.commit()
-    db.refresh(db_venue)
+    await db.commit()
+    await db.refresh(db_venue)
+    reference_cache.invalidate("venues")
     return db_venue
 
 # ============ CAPTIONS HISTORY ============
 
-@app.get("/my-captions", response_model=List[schemas.CaptionResponse])
+@app.get("/my-captions", response_model=schemas.CaptionPage)
 async def get_my_captions(
-    skip: int = 0,
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    hashtag: Optional[str] = Query(None, description="Only captions suggesting this hashtag"),
+    detected_object: Optional[str] = Query(None, alias="object", description="Only captions featuring this object"),
+    musician: Optional[str] = Query(None, description="Only captions crediting this musician"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get current user's caption history"""
-    captions = db.query(Caption).filter(
-        Caption.user_id == current_user.id
-    ).order_by(Caption.created_at.desc()).offset(skip).limit(limit).all()
+    """
+    Get current user's caption history, newest first
+    Pass the returned `next_cursor` back as `cursor` for the next page
+    """
+    query = select(Caption).where(Caption.user_id == current_user.id)
+    for column, value in (
+        ("suggested_tags", hashtag),
+        ("detected_objects", detected_object),
+        ("musicians", musician)
+    ):
+        if value:
+            query = query.where(Caption.id.in_(captions_linked_to(column, current_user.id, value)))
+    if cursor:
+        try:
+            created_at, caption_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Row comparison: one range scan on ix_captions_user_created_id
+        query = query.where(
+            tuple_(Caption.created_at, Caption.id)
+            < tuple_(created_at, caption_id, types=(Caption.created_at.type, Caption.id.type))
+        )
 
-    return captions
+    # One extra row tells whether another page follows
+    captions = (await db.scalars(
+        query.order_by(Caption.created_at.desc(), Caption.id.desc()).limit(limit + 1)
+    )).all()
+
+    next_cursor = None
+    if len(captions) > limit:
+        captions = captions[:limit]
+        next_cursor = encode_cursor(captions[-1].created_at, captions[-1].id)
+
+    return {"items": captions, "next_cursor": next_cursor}
 
 # ============ ANALYTICS ENDPOINTS ============
 
 @app.get("/analytics")
 async def get_analytics(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get analytics for current user"""
-    total_captions = db.query(Caption).filter(Caption.user_id == current_user.id).count()
-
-    # Get style distribution
-    from sqlalchemy import func
-    style_stats = db.query(
-        Caption.style,
-        func.count(Caption.id).label('count')
-    ).filter(
-        Caption.user_id == current_user.id,
-        Caption.style.isnot(None)
-    ).group_by(Caption.style).all()
-
-    return {
-        "total_captions_generated": total_captions,
-        "total_media_analyzed": total_captions,
-        "most_used_styles": [
-            {"style": style, "count": count}
-            for style, count in style_stats
-        ],
-        "top_venues": [],  # TODO: Implement
-        "avg_caption_length": 245,
-        "total_hashtags_used": total_captions * 10
-    }
+    """Get analytics for current user (read from the rollups kept by caption inserts)"""
+    return await user_analytics(db, current_user.id)
+
+@app.get("/analytics/hashtags")
+async def get_top_hashtags(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Hashtags most often suggested for the current user's captions"""
+    rows = await top_links(db, "suggested_tags", current_user.id, limit)
+    return [{"hashtag": tag, "count": count} for tag, count in rows]
+
+@app.get("/analytics/objects")
+async def get_top_objects(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Objects most often detected in the current user's media"""
+    rows = await top_links(db, "detected_objects", current_user.id, limit)
+    return [{"object": name, "count": count} for name, count in rows]
+
+@app.get("/analytics/musicians")
+async def get_top_musicians(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Musicians most often credited in the current user's captions"""
+    rows = await top_links(db, "musicians", current_user.id, limit)
+    return [{"musician": name, "count": count} for name, count in rows]
 
 # ============ ROOT ENDPOINT ============
 
@@ -365,10 +515,10 @@ def read_root():
                 "my_captions": "GET /my-captions"
             },
             "resources": {
-                "musicians": "GET/POST /musicians",
-                "venues": "GET/POST /venues"
+                "musicians": "GET/POST /musicians, GET /musicians/search",
+                "venues": "GET/POST /venues, GET /venues/search"
             },
-            "analytics": "GET /analytics"
+            "analytics": "GET /analytics, /analytics/hashtags, /analytics/objects, /analytics/musicians"
         }
     }
 
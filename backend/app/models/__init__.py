@@ -1,3 +1,9 @@
-from app.models.models import User, Musician, Venue, Caption, Favorite
+from app.models.models import (
+    User, Musician, Venue, Caption, CaptionHashtag, CaptionObject, CaptionMusician, Favorite,
+    UserAnalytics, UserAnalyticsCount, AnalysisCacheEntry, BatchJob, BatchJobItem
+)
 
-__all__ = ["User", "Musician", "Venue", "Caption", "Favorite"]
+__all__ = [
+    "User", "Musician", "Venue", "Caption", "CaptionHashtag", "CaptionObject", "CaptionMusician", "Favorite",
+    "UserAnalytics", "UserAnalyticsCount", "AnalysisCacheEntry", "BatchJob", "BatchJobItem"
+]
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float, Index
+from sqlalchemy.dialects.sqlite import DATETIME as SQLITE_DATETIME
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -54,21 +55,67 @@ class Caption(Base):
     media_filename = Column(String)
     media_url = Column(String)
 
-    # Analysis data
+    # Analysis data (the lists are also normalized into caption_objects / caption_hashtags)
     detected_objects = Column(Text)  # JSON string
     suggested_tags = Column(Text)  # JSON string
     confidence = Column(Float)
 
     # Context
-    musicians = Column(Text)  # JSON string
+    musicians = Column(Text)  # JSON string, also in caption_musicians
     venue = Column(String)
     style = Column(String)
+    language = Column(String)
+    model = Column(String)  # model that wrote the caption
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # SQLite's CURRENT_TIMESTAMP has no fractional seconds; bound values (pagination
+    # cursors) must not have them either or equal timestamps stop comparing equal
+    created_at = Column(
+        DateTime(timezone=True).with_variant(SQLITE_DATETIME(truncate_microseconds=True), "sqlite"),
+        server_default=func.now()
+    )
 
     # Relationships
     user = relationship("User", back_populates="captions")
 
+    __table_args__ = (
+        # Serves the per-user history, newest first (keyset pagination on created_at, id)
+        Index("ix_captions_user_created_id", "user_id", "created_at", "id"),
+    )
+
+class CaptionHashtag(Base):
+    __tablename__ = "caption_hashtags"
+
+    caption_id = Column(Integer, ForeignKey("captions.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)  # lowercase, with the leading '#'
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # copied from the caption
+
+    # Per-user counts and "captions with this tag" lookups, both index-only
+    __table_args__ = (
+        Index("ix_caption_hashtags_user_tag", "user_id", "tag", "caption_id"),
+    )
+
+class CaptionObject(Base):
+    __tablename__ = "caption_objects"
+
+    caption_id = Column(Integer, ForeignKey("captions.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String, primary_key=True)  # lowercase
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_caption_objects_user_name", "user_id", "name", "caption_id"),
+    )
+
+class CaptionMusician(Base):
+    __tablename__ = "caption_musicians"
+
+    caption_id = Column(Integer, ForeignKey("captions.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_caption_musicians_user_name", "user_id", "name", "caption_id"),
+    )
+
 class Favorite(Base):
     __tablename__ = "favorites"
 
@@ -80,3 +127,69 @@ class Favorite(Base):
     # Relationships
     user = relationship("User", back_populates="favorites")
     caption = relationship("Caption")
+
+class UserAnalytics(Base):
+    __tablename__ = "user_analytics"
+
+    # Running totals, updated in the transaction that inserts each caption
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_captions = Column(Integer, nullable=False, default=0)
+    total_caption_chars = Column(Integer, nullable=False, default=0)
+    total_hashtags = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UserAnalyticsCount(Base):
+    __tablename__ = "user_analytics_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    dimension = Column(String, primary_key=True)  # style, venue, language, model
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    cache_key = Column(String, primary_key=True)  # sha256:model:prompt_version
+    model = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    analysis = Column(Text, nullable=False)  # JSON string
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    total_items = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    options = Column(Text)  # JSON string: models, style, language, musicians, venue
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    items = relationship("BatchJobItem", back_populates="job", order_by="BatchJobItem.position")
+
+class BatchJobItem(Base):
+    __tablename__ = "batch_job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, ForeignKey("batch_jobs.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String)
+    status = Column(String, nullable=False, default="pending")  # pending, completed, failed
+
+    # Results
+    caption_text = Column(Text)
+    hashtags = Column(Text)  # JSON string
+    analysis = Column(Text)  # JSON string
+    error = Column(Text)
+    finished_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    job = relationship("BatchJob", back_populates="items")
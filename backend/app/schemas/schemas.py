@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, ValidationError, field_validator
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 # User schemas
@@ -89,11 +89,109 @@ class CaptionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CaptionPage(BaseModel):
+    items: List[CaptionResponse]
+    next_cursor: Optional[str] = None  # None on the last page
+
 # Analysis schemas
+class Analysis(BaseModel):
+    """
+    Media analysis as returned by the vision models
+    Validated once when the provider answers, then passed through the whole
+    pipeline as is (immutable, so cached instances are shared safely).
+    Lenient by design: values are coerced where the intent is clear and
+    unknown fields are kept
+    """
+    model_config = ConfigDict(extra="allow", frozen=True)
+
+    detected_objects: Optional[List[str]] = None
+    instruments: Optional[List[str]] = None
+    musician_count: Optional[int] = None
+    scene_type: Optional[str] = None
+    genre: Optional[str] = None
+    subgenre: Optional[str] = None
+    mood: Optional[str] = None
+    lighting: Optional[str] = None
+    dominant_colors: Optional[List[str]] = None
+    composition_quality: Optional[str] = None
+    suggested_filters: Optional[List[str]] = None
+    suggested_tags: Optional[List[str]] = None
+    confidence: Optional[float] = None
+    caption_angle: Optional[str] = None
+    description: Optional[str] = None
+    # Set on video analyses
+    media_type: Optional[str] = None
+    keyframes: Optional[List[Dict[str, float]]] = None
+    # Set on fallback analyses
+    error: Optional[str] = None
+
+    @field_validator(
+        "detected_objects", "instruments", "dominant_colors", "suggested_filters", "suggested_tags",
+        mode="before"
+    )
+    @classmethod
+    def _as_string_list(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            value = [part.strip() for part in value.split(",")]
+        if isinstance(value, list):
+            return [str(item).strip() for item in value if item is not None and str(item).strip()]
+        return value
+
+    @field_validator("suggested_tags")
+    @classmethod
+    def _hashtags(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        if value is None:
+            return value
+        return [tag if tag.startswith("#") else f"#{tag}" for tag in (t.replace(" ", "") for t in value) if tag.strip("#")]
+
+    @field_validator("musician_count", mode="before")
+    @classmethod
+    def _count(cls, value: Any) -> Any:
+        if isinstance(value, float) and value.is_integer():
+            return max(0, int(value))
+        if isinstance(value, int):
+            return max(0, value)
+        return value
+
+    @field_validator("confidence")
+    @classmethod
+    def _unit_interval(cls, value: Optional[float]) -> Optional[float]:
+        if value is None:
+            return value
+        if 1 < value <= 100:
+            value = value / 100  # percentages
+        return min(1.0, max(0.0, value))
+
+    @classmethod
+    def from_response(cls, data: dict) -> "Analysis":
+        """Validate provider output, dropping only the fields that cannot be coerced"""
+        for _ in range(len(cls.model_fields) + 1):
+            try:
+                return cls.model_validate(data)
+            except ValidationError as e:
+                invalid = {error["loc"][0] for error in e.errors() if error["loc"]}
+                if not invalid:
+                    raise
+                data = {key: value for key, value in data.items() if key not in invalid}
+        return cls.model_validate(data)
+
+    @property
+    def failed(self) -> bool:
+        """True for fallback analyses (never cached, routed as failures)"""
+        return bool(self.error)
+
+    def to_dict(self) -> dict:
+        """Response form: fields the model did not return are omitted"""
+        return self.model_dump(exclude_none=True)
+
+    def to_json(self) -> str:
+        """Compact JSON (pydantic-core serializer), read back with model_validate_json"""
+        return self.model_dump_json(exclude_none=True)
+
 class AnalysisResponse(BaseModel):
     filename: str
     content_type: str
-    analysis: dict
+    analysis: Analysis
 
 class CaptionGenerationRequest(BaseModel):
     musicians: Optional[List[str]] = None
@@ -108,6 +206,6 @@ class CaptionGenerationResponse(BaseModel):
 
 class AnalyzeAndGenerateResponse(BaseModel):
     filename: str
-    analysis: dict
+    analysis: Analysis
     caption: str
     hashtags: List[str]
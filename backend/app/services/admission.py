@@ -0,0 +1,339 @@
+"""
+AI admission control
+Caps provider calls in flight, rate-limits each caller with a token bucket
+and lets a bounded number of requests wait briefly for a free slot. State is
+kept in memory, or in Redis so every worker shares the same limits
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import admission_decisions, admission_wait
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; without it limits apply per worker
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# How often a queued request re-checks slots that other workers may have freed
+SHARED_POLL_SECONDS = 0.1
+# In-memory token buckets kept (least recently used are dropped first)
+MAX_BUCKETS = 10000
+
+class AdmissionRejected(Exception):
+    """Request refused; surfaced as a 429 with Retry-After"""
+    def __init__(self, reason: str, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.reason = reason  # "rate_limited" or "saturated"
+        self.retry_after = retry_after
+        self.detail = detail
+
+class MemoryAdmissionState:
+    """Limiter state private to this worker"""
+    shared = False
+
+    def __init__(self):
+        # caller key -> (tokens, updated_at)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._slots: Dict[str, set] = {}
+
+    async def take_token(self, key: str, rate_per_second: float, burst: int) -> float:
+        """Take one token; returns 0, or the seconds until a token is available"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated_at) * rate_per_second)
+        if tokens >= 1:
+            tokens, wait = tokens - 1, 0.0
+        else:
+            wait = (1 - tokens) / rate_per_second
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def try_acquire(self, provider: str, limit: int, lease_seconds: int) -> Optional[str]:
+        """Take a provider slot; returns a lease id, or None when all slots are busy"""
+        slots = self._slots.setdefault(provider, set())
+        if len(slots) >= limit:
+            return None
+        lease = uuid.uuid4().hex
+        slots.add(lease)
+        return lease
+
+    async def release(self, provider: str, lease: str) -> None:
+        self._slots.get(provider, set()).discard(lease)
+
+    async def in_flight(self, provider: str) -> int:
+        return len(self._slots.get(provider, ()))
+
+    async def close(self) -> None:
+        pass
+
+# Token bucket refill and take, atomically, on the Redis clock
+_TAKE_TOKEN_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# Slots are a sorted set of leases scored by expiry, so a crashed worker's slots free themselves
+_ACQUIRE_SLOT_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+
+# Unexpired leases, on the same (Redis) clock the leases were scored with
+_COUNT_SLOTS_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+return redis.call('ZCOUNT', KEYS[1], '(' .. now, '+inf')
+"""
+
+class RedisAdmissionState:
+    """Limiter state shared by every worker through Redis"""
+    shared = True
+
+    def __init__(self, client, prefix: str = "caption:admission:"):
+        self.client = client
+        self.prefix = prefix
+        self._take_token = client.register_script(_TAKE_TOKEN_SCRIPT)
+        self._acquire_slot = client.register_script(_ACQUIRE_SLOT_SCRIPT)
+        self._count_slots = client.register_script(_COUNT_SLOTS_SCRIPT)
+
+    async def take_token(self, key: str, rate_per_second: float, burst: int) -> float:
+        wait = await self._take_token(keys=[f"{self.prefix}bucket:{key}"], args=[rate_per_second, burst])
+        return float(wait)
+
+    async def try_acquire(self, provider: str, limit: int, lease_seconds: int) -> Optional[str]:
+        lease = uuid.uuid4().hex
+        acquired = await self._acquire_slot(
+            keys=[f"{self.prefix}slots:{provider}"],
+            args=[limit, lease_seconds, lease]
+        )
+        return lease if acquired else None
+
+    async def release(self, provider: str, lease: str) -> None:
+        await self.client.zrem(f"{self.prefix}slots:{provider}", lease)
+
+    async def in_flight(self, provider: str) -> int:
+        return await self._count_slots(keys=[f"{self.prefix}slots:{provider}"])
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+class AdmissionController:
+    def __init__(
+        self,
+        state,
+        max_in_flight: int = settings.ADMISSION_MAX_IN_FLIGHT_PER_PROVIDER,
+        max_queue: int = settings.ADMISSION_MAX_QUEUE,
+        queue_timeout: float = settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        rate_per_minute: float = settings.ADMISSION_USER_RATE_PER_MINUTE,
+        burst: int = settings.ADMISSION_USER_BURST,
+        lease_seconds: int = settings.ADMISSION_LEASE_SECONDS
+    ):
+        self.state = state
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_per_second = rate_per_minute / 60
+        self.burst = burst
+        self.lease_seconds = lease_seconds
+        self.waiting = 0
+        # Replaced on every release so all current waiters wake up
+        self._slot_freed = asyncio.Event()
+
+    async def acquire(self, caller: str, providers: List[str]) -> List[Tuple[str, str]]:
+        """
+        Admit a request making the given provider calls (one entry per call
+        running at the same time); returns the leases to release
+        Raises AdmissionRejected when the caller is over its rate or no slot
+        frees up within the queue timeout. Limiter outages admit (fail open)
+        """
+        await self.take_token(caller)
+
+        leases = []
+        try:
+            # Fixed order, so requests needing two providers queue consistently
+            for provider in sorted(providers):
+                leases.append((provider, await self._acquire_slot(provider)))
+        except BaseException:
+            await self.release(leases)
+            raise
+        return leases
+
+    async def take_token(self, caller: str) -> None:
+        """Spend one of the caller's tokens; raises AdmissionRejected when it has none left"""
+        try:
+            wait = await self.state.take_token(caller, self.rate_per_second, self.burst)
+        except Exception as e:
+            logger.warning("Admission state unavailable, admitting: %s", e)
+            wait = 0.0
+        if wait > 0:
+            admission_decisions.labels("rate_limited").inc()
+            raise AdmissionRejected("rate_limited", wait, "Too many AI requests, please slow down")
+
+    @asynccontextmanager
+    async def background_slot(self, provider: str):
+        """
+        Hold a provider slot for background work (batch items)
+        Counts against the same in-flight cap as requests but is never rejected:
+        it waits, outside the request queue, and yields to queued requests
+        """
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+
+        lease = None if self.waiting else await self._try_acquire(provider)
+        while lease is None:
+            # Also polled: slots freed by other workers, or a request queue that
+            # emptied by timing out, set no event here
+            try:
+                await asyncio.wait_for(self._slot_freed.wait(), timeout=SHARED_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            if not self.waiting:
+                lease = await self._try_acquire(provider)
+
+        try:
+            yield
+        finally:
+            await self.release([(provider, lease)])
+
+    @asynccontextmanager
+    async def spare_slot(self, provider: str):
+        """
+        Take a provider slot only if one is free now; yields whether it did
+        For fan-out inside an admitted request (video keyframes): extra calls
+        run on spare slots and the rest wait for the slot the request holds,
+        so the request never queues against itself
+        """
+        if not settings.ADMISSION_ENABLED:
+            yield True
+            return
+
+        lease = None if self.waiting else await self._try_acquire(provider)
+        try:
+            yield lease is not None
+        finally:
+            if lease is not None:
+                await self.release([(provider, lease)])
+
+    async def release(self, leases: List[Tuple[str, str]]) -> None:
+        for provider, lease in leases:
+            if not lease:
+                continue
+            try:
+                await self.state.release(provider, lease)
+            except Exception as e:
+                logger.warning("Could not release %s admission slot: %s", provider, e)
+        if leases:
+            self._slot_freed.set()
+            self._slot_freed = asyncio.Event()
+
+    async def _try_acquire(self, provider: str) -> Optional[str]:
+        try:
+            return await self.state.try_acquire(provider, self.max_in_flight, self.lease_seconds)
+        except Exception as e:
+            logger.warning("Admission state unavailable, admitting: %s", e)
+            return ""
+
+    async def _acquire_slot(self, provider: str) -> str:
+        lease = await self._try_acquire(provider)
+        if lease is not None:
+            admission_decisions.labels("admitted").inc()
+            return lease
+
+        if self.waiting >= self.max_queue:
+            admission_decisions.labels("saturated").inc()
+            raise AdmissionRejected("saturated", self.queue_timeout, f"{provider} capacity exhausted, retry shortly")
+
+        self.waiting += 1
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    admission_decisions.labels("saturated").inc()
+                    raise AdmissionRejected("saturated", self.queue_timeout, f"{provider} capacity exhausted, retry shortly")
+
+                # Slots freed by other workers are only seen by polling
+                timeout = min(remaining, SHARED_POLL_SECONDS) if self.state.shared else remaining
+                try:
+                    await asyncio.wait_for(self._slot_freed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                lease = await self._try_acquire(provider)
+                if lease is not None:
+                    admission_decisions.labels("queued").inc()
+                    admission_wait.observe(time.monotonic() - started)
+                    return lease
+        finally:
+            self.waiting -= 1
+
+    async def snapshot(self, providers: List[str]) -> dict:
+        """Current load and limits for monitoring"""
+        in_flight = {}
+        for provider in providers:
+            try:
+                in_flight[provider] = await self.state.in_flight(provider)
+            except Exception:
+                in_flight[provider] = None
+        return {
+            "backend": "redis" if self.state.shared else "memory",
+            "in_flight": in_flight,
+            "max_in_flight_per_provider": self.max_in_flight,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "user_rate_per_minute": round(self.rate_per_second * 60, 2),
+            "user_burst": self.burst
+        }
+
+def _create_state():
+    if settings.ADMISSION_REDIS_URL:
+        if aioredis is not None:
+            return RedisAdmissionState(aioredis.from_url(settings.ADMISSION_REDIS_URL))
+        logger.warning(
+            "ADMISSION_REDIS_URL is set but redis is not installed (see requirements-optional); "
+            "limits apply per worker"
+        )
+    return MemoryAdmissionState()
+
+# Singleton instance
+admission_controller = AdmissionController(_create_state())
+
+async def close_admission_state() -> None:
+    """Close the shared limiter connection (call on application shutdown)"""
+    await admission_controller.state.close()
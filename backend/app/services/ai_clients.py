@@ -0,0 +1,34 @@
+"""
+Shared async AI provider clients
+OpenAI and Anthropic clients share one bounded HTTP connection pool.
+SDK retries are disabled; app.services.resilience retries and trips circuits instead
+"""
+import httpx
+import anthropic
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+# One keep-alive pool for every provider call made by this worker
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE
+    ),
+    timeout=httpx.Timeout(settings.AI_HTTP_TIMEOUT, connect=settings.AI_HTTP_CONNECT_TIMEOUT)
+)
+
+openai_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    http_client=http_client,
+    max_retries=0
+)
+
+claude_client = anthropic.AsyncAnthropic(
+    api_key=settings.ANTHROPIC_API_KEY,
+    http_client=http_client,
+    max_retries=0
+) if settings.ANTHROPIC_API_KEY else None
+
+async def close_ai_clients():
+    """Close the shared connection pool (call on application shutdown)"""
+    await http_client.aclose()
@@ -2,13 +2,44 @@
 Multi-Model AI Service
 Supports GPT-4 Vision, Claude 3.5 Sonnet, and other AI models
 """
+import asyncio
+import logging
 import os
-import base64
-from typing import Optional, Dict, List, Literal
+from typing import Optional, Dict, List, Literal, Union, AsyncIterator
 from enum import Enum
-import anthropic
-from openai import OpenAI
 from app.core.config import settings
+from app.core.metrics import track_provider_call, record_cache_lookup
+from app.services.ai_clients import openai_client, claude_client
+from app.services.analysis_cache import analysis_cache
+from app.services.resilience import call_provider
+from app.services.prompts import prompt_registry, variant_key
+from app.services.json_parsing import parse_json_object, JSONObjectParser, JSONParseError
+from app.schemas.schemas import Analysis
+from app.services.single_flight import SingleFlight
+from app.services.image_preprocessing import (
+    MediaPayload,
+    OPENAI_VISION_PROFILE,
+    CLAUDE_VISION_PROFILE
+)
+from app.services.video_keyframes import analyze_video
+
+logger = logging.getLogger(__name__)
+
+# Output budget per caption when several variants share one call
+VARIANT_MAX_TOKENS = 300
+
+# Claude has no JSON mode; starting its answer with "{" keeps it from wrapping the object in prose
+JSON_PREFILL = {"role": "assistant", "content": "{"}
+
+# OpenAI models accepting response_format=json_object (the vision preview and base gpt-4 do not)
+JSON_MODE_MODELS = frozenset({"gpt-4-1106-preview", "gpt-4-0125-preview", "gpt-4-turbo", "gpt-4o", "gpt-3.5-turbo-1106"})
+
+def json_mode(model: str) -> dict:
+    """Extra chat.completions arguments requesting JSON output when the model supports it"""
+    return {"response_format": {"type": "json_object"}} if model in JSON_MODE_MODELS else {}
+
+# Coalesces concurrent identical analyses (same content hash, model and prompt version)
+analysis_flight = SingleFlight()
 
 # AI Models
 class AIModel(str, Enum):
@@ -16,6 +47,14 @@ class AIModel(str, Enum):
     GPT4 = "gpt-4"
     CLAUDE_SONNET = "claude-3-5-sonnet-20241022"
     CLAUDE_HAIKU = "claude-3-5-haiku-20241022"
+    AUTO = "auto"  # resolved per request by the model router
+
+    @property
+    def provider(self) -> str:
+        """Provider serving this model ("openai" or "anthropic")"""
+        if self in (AIModel.CLAUDE_SONNET, AIModel.CLAUDE_HAIKU):
+            return "anthropic"
+        return "openai"
 
 # Caption Styles
 class CaptionStyle(str, Enum):
@@ -34,144 +73,235 @@ class Language(str, Enum):
     GERMAN = "de"
     ITALIAN = "it"
 
+class HashtagExtractor:
+    """
+    Incremental hashtag extraction over a token stream
+    A word is emitted once the whitespace after it arrives, matching caption.split()
+    """
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._pending += text
+        if not self._pending or not self._pending[-1].isspace():
+            words = self._pending.split()
+            if not words:
+                return []
+            complete, self._pending = words[:-1], words[-1]
+        else:
+            complete, self._pending = self._pending.split(), ""
+        return [word for word in complete if word.startswith('#')]
+
+    def flush(self) -> List[str]:
+        words, self._pending = self._pending.split(), ""
+        return [word for word in words if word.startswith('#')]
+
+class AnalysisStream:
+    """
+    Incremental analysis validation over a token stream
+    Each top-level field is validated as soon as the JSON parser completes it,
+    on its own, so a field that cannot be coerced is dropped without the others
+    """
+    def __init__(self, prefix: str = ""):
+        self.fields: dict = {}
+        self._parser = JSONObjectParser()
+        self._parts: List[str] = []
+        if prefix:
+            self.feed(prefix)
+
+    def feed(self, text: str) -> None:
+        self._parts.append(text)
+        for key, value in self._parser.feed(text):
+            self.fields.update(Analysis.from_response({key: value}).to_dict())
+
+    def result(self) -> Analysis:
+        """
+        The analysis once the stream has ended
+        Falls back to parse_json_object over the whole text when the object never
+        closed or held nothing usable (truncation, stray braces in prose); raises
+        JSONParseError when no object can be recovered
+        """
+        if self._parser.complete and self.fields:
+            # Every field was validated as it arrived
+            return Analysis.model_construct(**self.fields)
+        return Analysis.from_response(parse_json_object("".join(self._parts)))
+
+async def openai_deltas(stream, call) -> AsyncIterator[str]:
+    """Text deltas of a streamed chat completion"""
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            call.first_token()
+            yield chunk.choices[0].delta.content
+
+async def claude_deltas(stream, call) -> AsyncIterator[str]:
+    """Text deltas of a streamed Claude message; usage is recorded as it is reported"""
+    async for event in stream:
+        if event.type == "message_start":
+            call.record_usage(event.message.usage)
+        elif event.type == "message_delta":
+            call.record_usage(event.usage)
+        elif event.type == "content_block_delta" and event.delta.text:
+            call.first_token()
+            yield event.delta.text
+
 class MultiModelAIService:
     def __init__(self):
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.claude_client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY) if settings.ANTHROPIC_API_KEY else None
+        self.openai_client = openai_client
+        self.claude_client = claude_client
 
     async def analyze_image_with_model(
         self,
-        image_data: bytes,
+        image_data: Union[bytes, MediaPayload],
         filename: str,
         model: AIModel = AIModel.GPT4_VISION
-    ) -> dict:
-        """Analyze image using specified AI model"""
-
+    ) -> Analysis:
+        """
+        Analyze image using specified AI model (cached by content hash)
+        Pass a MediaPayload to share hashing and encoding across several models
+        """
+        if model is AIModel.AUTO:
+            raise ValueError("Automatic model selection goes through the model router")
+
+        payload = image_data if isinstance(image_data, MediaPayload) else MediaPayload(image_data, filename)
+        cache_key = analysis_cache.make_key(payload.digest, model.value, prompt_registry.analysis_version)
+
+        if settings.ANALYSIS_CACHE_ENABLED:
+            cached = await analysis_cache.get(cache_key)
+            record_cache_lookup(model.value, cached is not None)
+            if cached is not None:
+                return cached
+
+        # Identical analyses already in flight (retries, several tabs) share one provider call
+        return await analysis_flight.do(
+            cache_key,
+            lambda: self._analyze_and_cache(payload, model, cache_key)
+        )
+
+    async def _analyze_and_cache(self, payload: MediaPayload, model: AIModel, cache_key: str) -> Analysis:
+        analysis = await self._analyze_uncached(payload, model)
+        if settings.ANALYSIS_CACHE_ENABLED:
+            await analysis_cache.set(cache_key, model.value, prompt_registry.analysis_version, analysis)
+        return analysis
+
+    async def _analyze_uncached(self, payload: MediaPayload, model: AIModel) -> Analysis:
+        """Dispatch the analysis to the model's provider"""
+        if payload.is_video:
+            return await self._analyze_video(payload, model)
         if model in [AIModel.GPT4_VISION, AIModel.GPT4]:
-            return await self._analyze_with_openai(image_data, filename, model)
+            return await self._analyze_with_openai(payload, model)
         elif model in [AIModel.CLAUDE_SONNET, AIModel.CLAUDE_HAIKU]:
-            return await self._analyze_with_claude(image_data, filename, model)
+            return await self._analyze_with_claude(payload, model)
         else:
             raise ValueError(f"Unsupported model: {model}")
 
-    async def _analyze_with_openai(
-        self,
-        image_data: bytes,
-        filename: str,
-        model: AIModel
-    ) -> dict:
+    async def _analyze_video(self, payload: MediaPayload, model: AIModel) -> Analysis:
+        """Analyze a video from its keyframes (each frame is cached like an image)"""
+        try:
+            return await analyze_video(
+                payload,
+                lambda frame: self.analyze_image_with_model(frame, frame.filename, model=model),
+                model.provider
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Video keyframe extraction timed out: %s", payload.filename)
+            return self._get_fallback_analysis("Video keyframe extraction timed out")
+
+    async def _analyze_with_openai(self, payload: MediaPayload, model: AIModel) -> Analysis:
         """Analyze image using OpenAI GPT-4 Vision"""
         try:
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-            ext = filename.lower().split('.')[-1]
-            mime_type = f"image/{ext if ext in ['jpeg', 'jpg', 'png', 'gif', 'webp'] else 'jpeg'}"
+            image = await payload.prepared(OPENAI_VISION_PROFILE)
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": self._get_analysis_prompt()
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{base64_image}"
+            with track_provider_call("openai", "gpt-4-vision-preview", "analyze", len(image.data)) as call:
+                request = dict(
+                    model="gpt-4-vision-preview",
+                    messages=[{
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prompt_registry.analysis_prompt
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:{image.media_type};base64,{image.to_base64()}"
+                                }
                             }
-                        }
-                    ]
-                }],
-                max_tokens=600
-            )
-
-            return self._parse_analysis_response(response.choices[0].message.content, "openai")
+                        ]
+                    }],
+                    max_tokens=600,
+                    **json_mode("gpt-4-vision-preview")
+                )
+                if settings.ANALYSIS_STREAMING:
+                    stream = await call_provider("openai", self.openai_client.chat.completions.create, stream=True, **request)
+                    parsed = AnalysisStream()
+                    async for text in openai_deltas(stream, call):
+                        parsed.feed(text)
+                    analysis = self._parse_analysis_stream(parsed, "openai")
+                else:
+                    response = await call_provider("openai", self.openai_client.chat.completions.create, **request)
+                    call.record_usage(response.usage)
+                    analysis = self._parse_analysis_response(response.choices[0].message.content, "openai")
+                if analysis.failed:
+                    call.mark_fallback()
+            return analysis
 
         except Exception as e:
-            print(f"OpenAI analysis error: {str(e)}")
+            logger.warning("OpenAI analysis error: %s", e)
             return self._get_fallback_analysis(str(e))
 
-    async def _analyze_with_claude(
-        self,
-        image_data: bytes,
-        filename: str,
-        model: AIModel
-    ) -> dict:
+    async def _analyze_with_claude(self, payload: MediaPayload, model: AIModel) -> Analysis:
         """Analyze image using Claude 3.5 Sonnet"""
         if not self.claude_client:
             raise ValueError("Claude API key not configured")
 
         try:
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-            ext = filename.lower().split('.')[-1]
-            media_type = f"image/{ext if ext in ['jpeg', 'jpg', 'png', 'gif', 'webp'] else 'jpeg'}"
+            image = await payload.prepared(CLAUDE_VISION_PROFILE)
 
-            message = self.claude_client.messages.create(
-                model=model.value,
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": base64_image,
+            with track_provider_call("anthropic", model.value, "analyze", len(image.data)) as call:
+                request = dict(
+                    model=model.value,
+                    max_tokens=1024,
+                    messages=[{
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "image",
+                                "source": {
+                                    "type": "base64",
+                                    "media_type": image.media_type,
+                                    "data": image.to_base64(),
+                                },
                             },
-                        },
-                        {
-                            "type": "text",
-                            "text": self._get_analysis_prompt()
-                        }
-                    ],
-                }]
-            )
-
-            return self._parse_analysis_response(message.content[0].text, "claude")
+                            {
+                                "type": "text",
+                                "text": prompt_registry.analysis_prompt
+                            }
+                        ],
+                    }, JSON_PREFILL]
+                )
+                if settings.ANALYSIS_STREAMING:
+                    stream = await call_provider("anthropic", self.claude_client.messages.create, stream=True, **request)
+                    # The answer continues the prefilled "{"
+                    parsed = AnalysisStream("{")
+                    async for text in claude_deltas(stream, call):
+                        parsed.feed(text)
+                    analysis = self._parse_analysis_stream(parsed, "claude")
+                else:
+                    message = await call_provider("anthropic", self.claude_client.messages.create, **request)
+                    call.record_usage(message.usage)
+                    analysis = self._parse_analysis_response("{" + message.content[0].text, "claude")
+                if analysis.failed:
+                    call.mark_fallback()
+            return analysis
 
         except Exception as e:
-            print(f"Claude analysis error: {str(e)}")
+            logger.warning("Claude analysis error: %s", e)
             return self._get_fallback_analysis(str(e))
 
-    def _get_analysis_prompt(self) -> str:
-        """Get the analysis prompt for image analysis"""
-        return """Analyze this music-related image in detail and provide:
-
-1. **Instruments detected**: List all visible musical instruments
-2. **Musicians count**: Number of people visible
-3. **Scene type**: (studio, live_performance, rehearsal, outdoor_festival, street_performance, recording_session)
-4. **Musical genre/style**: Identify the genre (jazz, rock, classical, hip-hop, electronic, folk, world, fusion, etc.)
-5. **Mood/Atmosphere**: Describe the overall feeling (energetic, intimate, melancholic, joyful, intense, relaxed)
-6. **Lighting & Colors**: Describe dominant colors and lighting type (warm, cool, dramatic, natural, stage lights)
-7. **Composition quality**: Rate the photo quality and composition
-8. **Suggested Instagram filters**: Based on colors and mood (Clarendon, Gingham, Juno, Lark, etc.)
-9. **Hashtags**: 15 highly relevant and trending hashtags
-10. **Best caption angle**: What aspect to emphasize (energy, intimacy, technique, venue, etc.)
-
-Return ONLY valid JSON in this exact format:
-{
-    "detected_objects": ["instrument1", "musician", "equipment"],
-    "instruments": ["guitar", "drums"],
-    "musician_count": 2,
-    "scene_type": "live_performance",
-    "genre": "jazz",
-    "subgenre": "bebop",
-    "mood": "energetic and vibrant",
-    "lighting": "warm stage lights with dramatic shadows",
-    "dominant_colors": ["#1a1a2e", "#eebf3f", "#c73e1d"],
-    "composition_quality": "professional",
-    "suggested_filters": ["Clarendon", "Juno", "Lark"],
-    "suggested_tags": ["#jazz", "#livemusic", "#concert", "#bebop", "#jazzmusician", "#musicphotography", "#concertphotography", "#liveperformance", "#jazzclub", "#musiclife", "#jazznight", "#instamusic", "#musician", "#musiclover", "#jazzlove"],
-    "confidence": 0.95,
-    "caption_angle": "emphasize the energy and crowd engagement",
-    "description": "Brief description of the scene"
-}"""
-
     async def generate_caption_with_style(
         self,
-        analysis: dict,
+        analysis: Analysis,
         style: CaptionStyle = CaptionStyle.CASUAL,
         language: Language = Language.FRENCH,
         musicians: Optional[List[str]] = None,
@@ -189,10 +319,112 @@ Return ONLY valid JSON in this exact format:
             return await self._generate_with_claude(
                 analysis, style, language, musicians, venue, custom_context, model
             )
+        else:
+            raise ValueError(f"Unsupported model: {model}")
+
+    async def generate_caption_variants(
+        self,
+        analysis: Analysis,
+        variants: List[tuple],
+        musicians: Optional[List[str]] = None,
+        venue: Optional[str] = None,
+        custom_context: Optional[str] = None,
+        model: AIModel = AIModel.GPT4
+    ) -> Dict[str, dict]:
+        """
+        Captions for several (style, language) pairs, keyed "style:language"
+        Up to CAPTION_VARIANTS_PER_CALL variants share one structured call;
+        larger requests fan out into concurrent calls. Variants a call fails
+        to return get the fallback caption
+        """
+        if model not in (AIModel.GPT4_VISION, AIModel.GPT4, AIModel.CLAUDE_SONNET, AIModel.CLAUDE_HAIKU):
+            raise ValueError(f"Unsupported model: {model}")
+        if model.provider == "anthropic" and not self.claude_client:
+            raise ValueError("Claude API key not configured")
+
+        pairs = list(dict.fromkeys((CaptionStyle(style), Language(language)) for style, language in variants))
+        size = settings.CAPTION_VARIANTS_PER_CALL
+        chunks = await asyncio.gather(*(
+            self._generate_variant_chunk(analysis, pairs[i:i + size], musicians, venue, custom_context, model)
+            for i in range(0, len(pairs), size)
+        ))
+        return {key: result for chunk in chunks for key, result in chunk.items()}
+
+    async def _generate_variant_chunk(
+        self,
+        analysis: Analysis,
+        pairs: List[tuple],
+        musicians: Optional[List[str]],
+        venue: Optional[str],
+        custom_context: Optional[str],
+        model: AIModel
+    ) -> Dict[str, dict]:
+        prompt = prompt_registry.variants(pairs)
+        request = prompt.request(analysis, musicians, venue, custom_context)
+        max_tokens = min(4096, VARIANT_MAX_TOKENS * len(pairs))
+        captions = {}
+
+        try:
+            with track_provider_call(model.provider, model.value, "generate", prompt.system_bytes + len(request.encode())) as call:
+                if model.provider == "anthropic":
+                    message = await call_provider(
+                        "anthropic", self.claude_client.messages.create,
+                        model=model.value,
+                        max_tokens=max_tokens,
+                        system=prompt.system,
+                        messages=[{
+                            "role": "user",
+                            "content": request
+                        }, JSON_PREFILL]
+                    )
+                    call.record_usage(message.usage)
+                    content = "{" + message.content[0].text
+                else:
+                    response = await call_provider(
+                        "openai", self.openai_client.chat.completions.create,
+                        model=model.value,
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": prompt.system
+                            },
+                            {
+                                "role": "user",
+                                "content": request
+                            }
+                        ],
+                        max_tokens=max_tokens,
+                        temperature=0.8,
+                        **json_mode(model.value)
+                    )
+                    call.record_usage(response.usage)
+                    content = response.choices[0].message.content
+
+                parsed = parse_json_object(content)
+                captions = {key: text.strip() for key, text in parsed.items() if isinstance(text, str) and text.strip()}
+                if any(key not in captions for key in prompt.keys):
+                    call.mark_fallback()
+
+        except Exception as e:
+            logger.warning("Caption variants generation error (%s): %s", model.value, e)
+
+        results = {}
+        for style, language in pairs:
+            key = variant_key(style, language)
+            if key in captions:
+                results[key] = {
+                    "caption": captions[key],
+                    "hashtags": [word for word in captions[key].split() if word.startswith('#')],
+                    "style": style.value,
+                    "language": language.value
+                }
+            else:
+                results[key] = self._get_fallback_caption(analysis, style, language)
+        return results
 
     async def _generate_with_openai(
         self,
-        analysis: dict,
+        analysis: Analysis,
         style: CaptionStyle,
         language: Language,
         musicians: Optional[List[str]],
@@ -202,25 +434,27 @@ Return ONLY valid JSON in this exact format:
     ) -> dict:
         """Generate caption using OpenAI"""
         try:
-            prompt = self._build_caption_prompt(
-                analysis, style, language, musicians, venue, custom_context
-            )
-
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt_for_style(style, language)
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=400,
-                temperature=0.8
-            )
+            prompt = prompt_registry.caption(style, language)
+            request = prompt.request(analysis, musicians, venue, custom_context)
+
+            with track_provider_call("openai", "gpt-4", "generate", prompt.system_bytes + len(request.encode())) as call:
+                response = await call_provider(
+                    "openai", self.openai_client.chat.completions.create,
+                    model="gpt-4",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": prompt.system
+                        },
+                        {
+                            "role": "user",
+                            "content": request
+                        }
+                    ],
+                    max_tokens=400,
+                    temperature=0.8
+                )
+                call.record_usage(response.usage)
 
             caption = response.choices[0].message.content.strip()
             hashtags = [word for word in caption.split() if word.startswith('#')]
@@ -234,12 +468,12 @@ Return ONLY valid JSON in this exact format:
             }
 
         except Exception as e:
-            print(f"OpenAI caption generation error: {str(e)}")
+            logger.warning("OpenAI caption generation error: %s", e)
             return self._get_fallback_caption(analysis, style, language)
 
     async def _generate_with_claude(
         self,
-        analysis: dict,
+        analysis: Analysis,
         style: CaptionStyle,
         language: Language,
         musicians: Optional[List[str]],
@@ -252,19 +486,21 @@ Return ONLY valid JSON in this exact format:
             raise ValueError("Claude API key not configured")
 
         try:
-            prompt = self._build_caption_prompt(
-                analysis, style, language, musicians, venue, custom_context
-            )
-
-            message = self.claude_client.messages.create(
-                model=model.value,
-                max_tokens=500,
-                system=self._get_system_prompt_for_style(style, language),
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            prompt = prompt_registry.caption(style, language)
+            request = prompt.request(analysis, musicians, venue, custom_context)
+
+            with track_provider_call("anthropic", model.value, "generate", prompt.system_bytes + len(request.encode())) as call:
+                message = await call_provider(
+                    "anthropic", self.claude_client.messages.create,
+                    model=model.value,
+                    max_tokens=500,
+                    system=prompt.system,
+                    messages=[{
+                        "role": "user",
+                        "content": request
+                    }]
+                )
+                call.record_usage(message.usage)
 
             caption = message.content[0].text.strip()
             hashtags = [word for word in caption.split() if word.startswith('#')]
@@ -278,159 +514,172 @@ Return ONLY valid JSON in this exact format:
             }
 
         except Exception as e:
-            print(f"Claude caption generation error: {str(e)}")
+            logger.warning("Claude caption generation error: %s", e)
             return self._get_fallback_caption(analysis, style, language)
 
-    def _build_caption_prompt(
+    async def stream_caption_with_style(
+        self,
+        analysis: Analysis,
+        style: CaptionStyle = CaptionStyle.CASUAL,
+        language: Language = Language.FRENCH,
+        musicians: Optional[List[str]] = None,
+        venue: Optional[str] = None,
+        custom_context: Optional[str] = None,
+        model: AIModel = AIModel.GPT4
+    ) -> AsyncIterator[dict]:
+        """
+        Stream caption generation as events
+        Yields {"type": "token"} and {"type": "hashtag"} events, then one
+        {"type": "done"} event with the same shape as generate_caption_with_style
+        """
+        if model in [AIModel.GPT4_VISION, AIModel.GPT4]:
+            chunks = self._stream_with_openai(analysis, style, language, musicians, venue, custom_context)
+            model_used = "openai-gpt4"
+        elif model in [AIModel.CLAUDE_SONNET, AIModel.CLAUDE_HAIKU]:
+            if not self.claude_client:
+                raise ValueError("Claude API key not configured")
+            chunks = self._stream_with_claude(analysis, style, language, musicians, venue, custom_context, model)
+            model_used = f"claude-{model.value}"
+        else:
+            raise ValueError(f"Unsupported model: {model}")
+
+        extractor = HashtagExtractor()
+        parts = []
+        try:
+            async for text in chunks:
+                parts.append(text)
+                yield {"type": "token", "text": text}
+                for tag in extractor.feed(text):
+                    yield {"type": "hashtag", "tag": tag}
+        except Exception as e:
+            logger.warning("Caption streaming error: %s", e)
+            yield {"type": "done", **self._get_fallback_caption(analysis, style, language), "error": str(e)}
+            return
+
+        for tag in extractor.flush():
+            yield {"type": "hashtag", "tag": tag}
+
+        caption = "".join(parts).strip()
+        yield {
+            "type": "done",
+            "caption": caption,
+            "hashtags": [word for word in caption.split() if word.startswith('#')],
+            "style": style.value,
+            "language": language.value,
+            "model_used": model_used
+        }
+
+    async def _stream_with_openai(
         self,
-        analysis: dict,
+        analysis: Analysis,
         style: CaptionStyle,
         language: Language,
         musicians: Optional[List[str]],
         venue: Optional[str],
         custom_context: Optional[str]
-    ) -> str:
-        """Build the caption generation prompt"""
-
-        context_parts = []
-        if musicians:
-            context_parts.append(f"Musicians: {', '.join(musicians)}")
-        if venue:
-            context_parts.append(f"Venue: {venue}")
-        if custom_context:
-            context_parts.append(f"Additional context: {custom_context}")
-
-        context = "\n".join(context_parts) if context_parts else "No additional context"
-
-        lang_names = {
-            Language.FRENCH: "French",
-            Language.ENGLISH: "English",
-            Language.SPANISH: "Spanish",
-            Language.GERMAN: "German",
-            Language.ITALIAN: "Italian"
-        }
+    ) -> AsyncIterator[str]:
+        """Stream caption text deltas from OpenAI"""
+        prompt = prompt_registry.caption(style, language)
+        request = prompt.request(analysis, musicians, venue, custom_context)
+
+        # Streamed chat completions do not report token usage in this SDK version
+        with track_provider_call("openai", "gpt-4", "generate", prompt.system_bytes + len(request.encode())) as call:
+            stream = await call_provider(
+                "openai", self.openai_client.chat.completions.create,
+                model="gpt-4",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": prompt.system
+                    },
+                    {
+                        "role": "user",
+                        "content": request
+                    }
+                ],
+                max_tokens=400,
+                temperature=0.8,
+                stream=True
+            )
 
-        return f"""Generate an Instagram caption in {lang_names[language]} for this music photo.
-
-**Image Analysis:**
-- Genre: {analysis.get('genre', 'music')} {f"({analysis.get('subgenre', '')})" if analysis.get('subgenre') else ''}
-- Scene: {analysis.get('scene_type', 'music performance')}
-- Mood: {analysis.get('mood', 'creative')}
-- Instruments: {', '.join(analysis.get('instruments', ['instruments']))}
-- Lighting: {analysis.get('lighting', 'stage lighting')}
-- Caption Angle: {analysis.get('caption_angle', 'general music vibe')}
-
-**Context:**
-{context}
-
-**Style Requirements:**
-{self._get_style_requirements(style)}
-
-**Format:**
-- 2-4 sentences in {lang_names[language]}
-- Appropriate emojis for the style
-- End with 10-15 relevant hashtags
-- Optimized for Instagram engagement
-
-Return ONLY the caption text, nothing else."""
-
-    def _get_style_requirements(self, style: CaptionStyle) -> str:
-        """Get specific requirements for each style"""
-        requirements = {
-            CaptionStyle.PROFESSIONAL: """
-- Professional and polished tone
-- Focus on technical aspects and artistry
-- Sophisticated vocabulary
-- Minimal emojis (max 2-3, professional ones only)
-- Industry-relevant hashtags""",
-
-            CaptionStyle.CASUAL: """
-- Friendly and conversational tone
-- Relatable and authentic voice
-- Moderate emoji use (4-6)
-- Mix of popular and niche hashtags
-- Feels like talking to a friend""",
-
-            CaptionStyle.POETIC: """
-- Artistic and lyrical language
-- Metaphors and imagery
-- Evocative descriptions
-- Selective emoji use (2-3, symbolic)
-- Poetic/artistic hashtags""",
-
-            CaptionStyle.ENERGETIC: """
-- High energy and enthusiasm
-- Exclamation points and dynamic language
-- Generous emoji use (6-8)
-- Trending and viral hashtags
-- Captures excitement and momentum""",
-
-            CaptionStyle.MINIMAL: """
-- Short and concise (1-2 sentences max)
-- No or very minimal emojis (0-1)
-- Simple, direct language
-- Essential hashtags only (5-8)
-- Let the image speak""",
-
-            CaptionStyle.STORYTELLING: """
-- Narrative structure with beginning/middle/end
-- Sets the scene and builds atmosphere
-- Personal and engaging
-- Strategic emoji use (3-5)
-- Story-focused hashtags"""
-        }
-        return requirements.get(style, requirements[CaptionStyle.CASUAL])
-
-    def _get_system_prompt_for_style(self, style: CaptionStyle, language: Language) -> str:
-        """Get system prompt based on style"""
-        base = "You are an expert social media content creator specializing in music and Instagram captions."
-
-        style_prompts = {
-            CaptionStyle.PROFESSIONAL: "You write professional, polished content for established musicians and industry professionals.",
-            CaptionStyle.CASUAL: "You write friendly, authentic captions that feel personal and relatable.",
-            CaptionStyle.POETIC: "You write artistic, lyrical captions with beautiful imagery and metaphors.",
-            CaptionStyle.ENERGETIC: "You write high-energy, enthusiastic captions that capture excitement and momentum.",
-            CaptionStyle.MINIMAL: "You write minimal, concise captions that are direct and impactful.",
-            CaptionStyle.STORYTELLING: "You write narrative captions that tell compelling stories and set the scene."
-        }
+            async for text in openai_deltas(stream, call):
+                yield text
 
-        return f"{base} {style_prompts[style]} Always write in perfect, native-level {language.value.upper()}."
+    async def _stream_with_claude(
+        self,
+        analysis: Analysis,
+        style: CaptionStyle,
+        language: Language,
+        musicians: Optional[List[str]],
+        venue: Optional[str],
+        custom_context: Optional[str],
+        model: AIModel
+    ) -> AsyncIterator[str]:
+        """Stream caption text deltas from Claude"""
+        prompt = prompt_registry.caption(style, language)
+        request = prompt.request(analysis, musicians, venue, custom_context)
+
+        with track_provider_call("anthropic", model.value, "generate", prompt.system_bytes + len(request.encode())) as call:
+            stream = await call_provider(
+                "anthropic", self.claude_client.messages.create,
+                model=model.value,
+                max_tokens=500,
+                system=prompt.system,
+                messages=[{
+                    "role": "user",
+                    "content": request
+                }],
+                stream=True
+            )
 
-    def _parse_analysis_response(self, content: str, source: str) -> dict:
-        """Parse AI response and extract JSON"""
-        import json
+            async for text in claude_deltas(stream, call):
+                yield text
+
+    def _parse_analysis_response(self, content: str, source: str) -> Analysis:
+        """Recover the analysis JSON from a response and validate it field by field"""
         try:
-            start = content.find('{')
-            end = content.rfind('}') + 1
-            if start != -1 and end != 0:
-                return json.loads(content[start:end])
-            else:
-                return self._get_fallback_analysis(f"No JSON found in {source} response")
-        except json.JSONDecodeError as e:
-            return self._get_fallback_analysis(f"JSON parse error from {source}: {str(e)}")
+            data = parse_json_object(content)
+        except JSONParseError as e:
+            return self._get_fallback_analysis(f"{e} ({source})")
 
-    def _get_fallback_analysis(self, error: str = "") -> dict:
-        """Fallback analysis when AI fails"""
-        return {
-            "detected_objects": ["musician", "instrument"],
-            "instruments": ["unknown"],
-            "musician_count": 1,
-            "scene_type": "music",
-            "genre": "music",
-            "subgenre": "",
-            "mood": "creative",
-            "lighting": "stage lighting",
-            "dominant_colors": ["#1a1a2e", "#eebf3f"],
-            "composition_quality": "good",
-            "suggested_filters": ["Clarendon", "Juno"],
-            "suggested_tags": ["#music", "#musician", "#livemusic"],
-            "confidence": 0.5,
-            "caption_angle": "general music vibe",
-            "description": "Music performance",
-            "error": error
-        }
+        analysis = Analysis.from_response(data)
+        if not analysis.to_dict():
+            return self._get_fallback_analysis(f"No usable analysis fields in {source} response")
+        return analysis
 
-    def _get_fallback_caption(self, analysis: dict, style: CaptionStyle, language: Language) -> dict:
+    def _parse_analysis_stream(self, stream: AnalysisStream, source: str) -> Analysis:
+        """The analysis validated while the response streamed in, or the fallback"""
+        try:
+            analysis = stream.result()
+        except JSONParseError as e:
+            return self._get_fallback_analysis(f"{e} ({source})")
+
+        if not analysis.to_dict():
+            return self._get_fallback_analysis(f"No usable analysis fields in {source} response")
+        return analysis
+
+    def _get_fallback_analysis(self, error: str = "") -> Analysis:
+        """Fallback analysis when AI fails"""
+        return Analysis(
+            detected_objects=["musician", "instrument"],
+            instruments=["unknown"],
+            musician_count=1,
+            scene_type="music",
+            genre="music",
+            subgenre="",
+            mood="creative",
+            lighting="stage lighting",
+            dominant_colors=["#1a1a2e", "#eebf3f"],
+            composition_quality="good",
+            suggested_filters=["Clarendon", "Juno"],
+            suggested_tags=["#music", "#musician", "#livemusic"],
+            confidence=0.5,
+            caption_angle="general music vibe",
+            description="Music performance",
+            error=error
+        )
+
+    def _get_fallback_caption(self, analysis: Analysis, style: CaptionStyle, language: Language) -> dict:
         """Fallback caption when AI fails"""
         captions = {
             Language.FRENCH: "🎵 Session musicale intense ! L'énergie était incroyable. 🎸✨\n\n#music #livemusic #musician #concert #musiclife",
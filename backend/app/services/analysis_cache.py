@@ -0,0 +1,184 @@
+"""
+Content-addressed analysis cache
+Two tiers: an in-process LRU and the analysis_cache database table
+"""
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import AnalysisCacheEntry
+from app.schemas.schemas import Analysis
+
+logger = logging.getLogger(__name__)
+
+# Prune the persistent tier once every N writes
+PRUNE_EVERY_N_STORES = 100
+
+class AnalysisCache:
+    def __init__(
+        self,
+        max_entries: int = settings.ANALYSIS_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.ANALYSIS_CACHE_TTL_SECONDS,
+        persistent_max_entries: int = settings.ANALYSIS_CACHE_PERSISTENT_MAX_ENTRIES,
+        persistent: bool = True
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent_max_entries = persistent_max_entries
+        self.persistent = persistent
+
+        # key -> (expires_at epoch seconds, Analysis); instances are immutable, so hits share them
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stores_since_prune = 0
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(digest: str, model: str, prompt_version: str) -> str:
+        """Build the cache key from a content hash, model id and prompt version"""
+        return f"{digest}:{model}:{prompt_version}"
+
+    async def get(self, key: str) -> Optional[Analysis]:
+        """Return a cached analysis or None"""
+        cached = self._get_memory(key)
+        if cached is not None:
+            self.memory_hits += 1
+            return cached
+
+        if self.persistent:
+            try:
+                cached = await self._get_persistent(key)
+            except Exception as e:
+                logger.warning("Analysis cache read error: %s", e)
+                cached = None
+
+            if cached is not None:
+                self.persistent_hits += 1
+                analysis = Analysis.model_validate_json(cached[1])
+                self._set_memory(key, cached[0], analysis)
+                return analysis
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, model: str, prompt_version: str, analysis: Analysis) -> None:
+        """Store an analysis in both tiers (failed analyses are never cached)"""
+        if analysis.failed:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        self._set_memory(key, expires_at, analysis)
+        self.stores += 1
+
+        if self.persistent:
+            try:
+                await self._set_persistent(key, model, prompt_version, analysis.to_json())
+            except Exception as e:
+                logger.warning("Analysis cache write error: %s", e)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self.max_entries
+        }
+
+    # ============ IN-PROCESS TIER ============
+
+    def _get_memory(self, key: str) -> Optional[Analysis]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+
+        expires_at, analysis = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            self.expirations += 1
+            return None
+
+        self._memory.move_to_end(key)
+        return analysis
+
+    def _set_memory(self, key: str, expires_at: float, analysis: Analysis) -> None:
+        self._memory[key] = (expires_at, analysis)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    # ============ PERSISTENT TIER ============
+
+    async def _get_persistent(self, key: str) -> Optional[tuple]:
+        async with AsyncSessionLocal() as db:
+            entry = await db.get(AnalysisCacheEntry, key)
+            if entry is None:
+                return None
+
+            expires_at = entry.expires_at
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= datetime.now(timezone.utc):
+                await db.delete(entry)
+                await db.commit()
+                self.expirations += 1
+                return None
+
+            return expires_at.timestamp(), entry.analysis
+
+    async def _set_persistent(self, key: str, model: str, prompt_version: str, payload: str) -> None:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            await db.merge(AnalysisCacheEntry(
+                cache_key=key,
+                model=model,
+                prompt_version=prompt_version,
+                analysis=payload,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            ))
+            await db.commit()
+
+            self._stores_since_prune += 1
+            if self._stores_since_prune >= PRUNE_EVERY_N_STORES:
+                self._stores_since_prune = 0
+                await self._prune_persistent(db, now)
+
+    async def _prune_persistent(self, db, now: datetime) -> None:
+        """Drop expired rows, then the oldest rows beyond the size limit"""
+        result = await db.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.expires_at <= now))
+        self.expirations += result.rowcount or 0
+
+        total = await db.scalar(select(func.count()).select_from(AnalysisCacheEntry))
+        overflow = (total or 0) - self.persistent_max_entries
+        if overflow > 0:
+            oldest = select(AnalysisCacheEntry.cache_key).order_by(
+                AnalysisCacheEntry.created_at.asc()
+            ).limit(overflow)
+            result = await db.execute(
+                delete(AnalysisCacheEntry).where(AnalysisCacheEntry.cache_key.in_(oldest))
+            )
+            self.evictions += result.rowcount or 0
+
+        await db.commit()
+
+# Singleton instance
+analysis_cache = AnalysisCache()
@@ -0,0 +1,147 @@
+"""
+Per-user analytics rollups
+Totals and per-value counts (style, venue, language, model) are upserted in
+the transaction that inserts the captions, so /analytics reads a few rollup
+rows instead of scanning the user's caption history
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models.models import Caption, UserAnalytics, UserAnalyticsCount
+
+# Caption columns counted per value
+DIMENSIONS = ("style", "venue", "language", "model")
+
+# Entries returned per dimension by /analytics
+TOP_N = 10
+
+# Key holding the value in each /analytics entry, where it is not the dimension
+# name (the dashboard reads top venues as {name, count})
+ENTRY_KEYS = {"venue": "name"}
+
+# Rows read per round trip by the backfill
+BACKFILL_CHUNK = 5000
+
+_UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+def hashtag_count(caption_text: str) -> int:
+    return sum(1 for word in caption_text.split() if word.startswith('#'))
+
+def _rollup_deltas(captions: Iterable[dict]) -> Tuple[Dict[int, List[int]], Counter]:
+    """Per-user [captions, characters, hashtags] and per-(user, dimension, value) counts"""
+    totals: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0])
+    counts: Counter = Counter()
+    for caption in captions:
+        text = caption["caption_text"] or ""
+        total = totals[caption["user_id"]]
+        total[0] += 1
+        total[1] += len(text)
+        total[2] += hashtag_count(text)
+        for dimension in DIMENSIONS:
+            value = caption.get(dimension)
+            if value:
+                counts[(caption["user_id"], dimension, value)] += 1
+    return totals, counts
+
+async def record_captions(db: AsyncSession, captions: List[dict]) -> None:
+    """
+    Add captions (Caption column values) to their users' rollups
+    Call before the commit that inserts them so both land together
+    """
+    totals, counts = _rollup_deltas(captions)
+    if not totals:
+        return
+
+    upsert = _UPSERTS[db.bind.dialect.name]
+
+    # Sorted keys: concurrent writers lock rollup rows in the same order
+    stmt = upsert(UserAnalytics).values([
+        {
+            "user_id": user_id,
+            "total_captions": total[0],
+            "total_caption_chars": total[1],
+            "total_hashtags": total[2]
+        }
+        for user_id, total in sorted(totals.items())
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserAnalytics.user_id],
+        set_={
+            "total_captions": UserAnalytics.total_captions + stmt.excluded.total_captions,
+            "total_caption_chars": UserAnalytics.total_caption_chars + stmt.excluded.total_caption_chars,
+            "total_hashtags": UserAnalytics.total_hashtags + stmt.excluded.total_hashtags,
+            "updated_at": func.now()
+        }
+    ))
+
+    if counts:
+        stmt = upsert(UserAnalyticsCount).values([
+            {"user_id": user_id, "dimension": dimension, "value": value, "count": count}
+            for (user_id, dimension, value), count in sorted(counts.items())
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserAnalyticsCount.user_id, UserAnalyticsCount.dimension, UserAnalyticsCount.value],
+            set_={"count": UserAnalyticsCount.count + stmt.excluded.count}
+        ))
+
+async def user_analytics(db: AsyncSession, user_id: int) -> dict:
+    """Analytics for one user, read from the rollups"""
+    summary = await db.get(UserAnalytics, user_id)
+    rows = (await db.execute(
+        select(UserAnalyticsCount.dimension, UserAnalyticsCount.value, UserAnalyticsCount.count)
+        .where(UserAnalyticsCount.user_id == user_id)
+        .order_by(UserAnalyticsCount.count.desc(), UserAnalyticsCount.value)
+    )).all()
+
+    top: Dict[str, list] = {dimension: [] for dimension in DIMENSIONS}
+    for dimension, value, count in rows:
+        if dimension in top and len(top[dimension]) < TOP_N:
+            top[dimension].append({ENTRY_KEYS.get(dimension, dimension): value, "count": count})
+
+    total = summary.total_captions if summary else 0
+    return {
+        "total_captions_generated": total,
+        "total_media_analyzed": total,
+        "most_used_styles": top["style"],
+        "top_venues": top["venue"],
+        "languages": top["language"],
+        "models": top["model"],
+        "avg_caption_length": round(summary.total_caption_chars / total) if total else 0,
+        "total_hashtags_used": summary.total_hashtags if summary else 0
+    }
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recompute every rollup from the captions table (sync; run by backfill_analytics.py)
+    Returns the number of captions counted
+    """
+    columns = [Caption.user_id, Caption.caption_text, *(getattr(Caption, d) for d in DIMENSIONS)]
+    rows = db.execute(select(*columns).execution_options(yield_per=BACKFILL_CHUNK)).mappings()
+    totals, counts = _rollup_deltas(rows)
+
+    db.execute(delete(UserAnalyticsCount))
+    db.execute(delete(UserAnalytics))
+    if totals:
+        db.execute(insert(UserAnalytics), [
+            {
+                "user_id": user_id,
+                "total_captions": total[0],
+                "total_caption_chars": total[1],
+                "total_hashtags": total[2]
+            }
+            for user_id, total in totals.items()
+        ])
+    if counts:
+        db.execute(insert(UserAnalyticsCount), [
+            {"user_id": user_id, "dimension": dimension, "value": value, "count": count}
+            for (user_id, dimension, value), count in counts.items()
+        ])
+    db.commit()
+    return sum(total[0] for total in totals.values())
@@ -0,0 +1,351 @@
+"""
+Batch analyze-and-generate jobs
+Uploads are spooled to a temp directory and processed in the background
+with bounded concurrency per provider, under the same global in-flight cap
+as interactive AI requests
+"""
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import BatchJob, BatchJobItem
+from app.services.caption_store import save_captions
+from app.services.ai_service import (
+    multi_model_ai_service,
+    AIModel,
+    CaptionStyle,
+    Language
+)
+from app.services.admission import admission_controller
+from app.services.image_preprocessing import MediaPayload, hash_stream
+from app.services.model_router import model_router, ANALYZE, GENERATE
+
+# Copy buffer when spooling uploads and zip members to the job directory
+COPY_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PREFIXES = ('image/', 'video/')
+FINISHED_STATUSES = ("completed", "failed")
+
+class BatchError(ValueError):
+    """Invalid batch upload (surfaced to the client as a 400)"""
+
+def _is_zip(filename: str, content_type: Optional[str]) -> bool:
+    return (content_type or "").endswith("zip") or filename.lower().endswith(".zip")
+
+def _guess_media_type(filename: str) -> Optional[str]:
+    media_type, _ = mimetypes.guess_type(filename)
+    return media_type if media_type and media_type.startswith(MEDIA_PREFIXES) else None
+
+def _copy_limited(src, path: str, filename: str) -> None:
+    """Copy a file object to path, refusing files over MAX_UPLOAD_BYTES"""
+    copied = 0
+    with open(path, "wb") as out:
+        while True:
+            chunk = src.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            copied += len(chunk)
+            if copied > settings.MAX_UPLOAD_BYTES:
+                raise BatchError(
+                    f"{filename}: file exceeds the {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit"
+                )
+            out.write(chunk)
+
+class BatchService:
+    def __init__(self, concurrency_per_provider: int = settings.BATCH_CONCURRENCY_PER_PROVIDER):
+        self.concurrency_per_provider = concurrency_per_provider
+        # Shared by every job in this worker so batches only use part of the provider quota
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tasks = set()
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self.concurrency_per_provider)
+        return self._semaphores[provider]
+
+    @asynccontextmanager
+    async def _provider_slot(self, provider: str):
+        """This worker's batch share, then a slot under the global in-flight cap"""
+        async with self._semaphore(provider), admission_controller.background_slot(provider):
+            yield
+
+    # ============ INGESTION ============
+
+    def spool_uploads(self, uploads: List[tuple]) -> tuple:
+        """
+        Copy uploads (filename, content_type, file object) to a temp directory
+        Zip archives are expanded; returns (workdir, [(filename, content_type, path)])
+        """
+        workdir = tempfile.mkdtemp(prefix="caption-batch-")
+        entries = []
+        try:
+            for filename, content_type, fileobj in uploads:
+                if _is_zip(filename, content_type):
+                    entries.extend(self._extract_zip(fileobj, workdir, len(entries)))
+                elif content_type and content_type.startswith(MEDIA_PREFIXES):
+                    path = os.path.join(workdir, f"{len(entries):04d}")
+                    _copy_limited(fileobj, path, filename)
+                    entries.append((filename, content_type, path))
+                else:
+                    raise BatchError(f"{filename}: file must be an image, a video or a zip archive")
+
+                if len(entries) > settings.BATCH_MAX_FILES:
+                    raise BatchError(f"A batch is limited to {settings.BATCH_MAX_FILES} files")
+
+            if not entries:
+                raise BatchError("No image or video files found in upload")
+
+            return workdir, entries
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+
+    def _extract_zip(self, fileobj, workdir: str, offset: int) -> List[tuple]:
+        entries = []
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith('.') or "__MACOSX" in info.filename:
+                    continue
+                content_type = _guess_media_type(name)
+                if content_type is None:
+                    continue
+                if offset + len(entries) >= settings.BATCH_MAX_FILES:
+                    raise BatchError(f"A batch is limited to {settings.BATCH_MAX_FILES} files")
+
+                path = os.path.join(workdir, f"{offset + len(entries):04d}")
+                with archive.open(info) as src:
+                    _copy_limited(src, path, name)
+                entries.append((name, content_type, path))
+        return entries
+
+    # ============ JOBS ============
+
+    async def create_job(self, db, user_id: int, entries: List[tuple], options: dict) -> BatchJob:
+        """Persist a pending job and its items"""
+        job = BatchJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            status="pending",
+            total_items=len(entries),
+            options=json.dumps(options)
+        )
+        db.add(job)
+        db.add_all([
+            BatchJobItem(
+                job_id=job.id,
+                position=position,
+                filename=filename,
+                content_type=content_type,
+                status="pending"
+            )
+            for position, (filename, content_type, _) in enumerate(entries)
+        ])
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    def start(self, job_id: str, workdir: str, entries: List[tuple]) -> None:
+        """Process a job in the background of the current event loop"""
+        task = asyncio.create_task(self.run_job(job_id, workdir, [path for _, _, path in entries]))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run_job(self, job_id: str, workdir: str, paths: List[str]) -> None:
+        try:
+            user_id, options, items = await self._mark_running(job_id)
+            results = await asyncio.gather(*(
+                self._process_item(item_id, job_id, filename, content_type, paths[position], options)
+                for item_id, position, filename, content_type in items
+            ))
+            captions = [
+                {"user_id": user_id, **caption}
+                for caption in results if caption is not None
+            ]
+            await self._finish_job(job_id, captions)
+        except Exception as e:
+            logger.error("Batch job %s failed: %s", job_id, e)
+            await self._fail_job(job_id, str(e))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    async def _process_item(
+        self,
+        item_id: int,
+        job_id: str,
+        filename: str,
+        content_type: Optional[str],
+        path: str,
+        options: dict
+    ) -> Optional[dict]:
+        analysis_model = AIModel(options["analysis_model"])
+        caption_model = AIModel(options["caption_model"])
+
+        try:
+            # auto: throttled under the provider the router currently prefers
+            analysis_provider = (
+                model_router.choose(ANALYZE)[0] if analysis_model is AIModel.AUTO else analysis_model
+            ).provider
+            async with self._provider_slot(analysis_provider):
+                # Decoded straight from the spooled file; only the downscaled image is held in memory
+                with open(path, "rb") as media:
+                    digest, _ = await asyncio.to_thread(hash_stream, media)
+                    payload = MediaPayload(media, filename, digest=digest, content_type=content_type)
+                    if analysis_model is AIModel.AUTO:
+                        analysis, _ = await model_router.route_analysis(payload, filename)
+                    else:
+                        analysis = await multi_model_ai_service.analyze_image_with_model(
+                            payload,
+                            filename,
+                            model=analysis_model
+                        )
+
+            caption_options = {
+                "style": CaptionStyle(options["style"]),
+                "language": Language(options["language"]),
+                "musicians": options.get("musicians"),
+                "venue": options.get("venue"),
+                "custom_context": options.get("custom_context")
+            }
+            caption_provider = (
+                model_router.choose(GENERATE)[0] if caption_model is AIModel.AUTO else caption_model
+            ).provider
+            async with self._provider_slot(caption_provider):
+                if caption_model is AIModel.AUTO:
+                    caption_result, routing = await model_router.route_caption(analysis, **caption_options)
+                    caption_model_used = routing["selected"] or "fallback"
+                else:
+                    caption_result = await multi_model_ai_service.generate_caption_with_style(
+                        analysis=analysis,
+                        model=caption_model,
+                        **caption_options
+                    )
+                    caption_model_used = caption_model.value
+
+            await self._record_item(job_id, item_id, {
+                "status": "completed",
+                "caption_text": caption_result["caption"],
+                "hashtags": json.dumps(caption_result["hashtags"]),
+                "analysis": analysis.to_json()
+            })
+
+            return {
+                "caption_text": caption_result["caption"],
+                "media_filename": filename,
+                "detected_objects": analysis.detected_objects,
+                "suggested_tags": analysis.suggested_tags,
+                "confidence": analysis.confidence,
+                "musicians": options.get("musicians"),
+                "venue": options.get("venue"),
+                "style": options["style"],
+                "language": options["language"],
+                "model": caption_model_used
+            }
+
+        except Exception as e:
+            await self._record_item(job_id, item_id, {
+                "status": "failed",
+                "error": str(e)
+            })
+            return None
+
+    # ============ PERSISTENCE ============
+
+    async def _mark_running(self, job_id: str) -> tuple:
+        async with AsyncSessionLocal() as db:
+            job = await db.get(BatchJob, job_id, options=[selectinload(BatchJob.items)])
+            job.status = "running"
+            await db.commit()
+            items = [(item.id, item.position, item.filename, item.content_type) for item in job.items]
+            return job.user_id, json.loads(job.options), items
+
+    async def _record_item(self, job_id: str, item_id: int, values: dict) -> None:
+        counter = BatchJob.completed_items if values["status"] == "completed" else BatchJob.failed_items
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(BatchJobItem)
+                .where(BatchJobItem.id == item_id)
+                .values(finished_at=datetime.now(timezone.utc), **values)
+            )
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job_id)
+                .values({counter.key: counter + 1})
+            )
+            await db.commit()
+
+    async def _finish_job(self, job_id: str, captions: List[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            # Bulk inserts for the whole batch (captions, links, rollups)
+            if captions:
+                await save_captions(db, captions)
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job_id)
+                .values(status="completed", finished_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+
+    async def _fail_job(self, job_id: str, error: str) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job_id)
+                .values(status="failed", error=error, finished_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+
+    async def get_job_snapshot(self, job_id: str, user_id: int, include_items: bool = True) -> Optional[dict]:
+        """Serialized job state, or None if the job does not belong to the user"""
+        async with AsyncSessionLocal() as db:
+            job = await db.get(BatchJob, job_id, options=[selectinload(BatchJob.items)])
+            if job is None or job.user_id != user_id:
+                return None
+            return serialize_job(job, include_items)
+
+def serialize_item(item: BatchJobItem) -> dict:
+    return {
+        "id": item.id,
+        "position": item.position,
+        "filename": item.filename,
+        "status": item.status,
+        "caption": item.caption_text,
+        "hashtags": json.loads(item.hashtags) if item.hashtags else [],
+        "analysis": json.loads(item.analysis) if item.analysis else None,
+        "error": item.error
+    }
+
+def serialize_job(job: BatchJob, include_items: bool = True) -> dict:
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "total_items": job.total_items,
+        "completed_items": job.completed_items,
+        "failed_items": job.failed_items,
+        "options": json.loads(job.options) if job.options else {},
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+    if include_items:
+        data["items"] = [serialize_item(item) for item in job.items]
+    return data
+
+# Singleton instance
+batch_service = BatchService()
@@ -0,0 +1,98 @@
+"""
+Caption persistence
+Every caption insert goes through save_captions: the caption rows, their
+hashtag / object / musician links and the analytics rollups are written in
+bulk in one transaction, so tag and object queries run in the database
+instead of json.loads-ing every row
+"""
+import json
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Caption, CaptionHashtag, CaptionObject, CaptionMusician
+from app.services.analytics import record_captions
+
+# Caption list columns: (normalized link table, its value column)
+LINK_TABLES = {
+    "suggested_tags": (CaptionHashtag, "tag"),
+    "detected_objects": (CaptionObject, "name"),
+    "musicians": (CaptionMusician, "name")
+}
+
+def normalize_tag(tag: str) -> Optional[str]:
+    tag = "".join(tag.split()).lower()
+    if not tag.strip("#"):
+        return None
+    return tag if tag.startswith("#") else f"#{tag}"
+
+def normalize_object(name: str) -> Optional[str]:
+    return " ".join(name.split()).lower() or None
+
+def normalize_musician(name: str) -> Optional[str]:
+    # Case-folded like objects, so "John Coltrane" and "john coltrane" are one musician
+    return " ".join(name.split()).lower() or None
+
+NORMALIZERS = {
+    "suggested_tags": normalize_tag,
+    "detected_objects": normalize_object,
+    "musicians": normalize_musician
+}
+
+def _link_values(column: str, values: Optional[Iterable[str]]) -> List[str]:
+    """Normalized, de-duplicated link values for one caption"""
+    normalize = NORMALIZERS[column]
+    return list(dict.fromkeys(v for v in (normalize(str(value)) for value in values or ()) if v))
+
+def _row(caption: dict) -> dict:
+    """Caption column values; the lists are also kept on the row as JSON for existing readers"""
+    musicians = caption.get("musicians")
+    return {
+        **caption,
+        "detected_objects": json.dumps(caption.get("detected_objects") or []),
+        "suggested_tags": json.dumps(caption.get("suggested_tags") or []),
+        "musicians": json.dumps(musicians) if musicians else None
+    }
+
+async def save_captions(db: AsyncSession, captions: List[dict]) -> List[int]:
+    """
+    Insert captions and everything derived from them; returns their ids
+    List columns (suggested_tags, detected_objects, musicians) are given as
+    lists. The caller commits
+    """
+    rows = [_row(caption) for caption in captions]
+    result = await db.execute(insert(Caption).returning(Caption.id, sort_by_parameter_order=True), rows)
+    caption_ids = list(result.scalars())
+
+    for column, (model, value_column) in LINK_TABLES.items():
+        links = [
+            {"caption_id": caption_id, "user_id": caption["user_id"], value_column: value}
+            for caption_id, caption in zip(caption_ids, captions)
+            for value in _link_values(column, caption.get(column))
+        ]
+        if links:
+            await db.execute(insert(model), links)
+
+    await record_captions(db, rows)
+    return caption_ids
+
+async def top_links(db: AsyncSession, column: str, user_id: int, limit: int) -> List[tuple]:
+    """Most frequent (value, count) of a link table for one user, counted by the database"""
+    model, value_column = LINK_TABLES[column]
+    value = getattr(model, value_column)
+    return (await db.execute(
+        select(value, func.count().label("count"))
+        .where(model.user_id == user_id)
+        .group_by(value)
+        .order_by(func.count().desc(), value)
+        .limit(limit)
+    )).all()
+
+def captions_linked_to(column: str, user_id: int, value: str):
+    """Subquery of a user's caption ids linked to a hashtag / object / musician"""
+    model, value_column = LINK_TABLES[column]
+    return select(model.caption_id).where(
+        model.user_id == user_id,
+        getattr(model, value_column) == NORMALIZERS[column](value)
+    )
@@ -0,0 +1,224 @@
+"""
+Image preprocessing before vision upload
+Applies EXIF orientation, downscales to the model's useful resolution,
+strips metadata and re-encodes to a size-bounded JPEG/WebP
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.core.config import settings
+
+SUPPORTED_EXTENSIONS = ['jpeg', 'jpg', 'png', 'gif', 'webp']
+
+# Quality ladder tried in order until the encoded image fits the byte budget
+QUALITY_STEPS = [85, 75, 65, 55, 45]
+
+# Read size for file-backed media (hashing, copying)
+READ_CHUNK_SIZE = 1024 * 1024
+
+class MediaTooLarge(ValueError):
+    """Media is bigger than the allowed upload size"""
+
+@dataclass(frozen=True)
+class ImageProfile:
+    """Largest image a provider makes use of; anything bigger is downsampled by the provider anyway"""
+    max_long_side: int
+    max_short_side: int
+    max_bytes: int = settings.IMAGE_MAX_ENCODED_BYTES
+
+# OpenAI high-detail vision fits the image in 2048x2048, then scales the short side to 768
+OPENAI_VISION_PROFILE = ImageProfile(max_long_side=2048, max_short_side=768)
+# Claude resizes anything over ~1.15 megapixels / 1568px on the long edge
+CLAUDE_VISION_PROFILE = ImageProfile(max_long_side=1568, max_short_side=1568)
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    media_type: str
+    original_bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    _base64: Optional[str] = field(default=None, repr=False)
+
+    def to_base64(self) -> str:
+        # Encoded once, then shared by every model that receives this image
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode('utf-8')
+        return self._base64
+
+# Pillow releases the GIL while decoding, resizing and encoding
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PREPROCESS_WORKERS,
+    thread_name_prefix="image-preprocess"
+)
+
+def guess_media_type(filename: str) -> str:
+    """Media type from the file extension (defaults to JPEG)"""
+    ext = filename.lower().split('.')[-1]
+    return f"image/{ext if ext in SUPPORTED_EXTENSIONS else 'jpeg'}"
+
+def _target_size(width: int, height: int, profile: ImageProfile) -> tuple:
+    long_side, short_side = max(width, height), min(width, height)
+    scale = min(1.0, profile.max_long_side / long_side, profile.max_short_side / short_side)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB") if img.mode != "RGB" else img
+
+def hash_stream(fileobj: BinaryIO, max_bytes: Optional[int] = None) -> Tuple[str, int]:
+    """
+    SHA-256 and size of a file object, read in chunks from the start
+    Raises MediaTooLarge as soon as more than max_bytes have been read
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise MediaTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+def _source_size(source: BinaryIO) -> int:
+    size = source.seek(0, io.SEEK_END)
+    source.seek(0)
+    return size
+
+def prepare_image(image_data: Union[bytes, BinaryIO], filename: str, profile: ImageProfile) -> PreparedImage:
+    """
+    Downscale and re-encode an image for a vision provider
+    Accepts bytes or a seekable file object (decoded straight from the file,
+    never copied into memory). Non-image payloads are passed through unchanged
+    """
+    source = io.BytesIO(image_data) if isinstance(image_data, bytes) else image_data
+    original_bytes = _source_size(source)
+
+    try:
+        img = Image.open(source)
+        target = _target_size(img.width, img.height, profile)
+
+        # JPEG only: let libjpeg decode directly at a reduced scale
+        img.draft("RGB", target)
+        img = ImageOps.exif_transpose(img)
+        img = _to_rgb(img)
+        img.thumbnail(_target_size(img.width, img.height, profile), Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, OSError):
+        source.seek(0)
+        return PreparedImage(
+            data=source.read(),
+            media_type=guess_media_type(filename),
+            original_bytes=original_bytes
+        )
+
+    output_format = settings.IMAGE_OUTPUT_FORMAT
+    media_type = "image/webp" if output_format == "WEBP" else "image/jpeg"
+
+    while True:
+        for quality in QUALITY_STEPS:
+            buffer = io.BytesIO()
+            # No exif/icc arguments: metadata is dropped on re-encode
+            img.save(buffer, format=output_format, quality=quality)
+            if buffer.tell() <= profile.max_bytes:
+                break
+
+        if buffer.tell() <= profile.max_bytes or min(img.size) <= 256:
+            break
+        img = img.resize((round(img.width * 0.75), round(img.height * 0.75)), Image.Resampling.LANCZOS)
+
+    return PreparedImage(
+        data=buffer.getvalue(),
+        media_type=media_type,
+        original_bytes=original_bytes,
+        width=img.width,
+        height=img.height
+    )
+
+async def prepare_image_async(image_data: Union[bytes, BinaryIO], filename: str, profile: ImageProfile) -> PreparedImage:
+    """Run prepare_image in the preprocessing worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, prepare_image, image_data, filename, profile)
+
+class MediaPayload:
+    """
+    Uploaded media shared across models in one request
+    Hashed once and prepared/encoded once per image profile. The data is
+    either bytes or a seekable file object such as a spooled upload; pass the
+    digest when it was already computed while the file was received
+    """
+    def __init__(
+        self,
+        data: Union[bytes, BinaryIO],
+        filename: str,
+        digest: Optional[str] = None,
+        content_type: Optional[str] = None
+    ):
+        self.data = data
+        self.filename = filename
+        self.content_type = content_type or mimetypes.guess_type(filename or "")[0]
+        self._digest = digest
+        self._prepared: Dict[ImageProfile, asyncio.Future] = {}
+        # A file object has a single cursor, so jobs reading it take turns
+        self._read_lock = threading.Lock()
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            if isinstance(self.data, bytes):
+                self._digest = hashlib.sha256(self.data).hexdigest()
+            else:
+                with self._read_lock:
+                    self._digest, _ = hash_stream(self.data)
+        return self._digest
+
+    @property
+    def is_video(self) -> bool:
+        return bool(self.content_type and self.content_type.startswith('video/'))
+
+    def copy_to(self, out: BinaryIO) -> None:
+        """Write the whole payload to a file object"""
+        if isinstance(self.data, bytes):
+            out.write(self.data)
+            return
+        with self._read_lock:
+            self.data.seek(0)
+            while True:
+                chunk = self.data.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+            self.data.seek(0)
+
+    def _prepare(self, profile: ImageProfile) -> PreparedImage:
+        if isinstance(self.data, bytes):
+            return prepare_image(self.data, self.filename, profile)
+        with self._read_lock:
+            return prepare_image(self.data, self.filename, profile)
+
+    async def prepared(self, profile: ImageProfile) -> PreparedImage:
+        """Prepared image for a profile; concurrent callers share one preprocessing job"""
+        job = self._prepared.get(profile)
+        if job is None:
+            loop = asyncio.get_running_loop()
+            job = loop.run_in_executor(_executor, self._prepare, profile)
+            self._prepared[profile] = job
+        # Shielded so a caller hitting its timeout does not cancel the job for the others
+        return await asyncio.shield(job)
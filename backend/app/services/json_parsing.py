@@ -0,0 +1,202 @@
+"""
+Tolerant JSON extraction for model responses
+Models wrap JSON in prose or code fences, leave trailing commas and get cut
+off by max_tokens. parse_json_object recovers the object in all of these
+cases; JSONObjectParser does the same incrementally over a token stream,
+yielding each top-level field as soon as it is complete
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Candidate '{' positions tried before falling back to repair
+MAX_START_CANDIDATES = 16
+
+_decoder = json.JSONDecoder()
+
+class JSONParseError(ValueError):
+    """No JSON object could be recovered from the text"""
+
+class JSONObjectParser:
+    """
+    Incremental parser for one JSON object arriving in chunks
+    feed() returns the top-level (key, value) pairs completed by the chunk;
+    a malformed member is skipped without losing the others
+    """
+    def __init__(self):
+        self.members: Dict[str, Any] = {}
+        self.complete = False
+        self._text = ""
+        self._pos = 0
+        self._member_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self._text += chunk
+        completed: List[Tuple[str, Any]] = []
+        text, i = self._text, self._pos
+
+        while i < len(text) and not self.complete:
+            ch = text[i]
+            if self._member_start is None:
+                if ch == '{':
+                    self._member_start, self._depth = i + 1, 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_member(text[self._member_start:i], completed)
+                    self.complete = True
+            elif ch == ',' and self._depth == 1:
+                self._close_member(text[self._member_start:i], completed)
+                self._member_start = i + 1
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def _close_member(self, member: str, completed: list) -> None:
+        member = member.strip()
+        if not member:
+            return  # empty object or trailing comma
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            try:
+                # e.g. a trailing comma inside a list value
+                parsed = json.loads(_repair("{" + member + "}"))
+            except json.JSONDecodeError:
+                return
+        for key, value in parsed.items():
+            self.members[key] = value
+            completed.append((key, value))
+
+def _strip_fences(text: str) -> str:
+    text = text.strip().lstrip('﻿')
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        fence = text.rfind("```")
+        if fence != -1:
+            text = text[:fence]
+    return text.strip()
+
+def _repair(text: str) -> str:
+    """
+    Drop trailing commas and close whatever a truncated object left open
+    String contents are left untouched
+    """
+    out: List[str] = []
+    closers: List[str] = []
+    in_string = escape = False
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            closers.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            while out and out[-1] in ' \t\r\n,':
+                out.pop()
+            if not closers:
+                break
+            closers.pop()
+            out.append(ch)
+            if not closers:
+                break
+            continue
+        out.append(ch)
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+
+    repaired = "".join(out).rstrip(' \t\r\n,')
+    # A dangling "key": or "key" has no value yet
+    if repaired.endswith(':'):
+        repaired = repaired[:repaired.rfind('"', 0, repaired.rfind('"'))].rstrip(' \t\r\n,')
+    return repaired + "".join(reversed(closers))
+
+def _span_end(text: str, start: int) -> int:
+    """Index just past the brace matching text[start], or -1 if it never closes"""
+    depth, in_string, escape = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+def _decode_at(text: str, position: int) -> Optional[dict]:
+    """Non-empty object starting at position, as is or repaired"""
+    try:
+        value, _ = _decoder.raw_decode(text, position)
+    except json.JSONDecodeError:
+        try:
+            value, _ = _decoder.raw_decode(_repair(text[position:]))
+        except json.JSONDecodeError:
+            return None
+    return value if isinstance(value, dict) and value else None
+
+def parse_json_object(text: str) -> dict:
+    """
+    Recover the JSON object in a model response
+    Each top-level '{' is tried in turn, as is and then repaired (trailing
+    commas, truncation), so prose and stray braces around the object are
+    ignored; as a last resort the fields that were complete before the
+    output broke off are returned
+    """
+    text = _strip_fences(text or "")
+    start = text.find('{')
+    if start == -1:
+        raise JSONParseError("No JSON object in response")
+
+    position = start
+    for _ in range(MAX_START_CANDIDATES):
+        value = _decode_at(text, position)
+        if value is not None:
+            return value
+        # Skip past a closed span so a nested object is never mistaken for the answer
+        end = _span_end(text, position)
+        position = text.find('{', end if end != -1 else position + 1)
+        if position == -1:
+            break
+
+    parser = JSONObjectParser()
+    parser.feed(text[start:])
+    if parser.members:
+        return parser.members
+    raise JSONParseError("Malformed JSON object in response")
@@ -0,0 +1,316 @@
+"""
+Adaptive model router
+Backs `model=auto`: tracks rolling latency, error rate and cost per model and
+picks the cheapest model expected to answer within the request's latency
+budget, failing over to another provider on timeouts and fallbacks
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import ATTEMPT_TIMEOUT, ProviderCall, add_call_observer
+from app.services.ai_service import (
+    multi_model_ai_service,
+    AIModel,
+    CaptionStyle,
+    Language
+)
+from app.schemas.schemas import Analysis
+from app.services.image_preprocessing import MediaPayload
+from app.services.resilience import provider_available
+
+ANALYZE = "analyze"
+GENERATE = "generate"
+
+# Models the router chooses from, per phase
+ROUTE_CANDIDATES = {
+    ANALYZE: [AIModel.CLAUDE_HAIKU, AIModel.CLAUDE_SONNET, AIModel.GPT4_VISION],
+    GENERATE: [AIModel.CLAUDE_HAIKU, AIModel.CLAUDE_SONNET, AIModel.GPT4]
+}
+
+# USD per million (input, output) tokens
+MODEL_PRICING = {
+    AIModel.GPT4_VISION: (10.0, 30.0),
+    AIModel.GPT4: (30.0, 60.0),
+    AIModel.CLAUDE_SONNET: (3.0, 15.0),
+    AIModel.CLAUDE_HAIKU: (0.8, 4.0)
+}
+
+# Estimates used until a model has MIN_SAMPLES calls of its own
+PRIOR_LATENCY_SECONDS = {
+    (ANALYZE, AIModel.CLAUDE_HAIKU): 3.0,
+    (ANALYZE, AIModel.CLAUDE_SONNET): 6.0,
+    (ANALYZE, AIModel.GPT4_VISION): 8.0,
+    (GENERATE, AIModel.CLAUDE_HAIKU): 1.5,
+    (GENERATE, AIModel.CLAUDE_SONNET): 3.5,
+    (GENERATE, AIModel.GPT4): 5.0
+}
+PRIOR_TOKENS = {ANALYZE: (1600, 450), GENERATE: (700, 200)}
+MIN_SAMPLES = 5
+
+# An attempt is abandoned once it runs this many times over its expected latency
+ATTEMPT_TIMEOUT_FACTOR = 2.0
+MIN_ATTEMPT_SECONDS = 2.0
+
+def _is_fallback(outcome: Any) -> bool:
+    """Analyses carry an error when they fell back, caption results a fallback flag"""
+    if isinstance(outcome, Analysis):
+        return outcome.failed
+    return bool(outcome.get("error") or outcome.get("fallback"))
+
+async def _attempt(call: Awaitable[Any], timeout: float) -> Tuple[bool, Any]:
+    """
+    (finished, outcome) of a call given at most timeout seconds
+    A call over its limit is cancelled, not abandoned, so the provider request
+    stops; its ProviderCall then reports outcome "timeout"
+    """
+    task = asyncio.ensure_future(call)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if done:
+        return True, task.result()
+
+    task.cancel(ATTEMPT_TIMEOUT)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return False, None
+
+def _cost(model: AIModel, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICING[model]
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+@dataclass
+class _Sample:
+    latency: float
+    ok: bool
+    cost: Optional[float]
+
+class ModelStats:
+    """Rolling window of recent calls to one model in one phase"""
+    def __init__(self, phase: str, model: AIModel, window: int):
+        self.phase = phase
+        self.model = model
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool, cost: Optional[float] = None) -> None:
+        self._samples.append(_Sample(latency, ok, cost))
+
+    @property
+    def latency_estimate(self) -> float:
+        """p90 latency in seconds (prior estimate until enough samples)"""
+        if len(self._samples) < MIN_SAMPLES:
+            return PRIOR_LATENCY_SECONDS[(self.phase, self.model)]
+        latencies = sorted(sample.latency for sample in self._samples)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.9))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for sample in self._samples if not sample.ok) / len(self._samples)
+
+    @property
+    def cost_estimate(self) -> float:
+        """Mean USD cost per call"""
+        costs = [sample.cost for sample in self._samples if sample.cost is not None]
+        if len(costs) < MIN_SAMPLES:
+            return _cost(self.model, *PRIOR_TOKENS[self.phase])
+        return sum(costs) / len(costs)
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": len(self._samples),
+            "p90_latency_ms": round(self.latency_estimate * 1000),
+            "error_rate": round(self.error_rate, 3),
+            "cost_per_call_usd": round(self.cost_estimate, 6)
+        }
+
+class ModelRouter:
+    def __init__(
+        self,
+        window: int = settings.ROUTER_WINDOW_SIZE,
+        max_error_rate: float = settings.ROUTER_MAX_ERROR_RATE
+    ):
+        self.max_error_rate = max_error_rate
+        self._stats: Dict[Tuple[str, AIModel], ModelStats] = {
+            (phase, model): ModelStats(phase, model, window)
+            for phase, models in ROUTE_CANDIDATES.items()
+            for model in models
+        }
+
+    def observe(self, call: ProviderCall) -> None:
+        """
+        Provider call observer feeding the rolling statistics (the only place
+        samples are recorded, timeouts included)
+        """
+        if call.outcome in ("cancelled", "short_circuit"):
+            return
+        try:
+            model = AIModel(call.model)
+        except ValueError:
+            return
+        stats = self._stats.get((call.phase, model))
+        if stats is None:
+            return
+        cost = _cost(model, call.input_tokens, call.output_tokens) if call.input_tokens and call.output_tokens else None
+        stats.record(call.elapsed, call.outcome == "ok", cost)
+
+    def plan(self, phase: str, budget_seconds: float) -> List[AIModel]:
+        """
+        Candidate models in the order they should be tried
+        Healthy models expected to fit the budget come first, cheapest first;
+        then everything else, fastest first, with open-circuit providers last
+        """
+        candidates = [
+            model for model in ROUTE_CANDIDATES[phase]
+            if model.provider != "anthropic" or multi_model_ai_service.claude_client
+        ]
+        stats = {model: self._stats[(phase, model)] for model in candidates}
+        available = {model: provider_available(model.provider) for model in candidates}
+
+        within_budget = sorted(
+            (
+                model for model in candidates
+                if available[model]
+                and stats[model].error_rate < self.max_error_rate
+                and stats[model].latency_estimate <= budget_seconds
+            ),
+            key=lambda model: stats[model].cost_estimate
+        )
+        others = sorted(
+            (model for model in candidates if model not in within_budget),
+            key=lambda model: (
+                not available[model],
+                stats[model].error_rate >= self.max_error_rate,
+                stats[model].latency_estimate
+            )
+        )
+        return within_budget + others
+
+    def choose(self, phase: str, latency_budget_ms: Optional[int] = None) -> Tuple[AIModel, dict]:
+        """Pick one model without failover (used for streaming)"""
+        budget_ms = latency_budget_ms or settings.ROUTER_DEFAULT_LATENCY_BUDGET_MS
+        model = self.plan(phase, budget_ms / 1000)[0]
+        return model, {
+            "selected": model.value,
+            "latency_budget_ms": budget_ms,
+            "estimated_ms": round(self._stats[(phase, model)].latency_estimate * 1000),
+            "attempts": []
+        }
+
+    async def route_analysis(
+        self,
+        payload: MediaPayload,
+        filename: str,
+        latency_budget_ms: Optional[int] = None
+    ) -> Tuple[Analysis, dict]:
+        """Analyze with the best model for the budget; returns (analysis, routing decision)"""
+        return await self._run(
+            ANALYZE,
+            latency_budget_ms,
+            lambda model: multi_model_ai_service.analyze_image_with_model(payload, filename, model=model),
+            lambda: multi_model_ai_service._get_fallback_analysis("No model answered within the latency budget")
+        )
+
+    async def route_caption(
+        self,
+        analysis: Analysis,
+        style: CaptionStyle,
+        language: Language,
+        musicians: Optional[List[str]] = None,
+        venue: Optional[str] = None,
+        custom_context: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None
+    ) -> Tuple[dict, dict]:
+        """Generate with the best model for the budget; returns (caption result, routing decision)"""
+        return await self._run(
+            GENERATE,
+            latency_budget_ms,
+            lambda model: multi_model_ai_service.generate_caption_with_style(
+                analysis=analysis,
+                style=style,
+                language=language,
+                musicians=musicians,
+                venue=venue,
+                custom_context=custom_context,
+                model=model
+            ),
+            lambda: multi_model_ai_service._get_fallback_caption(analysis, style, language)
+        )
+
+    async def _run(
+        self,
+        phase: str,
+        latency_budget_ms: Optional[int],
+        call: Callable[[AIModel], Awaitable[Any]],
+        fallback: Callable[[], Any]
+    ) -> Tuple[Any, dict]:
+        budget_ms = latency_budget_ms or settings.ROUTER_DEFAULT_LATENCY_BUDGET_MS
+        deadline = time.monotonic() + budget_ms / 1000
+        plan = self.plan(phase, budget_ms / 1000)
+
+        attempts, failed_providers = [], set()
+        result, selected, overtime = None, None, False
+
+        for index, model in enumerate(plan):
+            # Fail over to another provider first; a model of a failed provider is a last resort
+            if model.provider in failed_providers and any(
+                m.provider not in failed_providers for m in plan[index + 1:]
+            ):
+                continue
+
+            stats = self._stats[(phase, model)]
+            attempt_limit = max(stats.latency_estimate * ATTEMPT_TIMEOUT_FACTOR, MIN_ATTEMPT_SECONDS)
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                timeout = min(remaining, attempt_limit)
+            elif attempts and not overtime:
+                # Budget spent on failures: one late answer beats a canned fallback
+                timeout, overtime = attempt_limit, True
+            else:
+                break
+
+            started = time.monotonic()
+            finished, outcome = await _attempt(call(model), timeout)
+            if finished:
+                status = "fallback" if _is_fallback(outcome) else "ok"
+                result = outcome
+            else:
+                status = "timeout"
+
+            attempts.append({
+                "model": model.value,
+                "status": status,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+                "estimated_ms": round(stats.latency_estimate * 1000)
+            })
+            if status == "ok":
+                selected = model
+                break
+            failed_providers.add(model.provider)
+
+        decision = {
+            "selected": selected.value if selected else None,
+            "latency_budget_ms": budget_ms,
+            "attempts": attempts
+        }
+        return (result if result is not None else fallback()), decision
+
+    def snapshot(self) -> dict:
+        """Rolling statistics per phase and model"""
+        return {
+            phase: {model.value: self._stats[(phase, model)].snapshot() for model in models}
+            for phase, models in ROUTE_CANDIDATES.items()
+        }
+
+# Singleton instance
+model_router = ModelRouter()
+add_call_observer(model_router.observe)
@@ -1,127 +1,120 @@
+import logging
 import os
-import base64
-from typing import Optional
-from openai import OpenAI
+from typing import Optional, Union
 from app.core.config import settings
+from app.core.metrics import track_provider_call
+from app.services.ai_clients import openai_client
+from app.schemas.schemas import Analysis
+from app.services.image_preprocessing import MediaPayload, OPENAI_VISION_PROFILE
+from app.services.json_parsing import parse_json_object, JSONParseError
+from app.services.resilience import call_provider
+from app.services.video_keyframes import analyze_video
+
+logger = logging.getLogger(__name__)
 
 class OpenAIService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = openai_client
         self.model = settings.OPENAI_MODEL
 
-    async def analyze_image(self, image_data: bytes, filename: str) -> dict:
+    async def analyze_image(self, image_data: Union[bytes, MediaPayload], filename: str) -> Analysis:
         """
         Analyze an image using GPT-4 Vision
         Returns detected instruments, musicians, scene type, and suggested tags
         """
+        payload = image_data if isinstance(image_data, MediaPayload) else MediaPayload(image_data, filename)
+        if payload.is_video:
+            # Analyzed from a few keyframes, merged into one result
+            return await analyze_video(payload, lambda frame: self.analyze_image(frame, frame.filename), "openai")
+
         try:
-            # Encode image to base64
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-
-            # Determine image type from filename
-            ext = filename.lower().split('.')[-1]
-            mime_type = f"image/{ext if ext in ['jpeg', 'jpg', 'png', 'gif', 'webp'] else 'jpeg'}"
-
-            response = self.client.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": """Analyze this music-related image and provide:
-1. Detected musical instruments (list)
-2. Number of musicians visible
-3. Scene type (studio, live_performance, rehearsal, outdoor, etc.)
-4. Musical style/genre if identifiable
-5. Atmosphere/mood
-6. Suggested Instagram hashtags (10-15 relevant tags)
-
-Return your analysis in this exact JSON format:
-{
-    "detected_objects": ["instrument1", "instrument2", "musician"],
-    "instruments": ["guitar", "drums"],
-    "musician_count": 2,
-    "scene_type": "live_performance",
-    "style": "jazz",
-    "mood": "energetic",
-    "suggested_tags": ["#jazz", "#livemusic", "#concert"],
-    "confidence": 0.95,
-    "description": "Brief description of the scene"
-}"""
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{mime_type};base64,{base64_image}"
+            # Downscale, strip metadata and re-encode before upload
+            image = await payload.prepared(OPENAI_VISION_PROFILE)
+
+            with track_provider_call("openai", "gpt-4-vision-preview", "analyze", len(image.data)) as call:
+                response = await call_provider(
+                    "openai", self.client.chat.completions.create,
+                    model="gpt-4-vision-preview",
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": """Analyze this music-related image and provide:
+    1. Detected musical instruments (list)
+    2. Number of musicians visible
+    3. Scene type (studio, live_performance, rehearsal, outdoor, etc.)
+    4. Musical style/genre if identifiable
+    5. Atmosphere/mood
+    6. Suggested Instagram hashtags (10-15 relevant tags)
+
+    Return your analysis in this exact JSON format:
+    {
+        "detected_objects": ["instrument1", "instrument2", "musician"],
+        "instruments": ["guitar", "drums"],
+        "musician_count": 2,
+        "scene_type": "live_performance",
+        "style": "jazz",
+        "mood": "energetic",
+        "suggested_tags": ["#jazz", "#livemusic", "#concert"],
+        "confidence": 0.95,
+        "description": "Brief description of the scene"
+    }"""
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:{image.media_type};base64,{image.to_base64()}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=500
-            )
-
-            # Parse response
+                            ]
+                        }
+                    ],
+                    max_tokens=500
+                )
+                call.record_usage(response.usage)
+
+            # Parse response (prose, code fences, trailing commas and truncation are tolerated)
             content = response.choices[0].message.content
 
-            # Try to extract JSON from response
-            import json
             try:
-                # Look for JSON in the response
-                start = content.find('{')
-                end = content.rfind('}') + 1
-                if start != -1 and end != 0:
-                    analysis = json.loads(content[start:end])
-                else:
-                    # Fallback if no JSON found
-                    analysis = {
-                        "detected_objects": ["musician", "instrument"],
-                        "instruments": ["unknown"],
-                        "musician_count": 1,
-                        "scene_type": "music",
-                        "style": "unknown",
-                        "mood": "creative",
-                        "suggested_tags": ["#music", "#musician", "#artist"],
-                        "confidence": 0.7,
-                        "description": content
-                    }
-            except json.JSONDecodeError:
-                # Fallback analysis
-                analysis = {
-                    "detected_objects": ["musician"],
-                    "instruments": ["unknown"],
-                    "musician_count": 1,
-                    "scene_type": "music",
-                    "style": "unknown",
-                    "mood": "creative",
-                    "suggested_tags": ["#music", "#musician"],
-                    "confidence": 0.6,
-                    "description": content
-                }
+                analysis = Analysis.from_response(parse_json_object(content))
+            except JSONParseError:
+                # Fallback if no JSON could be recovered
+                analysis = Analysis(
+                    detected_objects=["musician", "instrument"],
+                    instruments=["unknown"],
+                    musician_count=1,
+                    scene_type="music",
+                    style="unknown",
+                    mood="creative",
+                    suggested_tags=["#music", "#musician", "#artist"],
+                    confidence=0.7,
+                    description=content
+                )
 
             return analysis
 
         except Exception as e:
-            print(f"Error analyzing image with OpenAI: {str(e)}")
+            logger.warning("Error analyzing image with OpenAI: %s", e)
             # Return fallback analysis
-            return {
-                "detected_objects": ["musician"],
-                "instruments": ["unknown"],
-                "musician_count": 1,
-                "scene_type": "music",
-                "style": "jazz",
-                "mood": "creative",
-                "suggested_tags": ["#music", "#jazz", "#musician"],
-                "confidence": 0.5,
-                "description": "Image analysis unavailable",
-                "error": str(e)
-            }
+            return Analysis(
+                detected_objects=["musician"],
+                instruments=["unknown"],
+                musician_count=1,
+                scene_type="music",
+                style="jazz",
+                mood="creative",
+                suggested_tags=["#music", "#jazz", "#musician"],
+                confidence=0.5,
+                description="Image analysis unavailable",
+                error=str(e)
+            )
 
     async def generate_caption(
         self,
-        analysis: dict,
+        analysis: Analysis,
         musicians: Optional[list] = None,
         venue: Optional[str] = None,
         style: Optional[str] = None,
@@ -145,10 +138,10 @@ Return your analysis in this exact JSON format:
             prompt = f"""Generate an engaging Instagram caption in {language} for a music post.
 
 Image Analysis:
-- Instruments: {', '.join(analysis.get('instruments', []))}
-- Scene: {analysis.get('scene_type', 'music')}
-- Mood: {analysis.get('mood', 'creative')}
-- Style: {analysis.get('style', 'music')}
+- Instruments: {', '.join(analysis.instruments or [])}
+- Scene: {analysis.scene_type or 'music'}
+- Mood: {analysis.mood or 'creative'}
+- Style: {getattr(analysis, 'style', None) or analysis.genre or 'music'}
 
 Context:
 {context}
@@ -162,15 +155,18 @@ Create a caption that:
 
 Return ONLY the caption text, nothing else."""
 
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a social media expert specializing in music content for Instagram. Create authentic, engaging captions."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300,
-                temperature=0.8
-            )
+            with track_provider_call("openai", "gpt-4", "generate", len(prompt.encode())) as call:
+                response = await call_provider(
+                    "openai", self.client.chat.completions.create,
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a social media expert specializing in music content for Instagram. Create authentic, engaging captions."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=300,
+                    temperature=0.8
+                )
+                call.record_usage(response.usage)
 
             caption = response.choices[0].message.content.strip()
 
@@ -184,7 +180,7 @@ Return ONLY the caption text, nothing else."""
             }
 
         except Exception as e:
-            print(f"Error generating caption with OpenAI: {str(e)}")
+            logger.warning("Error generating caption with OpenAI: %s", e)
             # Fallback caption
             caption = f"🎵 Belle session ce soir ! ✨\n\nL'énergie était incroyable ! 🎸\n\n#music #livemusic #musician #jazz #concert"
             return {
@@ -0,0 +1,283 @@
+"""
+Prompt registry
+Every static prompt segment is rendered once at import, per (style, language).
+Caption prompts put all static text in the system prompt and keep only the
+per-photo details in the user message, so the request prefix stays
+byte-identical across calls (what provider-side prompt caching matches on).
+Versions are content hashes: editing a template changes them automatically
+"""
+import hashlib
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.schemas.schemas import Analysis
+
+# Keyed by CaptionStyle / Language values
+LANGUAGE_NAMES = {
+    "fr": "French",
+    "en": "English",
+    "es": "Spanish",
+    "de": "German",
+    "it": "Italian"
+}
+
+STYLE_VOICES = {
+    "professional": "You write professional, polished content for established musicians and industry professionals.",
+    "casual": "You write friendly, authentic captions that feel personal and relatable.",
+    "poetic": "You write artistic, lyrical captions with beautiful imagery and metaphors.",
+    "energetic": "You write high-energy, enthusiastic captions that capture excitement and momentum.",
+    "minimal": "You write minimal, concise captions that are direct and impactful.",
+    "storytelling": "You write narrative captions that tell compelling stories and set the scene."
+}
+
+STYLE_REQUIREMENTS = {
+    "professional": """- Professional and polished tone
+- Focus on technical aspects and artistry
+- Sophisticated vocabulary
+- Minimal emojis (max 2-3, professional ones only)
+- Industry-relevant hashtags""",
+    "casual": """- Friendly and conversational tone
+- Relatable and authentic voice
+- Moderate emoji use (4-6)
+- Mix of popular and niche hashtags
+- Feels like talking to a friend""",
+    "poetic": """- Artistic and lyrical language
+- Metaphors and imagery
+- Evocative descriptions
+- Selective emoji use (2-3, symbolic)
+- Poetic/artistic hashtags""",
+    "energetic": """- High energy and enthusiasm
+- Exclamation points and dynamic language
+- Generous emoji use (6-8)
+- Trending and viral hashtags
+- Captures excitement and momentum""",
+    "minimal": """- Short and concise (1-2 sentences max)
+- No or very minimal emojis (0-1)
+- Simple, direct language
+- Essential hashtags only (5-8)
+- Let the image speak""",
+    "storytelling": """- Narrative structure with beginning/middle/end
+- Sets the scene and builds atmosphere
+- Personal and engaging
+- Strategic emoji use (3-5)
+- Story-focused hashtags"""
+}
+
+# Shared by every caption system prompt, so it leads each one
+CAPTION_SYSTEM_PREFIX = "You are an expert social media content creator specializing in music and Instagram captions."
+
+CAPTION_SYSTEM_TEMPLATE = """{prefix} {voice} Always write in perfect, native-level {language_name}.
+
+Style requirements:
+{requirements}
+
+Format:
+- 2-4 sentences in {language_name}
+- Appropriate emojis for the style
+- End with 10-15 relevant hashtags
+- Optimized for Instagram engagement
+
+Return ONLY the caption text, nothing else."""
+
+VARIANTS_SYSTEM_TEMPLATE = """{prefix} You write several caption variants for the same photo, each in its own style and language, always at native level.
+
+Style requirements:
+{requirements}
+
+Format of every variant:
+- 2-4 sentences in the variant's language
+- Appropriate emojis for the style
+- End with 10-15 relevant hashtags
+- Optimized for Instagram engagement
+
+Return ONLY a JSON object mapping each requested variant key to its caption text, nothing else."""
+
+CAPTION_REQUEST_TEMPLATE = """Write the caption for this music photo.
+
+Image analysis:
+- Genre: {genre}
+- Scene: {scene}
+- Mood: {mood}
+- Instruments: {instruments}
+- Lighting: {lighting}
+- Caption angle: {angle}
+
+Context:
+{context}"""
+
+ANALYSIS_PROMPT = """Analyze this music-related image and provide:
+1. Instruments: all visible musical instruments
+2. Musician count: number of people visible
+3. Scene type: studio, live_performance, rehearsal, outdoor_festival, street_performance or recording_session
+4. Genre/style (jazz, rock, classical, hip-hop, electronic, folk, world, fusion, etc.)
+5. Mood/atmosphere (energetic, intimate, melancholic, joyful, intense, relaxed)
+6. Lighting and dominant colors (warm, cool, dramatic, natural, stage lights)
+7. Composition quality of the photo
+8. Suggested Instagram filters matching colors and mood (Clarendon, Gingham, Juno, Lark, etc.)
+9. 15 highly relevant, trending hashtags
+10. Best caption angle (energy, intimacy, technique, venue, etc.)
+
+Return ONLY valid JSON in this exact format:
+{
+    "detected_objects": ["instrument1", "musician", "equipment"],
+    "instruments": ["guitar", "drums"],
+    "musician_count": 2,
+    "scene_type": "live_performance",
+    "genre": "jazz",
+    "subgenre": "bebop",
+    "mood": "energetic and vibrant",
+    "lighting": "warm stage lights with dramatic shadows",
+    "dominant_colors": ["#1a1a2e", "#eebf3f", "#c73e1d"],
+    "composition_quality": "professional",
+    "suggested_filters": ["Clarendon", "Juno", "Lark"],
+    "suggested_tags": ["#jazz", "#livemusic", "#concert", "#bebop", "#jazzclub"],
+    "confidence": 0.95,
+    "caption_angle": "emphasize the energy and crowd engagement",
+    "description": "Brief description of the scene"
+}"""
+
+def _version(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()[:12]
+
+@dataclass(frozen=True)
+class CaptionPrompt:
+    """Pre-rendered caption prompt for one (style, language)"""
+    style: str
+    language: str
+    system: str
+
+    @cached_property
+    def system_bytes(self) -> int:
+        return len(self.system.encode())
+
+    def request(
+        self,
+        analysis: Analysis,
+        musicians: Optional[List[str]] = None,
+        venue: Optional[str] = None,
+        custom_context: Optional[str] = None
+    ) -> str:
+        """User message: only the per-photo details"""
+        return render_caption_request(analysis, musicians, venue, custom_context)
+
+@dataclass(frozen=True)
+class VariantsPrompt:
+    """Prompt asking for several (style, language) captions as one JSON object"""
+    keys: Tuple[str, ...]
+    system: str
+    variant_list: str
+
+    @cached_property
+    def system_bytes(self) -> int:
+        return len(self.system.encode())
+
+    def request(
+        self,
+        analysis: Analysis,
+        musicians: Optional[List[str]] = None,
+        venue: Optional[str] = None,
+        custom_context: Optional[str] = None
+    ) -> str:
+        """User message: the photo details once, then the variant keys"""
+        return f"{render_caption_request(analysis, musicians, venue, custom_context)}\n\n{self.variant_list}"
+
+def variant_key(style, language) -> str:
+    """Key of a (style, language) variant in generated variant maps, e.g. "casual:fr\""""
+    return f"{_key(style)}:{_key(language)}"
+
+def render_caption_request(
+    analysis: Analysis,
+    musicians: Optional[List[str]] = None,
+    venue: Optional[str] = None,
+    custom_context: Optional[str] = None
+) -> str:
+    """Per-photo part of caption prompts"""
+    context_parts = []
+    if musicians:
+        context_parts.append(f"Musicians: {', '.join(musicians)}")
+    if venue:
+        context_parts.append(f"Venue: {venue}")
+    if custom_context:
+        context_parts.append(f"Additional context: {custom_context}")
+
+    genre = analysis.genre or 'music'
+    if analysis.subgenre:
+        genre = f"{genre} ({analysis.subgenre})"
+
+    return CAPTION_REQUEST_TEMPLATE.format(
+        genre=genre,
+        scene=analysis.scene_type or 'music performance',
+        mood=analysis.mood or 'creative',
+        instruments=', '.join(analysis.instruments or ['instruments']),
+        lighting=analysis.lighting or 'stage lighting',
+        angle=analysis.caption_angle or 'general music vibe',
+        context="\n".join(context_parts) if context_parts else "No additional context"
+    )
+
+def _key(value) -> str:
+    # Enum members hash by name, so look up by their value
+    return getattr(value, "value", value)
+
+class PromptRegistry:
+    def __init__(self):
+        self._captions: Dict[Tuple[str, str], CaptionPrompt] = {
+            (style, language): CaptionPrompt(
+                style=style,
+                language=language,
+                system=CAPTION_SYSTEM_TEMPLATE.format(
+                    prefix=CAPTION_SYSTEM_PREFIX,
+                    voice=STYLE_VOICES[style],
+                    language_name=LANGUAGE_NAMES[language],
+                    requirements=STYLE_REQUIREMENTS[style]
+                )
+            )
+            for style in STYLE_VOICES
+            for language in LANGUAGE_NAMES
+        }
+        self._style_blocks = {
+            style: f"{style}: {STYLE_VOICES[style]}\n{STYLE_REQUIREMENTS[style]}"
+            for style in STYLE_VOICES
+        }
+        self.analysis_prompt = ANALYSIS_PROMPT
+        # Part of analysis cache keys: a prompt edit never serves analyses made with the old prompt
+        self.analysis_version = _version(ANALYSIS_PROMPT)
+        self.caption_version = _version(
+            CAPTION_REQUEST_TEMPLATE,
+            VARIANTS_SYSTEM_TEMPLATE,
+            *(p.system for p in self._captions.values())
+        )
+        self.version = _version(self.analysis_version, self.caption_version)
+
+    def caption(self, style, language) -> CaptionPrompt:
+        """Pre-rendered prompt for a CaptionStyle and Language (or their values)"""
+        return self._captions[(_key(style), _key(language))]
+
+    def variants(self, pairs: Iterable[tuple]) -> VariantsPrompt:
+        """Prompt for several (style, language) variants; built from the pre-rendered segments"""
+        return self._variants(tuple(sorted({(_key(style), _key(language)) for style, language in pairs})))
+
+    @lru_cache(maxsize=256)
+    def _variants(self, pairs: Tuple[Tuple[str, str], ...]) -> VariantsPrompt:
+        styles = dict.fromkeys(style for style, _ in pairs)
+        requirements = "\n\n".join(self._style_blocks[style] for style in styles)
+        variant_lines = "\n".join(
+            f"- {variant_key(style, language)}: {style} style, in {LANGUAGE_NAMES[language]}"
+            for style, language in pairs
+        )
+        return VariantsPrompt(
+            keys=tuple(variant_key(style, language) for style, language in pairs),
+            system=VARIANTS_SYSTEM_TEMPLATE.format(prefix=CAPTION_SYSTEM_PREFIX, requirements=requirements),
+            variant_list=f"Variants to write (key: style, language):\n{variant_lines}"
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "version": self.version,
+            "analysis_version": self.analysis_version,
+            "caption_version": self.caption_version,
+            "caption_prompts": len(self._captions)
+        }
+
+# Singleton instance
+prompt_registry = PromptRegistry()
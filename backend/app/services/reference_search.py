@@ -0,0 +1,159 @@
+"""
+Musician and venue search
+Ranked prefix/fuzzy matching backed by an index on every supported database:
+- Postgres: pg_trgm GIN indexes, ranked by word similarity (typo tolerant)
+- SQLite: FTS5 external-content tables kept in sync by triggers, ranked by
+  bm25 (word-prefix matches)
+- anything else, or when the indexes cannot be created: ILIKE scan
+"""
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, literal, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Musician, Venue
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM = "trigram"
+FTS5 = "fts5"
+LIKE = "like"
+
+# FTS5 ranks at most this many name matches plus this many matches on any
+# column: bm25 is computed per matching row, and a short term on a common
+# instrument or style matches a large share of the table
+RANK_CANDIDATES = 500
+
+# Searchable columns per kind, with their ranking weights (the first one is the name)
+SEARCH_FIELDS: Dict[str, Tuple[type, List[Tuple[str, float]]]] = {
+    "musicians": (Musician, [("name", 1.0), ("instrument", 0.6), ("style", 0.5)]),
+    "venues": (Venue, [("name", 1.0), ("city", 0.6)])
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def _trigram_ddl() -> List[str]:
+    statements = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"]
+    for table, (_, fields) in SEARCH_FIELDS.items():
+        statements += [
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)"
+            for column, _ in fields
+        ]
+    return statements
+
+def _fts5_ddl(table: str) -> List[str]:
+    columns = [column for column, _ in SEARCH_FIELDS[table][1]]
+    listed = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {table}_fts({table}_fts, rowid, {listed}) VALUES ('delete', old.id, {old_values});"
+    insert = f"INSERT INTO {table}_fts(rowid, {listed}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+        f"{listed}, content='{table}', content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END"
+    ]
+
+def _like_pattern(query: str, prefix_only: bool) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+def _fts5_match(query: str) -> Optional[str]:
+    """Every word of the query as a quoted prefix term ("jo"* "col"*)"""
+    tokens = _TOKEN.findall(query)
+    return " ".join(f'"{token}"*' for token in tokens) or None
+
+class ReferenceSearch:
+    def __init__(self):
+        self.backend: Optional[str] = None
+
+    def ensure_indexes(self, connection) -> str:
+        """
+        Create the search indexes if missing (idempotent; run at startup) and
+        pick the backend the queries use. Migration 40bec7aef42e holds a
+        literal copy of this DDL: changes here need a new migration
+        """
+        dialect = connection.dialect.name
+        try:
+            if dialect == "postgresql":
+                with connection.begin_nested():
+                    for statement in _trigram_ddl():
+                        connection.execute(text(statement))
+                self.backend = TRIGRAM
+            elif dialect == "sqlite":
+                for table in SEARCH_FIELDS:
+                    exists = connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": f"{table}_fts"}
+                    ).first()
+                    for statement in _fts5_ddl(table):
+                        connection.execute(text(statement))
+                    if not exists:
+                        # Index the rows written before the triggers existed
+                        connection.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+                self.backend = FTS5
+            else:
+                self.backend = LIKE
+        except Exception as e:
+            logger.warning("Search indexes unavailable, falling back to ILIKE scans: %s", e)
+            self.backend = LIKE
+        return self.backend
+
+    async def search(self, db: AsyncSession, kind: str, query: str, limit: int = 10) -> list:
+        """Best matches for a query, best first"""
+        query = " ".join(query.split())
+        if not query:
+            return []
+
+        model, fields = SEARCH_FIELDS[kind]
+        columns = [(getattr(model, column), weight) for column, weight in fields]
+        backend = self.backend or LIKE
+
+        if backend == FTS5:
+            match = _fts5_match(query)
+            if match is None:
+                return []
+            weights = ", ".join(str(weight * 10) for _, weight in fields)
+            name = fields[0][0]
+            # Names starting with the query first, then bm25 (lower is better)
+            ids = (await db.execute(
+                text(
+                    f"SELECT f.rowid FROM {kind}_fts f JOIN {kind} t ON t.id = f.rowid "
+                    f"WHERE {kind}_fts MATCH :match AND ("
+                    f"f.rowid IN (SELECT rowid FROM {kind}_fts WHERE {kind}_fts MATCH :name_match LIMIT :candidates) "
+                    f"OR f.rowid IN (SELECT rowid FROM {kind}_fts WHERE {kind}_fts MATCH :match LIMIT :candidates)) "
+                    f"ORDER BY t.{name} LIKE :prefix ESCAPE '\\' DESC, bm25({kind}_fts, {weights}) "
+                    f"LIMIT :limit"
+                ),
+                {
+                    "match": match,
+                    "name_match": f"{name} : ({match})",
+                    "candidates": RANK_CANDIDATES,
+                    "prefix": _like_pattern(query, prefix_only=True),
+                    "limit": limit
+                }
+            )).scalars().all()
+            rows = {row.id: row for row in (await db.scalars(select(model).where(model.id.in_(ids)))).all()}
+            return [rows[row_id] for row_id in ids if row_id in rows]
+
+        name = columns[0][0]
+        prefix = _like_pattern(query, prefix_only=True)
+        if backend == TRIGRAM:
+            # word_similarity matches the query against the best-matching part of each value
+            score = func.greatest(*(func.word_similarity(query, column) * weight for column, weight in columns))
+            matches = or_(
+                *(literal(query).op("<%")(column) for column, _ in columns),
+                *(column.ilike(prefix, escape="\\") for column, _ in columns)
+            )
+            order = [name.ilike(prefix, escape="\\").desc(), score.desc(), name]
+        else:
+            matches = or_(*(column.ilike(_like_pattern(query, False), escape="\\") for column, _ in columns))
+            order = [name.ilike(prefix, escape="\\").desc(), name]
+
+        return (await db.scalars(select(model).where(matches).order_by(*order).limit(limit))).all()
+
+# Singleton instance
+reference_search = ReferenceSearch()
@@ -0,0 +1,194 @@
+"""
+Provider resilience
+Per-provider circuit breakers plus jittered exponential retry for transient
+errors. While a provider's circuit is open, calls fail immediately with
+CircuitOpenError instead of waiting out the HTTP timeout
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anthropic
+import httpx
+import openai
+
+from app.core.config import settings
+from app.core.metrics import circuit_state, provider_retries, provider_short_circuits
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for ai_provider_circuit_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+class CircuitOpenError(Exception):
+    """The provider's circuit is open; the call was not attempted"""
+    short_circuited = True
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is temporarily unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.provider = provider
+        self.retry_after = retry_after
+
+def is_transient(error: BaseException) -> bool:
+    """Connection problems, timeouts, rate limits and 5xx: worth retrying, and a sign of provider trouble"""
+    if isinstance(error, (openai.APIConnectionError, anthropic.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, (openai.APIStatusError, anthropic.APIStatusError)):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+def _retry_after_header(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class CircuitBreaker:
+    """
+    Closed: calls pass, consecutive transient failures are counted
+    Open: calls are refused until recovery_seconds have passed
+    Half-open: a limited number of trial calls decide between closed and open
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = settings.CIRCUIT_FAILURE_THRESHOLD,
+        recovery_seconds: float = settings.CIRCUIT_RECOVERY_SECONDS,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_calls = 0
+        circuit_state.labels(name).set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Circuit %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        circuit_state.labels(self.name).set(STATE_VALUES[state])
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now (reserves a half-open trial slot)"""
+        if self.state == OPEN:
+            if self.retry_after > 0:
+                return False
+            self._set_state(HALF_OPEN)
+            self._trial_calls = 0
+
+        if self.state == HALF_OPEN:
+            if self._trial_calls >= self.half_open_max_calls:
+                return False
+            self._trial_calls += 1
+        return True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            self._set_state(OPEN)
+
+    def release(self) -> None:
+        """A call ended without telling anything about provider health (e.g. a 400)"""
+        if self.state == HALF_OPEN:
+            self._trial_calls = max(0, self._trial_calls - 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after_seconds": round(self.retry_after, 1),
+            "times_opened": self.times_opened
+        }
+
+# One breaker per upstream provider, deliberately shared by every caller of it
+# (multi-model routes, the legacy openai_service, batch jobs): they reach the
+# same API over the same connection pool, so failures seen by one of them
+# should make the others fail fast too
+breakers: Dict[str, CircuitBreaker] = {
+    "openai": CircuitBreaker("openai"),
+    "anthropic": CircuitBreaker("anthropic")
+}
+
+def provider_available(provider: str) -> bool:
+    """False while the provider's circuit is open (no trial slot is reserved)"""
+    breaker = breakers[provider]
+    return breaker.state != OPEN or breaker.retry_after == 0
+
+def backoff_delay(attempt: int, error: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff, honouring a short Retry-After from the provider"""
+    retry_after = _retry_after_header(error) if error is not None else None
+    if retry_after is not None and retry_after <= settings.PROVIDER_RETRY_MAX_SECONDS:
+        return retry_after
+    ceiling = min(settings.PROVIDER_RETRY_MAX_SECONDS, settings.PROVIDER_RETRY_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+async def call_provider(provider: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """
+    Call a provider SDK method through its circuit breaker
+    Transient errors are retried up to PROVIDER_MAX_RETRIES times with backoff;
+    raises CircuitOpenError without calling while the circuit is open
+    """
+    breaker = breakers[provider]
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            provider_short_circuits.labels(provider).inc()
+            raise CircuitOpenError(provider, breaker.retry_after)
+
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                breaker.release()
+                raise
+
+            breaker.record_failure()
+            if attempt >= settings.PROVIDER_MAX_RETRIES or breaker.state == OPEN:
+                raise
+
+            delay = backoff_delay(attempt, e)
+            provider_retries.labels(provider).inc()
+            logger.info("Retrying %s call in %.2fs after %s", provider, delay, type(e).__name__)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+
+        breaker.record_success()
+        return result
+
+def health_snapshot() -> dict:
+    """Breaker state per provider for monitoring"""
+    return {provider: breaker.snapshot() for provider, breaker in breakers.items()}
@@ -0,0 +1,70 @@
+"""
+Request coalescing (single-flight)
+Concurrent callers with the same key share one in-flight call; the call is
+cancelled once every caller waiting on it has gone away
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """
+        Run fn() unless an identical call is already in flight, then await its result
+        Results are shared, not copied: callers must treat them as immutable
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded so one caller's cancellation does not cancel the others' call
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError as e:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last caller gone (cancelled or timed out): stop the call, passing
+                # on the cancellation message
+                self._drop(key, flight)
+                flight.task.cancel(*e.args[:1])
+                self.cancelled += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _drop(self, key: str, flight: _Flight) -> None:
+        # Callers arriving after this start a fresh call instead of joining a cancelled one
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._inflight)
+        }
@@ -0,0 +1,305 @@
+"""
+Video keyframe extraction
+Samples frames across a video, splits them into scenes by colour-histogram
+change, keeps the sharpest frame of each scene and drops near-duplicates.
+Only the resulting handful of downscaled JPEG frames reaches the vision models
+"""
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+from app.schemas.schemas import Analysis
+from app.services.admission import admission_controller
+from app.services.image_preprocessing import MediaPayload, CLAUDE_VISION_PROFILE
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # optional (requirements-optional); videos are rejected without it
+    cv2 = None
+    np = None
+
+# Long side of the thumbnails used for scoring
+SCORE_SIDE = 256
+# Keyframes are sent at the largest size any provider uses
+FRAME_MAX_SIDE = CLAUDE_VISION_PROFILE.max_long_side
+FRAME_JPEG_QUALITY = 85
+# Histogram distance under which two keyframes count as duplicates
+DUPLICATE_THRESHOLD = 0.15
+# Mean luma below which a frame is treated as a fade/black frame
+DARK_FRAME_LUMA = 16
+# Extra seconds a worker gets to notice its deadline before the pool is recycled
+STOP_GRACE_SECONDS = 5
+
+class VideoUnsupported(ValueError):
+    """Video cannot be decoded (or OpenCV is not installed)"""
+
+@dataclass
+class Keyframe:
+    timestamp: float
+    data: bytes
+    sharpness: float
+
+@dataclass
+class _Candidate:
+    timestamp: float
+    sharpness: float
+    luma: float
+    histogram: "np.ndarray"
+    data: bytes
+
+def _resize(frame, max_side: int):
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+def _histogram(thumb) -> "np.ndarray":
+    hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [30, 32], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+def _distance(a: "np.ndarray", b: "np.ndarray") -> float:
+    """Bhattacharyya distance: 0 for identical colour distributions, 1 for disjoint ones"""
+    return cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA)
+
+def _encode(frame) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", _resize(frame, FRAME_MAX_SIDE), [cv2.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])
+    if not ok:
+        raise VideoUnsupported("Could not encode video frame")
+    return buffer.tobytes()
+
+def _scene_candidates(
+    capture,
+    sampled_frames: int,
+    scene_threshold: float,
+    deadline: Optional[float] = None
+) -> List[_Candidate]:
+    """Sharpest sampled frame of each scene; TimeoutError past the deadline (epoch seconds)"""
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    # Unknown length: fall back to one sample per second
+    step = max(1, frame_count // sampled_frames) if frame_count > 0 else max(1, round(fps))
+
+    candidates: List[_Candidate] = []
+    best, best_frame, previous = None, None, None
+    index = sampled = 0
+
+    # grab() skips frames without converting them; only sampled frames are retrieved
+    while sampled < sampled_frames and capture.grab():
+        if deadline is not None and time.time() > deadline:
+            # The caller has given up: free this worker instead of finishing the video
+            raise TimeoutError("Video keyframe extraction timed out")
+        if index % step == 0:
+            ok, frame = capture.retrieve()
+            if ok:
+                sampled += 1
+                thumb = _resize(frame, SCORE_SIDE)
+                gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+                histogram = _histogram(thumb)
+                candidate = _Candidate(
+                    timestamp=round(index / fps, 2),
+                    sharpness=float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+                    luma=float(gray.mean()),
+                    histogram=histogram,
+                    data=b""
+                )
+
+                if previous is not None and _distance(histogram, previous) > scene_threshold:
+                    best.data = _encode(best_frame)
+                    candidates.append(best)
+                    best = None
+                previous = histogram
+
+                if best is None or candidate.sharpness > best.sharpness:
+                    best, best_frame = candidate, frame
+        index += 1
+
+    if best is not None:
+        best.data = _encode(best_frame)
+        candidates.append(best)
+    return candidates
+
+def extract_keyframes(
+    path: str,
+    max_keyframes: int = settings.VIDEO_MAX_KEYFRAMES,
+    sampled_frames: int = settings.VIDEO_SAMPLED_FRAMES,
+    scene_threshold: float = settings.VIDEO_SCENE_CHANGE_THRESHOLD,
+    deadline: Optional[float] = None
+) -> List[Keyframe]:
+    """
+    Pick up to max_keyframes distinct, sharp frames from a video file
+    CPU bound: run it in the process pool (see extract_keyframes_async).
+    Raises TimeoutError once past deadline (epoch seconds)
+    """
+    if cv2 is None:
+        raise VideoUnsupported("Video analysis requires opencv-python-headless")
+
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise VideoUnsupported("Unsupported or corrupt video file")
+        candidates = _scene_candidates(capture, sampled_frames, scene_threshold, deadline)
+    finally:
+        capture.release()
+
+    # Fades and black frames only if there is nothing else
+    lit = [c for c in candidates if c.luma >= DARK_FRAME_LUMA]
+    candidates = lit or candidates
+
+    selected: List[_Candidate] = []
+    for candidate in sorted(candidates, key=lambda c: c.sharpness, reverse=True):
+        if all(_distance(candidate.histogram, other.histogram) > DUPLICATE_THRESHOLD for other in selected):
+            selected.append(candidate)
+            if len(selected) >= max_keyframes:
+                break
+
+    return [
+        Keyframe(timestamp=c.timestamp, data=c.data, sharpness=round(c.sharpness, 1))
+        for c in sorted(selected, key=lambda c: c.timestamp)
+    ]
+
+# Created on first use; spawned (not forked) so workers never inherit the event loop or open sockets
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.VIDEO_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def _recycle_executor() -> None:
+    """
+    Replace the pool and terminate its workers: the only way to stop an
+    extraction stuck in native code (ProcessPoolExecutor cannot cancel a
+    running call before Python 3.14's terminate_workers)
+    """
+    global _executor
+    executor, _executor = _executor, None
+    if executor is None:
+        return
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def shutdown_video_workers() -> None:
+    """Stop the extraction process pool"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _local_path(payload: MediaPayload) -> tuple:
+    """Path OpenCV can open: the payload's own file if it has one, else a temp copy"""
+    name = getattr(payload.data, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name, False
+
+    suffix = os.path.splitext(payload.filename or "")[1]
+    with tempfile.NamedTemporaryFile(prefix="caption-video-", suffix=suffix, delete=False) as out:
+        payload.copy_to(out)
+    return out.name, True
+
+async def extract_keyframes_async(payload: MediaPayload) -> List[Keyframe]:
+    """Extract keyframes in the process pool so decoding never blocks request handling"""
+    if cv2 is None:
+        raise VideoUnsupported("Video analysis requires opencv-python-headless")
+
+    path, temporary = await asyncio.to_thread(_local_path, payload)
+    try:
+        timeout = settings.VIDEO_EXTRACT_TIMEOUT_SECONDS
+        # The worker stops itself at the deadline; a call still queued then is cancelled
+        call = _get_executor().submit(partial(extract_keyframes, path, deadline=time.time() + timeout))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(call), timeout=timeout + STOP_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            if call.running():
+                # Still running well past its deadline: stuck, so kill it
+                _recycle_executor()
+            raise
+    finally:
+        if temporary:
+            os.unlink(path)
+
+def merge_frame_analyses(analyses: List[Analysis]) -> dict:
+    """
+    Combine per-frame analyses into one video analysis
+    Lists are ranked by how many frames mention each entry, text fields take
+    the most common value, musician_count the maximum, confidence the mean
+    """
+    usable = [a.to_dict() for a in analyses if not a.failed] or [a.to_dict() for a in analyses]
+    merged = {}
+
+    for key in dict.fromkeys(key for analysis in usable for key in analysis):
+        values = [analysis[key] for analysis in usable if analysis.get(key) not in (None, "", [])]
+        if not values:
+            merged[key] = usable[0].get(key)
+        elif all(isinstance(v, list) for v in values):
+            counts = Counter(
+                item for v in values
+                for item in dict.fromkeys(i for i in v if isinstance(i, (str, int, float)))
+            )
+            longest = max(len(v) for v in values)
+            merged[key] = [item for item, _ in counts.most_common(longest)]
+        elif key == "confidence" and all(isinstance(v, (int, float)) for v in values):
+            merged[key] = round(sum(values) / len(values), 2)
+        elif all(isinstance(v, (int, float)) for v in values):
+            merged[key] = max(values)
+        else:
+            merged[key] = Counter(str(v) for v in values).most_common(1)[0][0]
+
+    return merged
+
+async def analyze_video(
+    payload: MediaPayload,
+    analyze_frame: Callable[[MediaPayload], Awaitable[Analysis]],
+    provider: str
+) -> Analysis:
+    """
+    Extract keyframes, analyze them and merge the results
+    The request was admitted for one provider call: frames run on that slot,
+    plus one more at a time on each spare admission slot for the provider
+    """
+    keyframes = await extract_keyframes_async(payload)
+    if not keyframes:
+        raise VideoUnsupported("No frames could be decoded from the video")
+
+    stem = os.path.splitext(payload.filename or "video")[0]
+    frames = [
+        MediaPayload(frame.data, f"{stem}-{frame.timestamp:.2f}s.jpg", content_type="image/jpeg")
+        for frame in keyframes
+    ]
+    analyses: List[Optional[Analysis]] = [None] * len(frames)
+    pending = iter(range(len(frames)))
+
+    async def analyze_pending():
+        for index in pending:
+            analyses[index] = await analyze_frame(frames[index])
+
+    async def analyze_on_spare_slot():
+        async with admission_controller.spare_slot(provider) as admitted:
+            if admitted:
+                await analyze_pending()
+
+    await asyncio.gather(analyze_pending(), *(analyze_on_spare_slot() for _ in frames[1:]))
+
+    analysis = merge_frame_analyses(list(analyses))
+    analysis["media_type"] = "video"
+    analysis["keyframes"] = [
+        {"timestamp": frame.timestamp, "sharpness": frame.sharpness}
+        for frame in keyframes
+    ]
+    return Analysis.model_validate(analysis)
@@ -0,0 +1,36 @@
+"""
+Analytics rollup backfill
+Rebuilds user_analytics and user_analytics_counts from the captions table.
+Run once after the rollup migration, before serving traffic: captions
+saved while it runs can be left out of the rebuilt totals
+"""
+import sys
+import os
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.services.analytics import rebuild_rollups
+
+def backfill_analytics():
+    """Recompute every user's analytics rollups"""
+    db = SessionLocal()
+
+    try:
+        print("Rebuilding analytics rollups...")
+        counted = rebuild_rollups(db)
+        print(f"✓ Rollups rebuilt from {counted} captions")
+
+    except Exception as e:
+        print(f"\n❌ Error rebuilding rollups: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Caption Generator - Analytics Backfill")
+    print("=" * 60)
+    backfill_analytics()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmarks of the typed Analysis model
+Per-request overhead of validating a provider response into an Analysis and
+serializing it back (response body, cache tier), next to the plain dict /
+json equivalents it replaced
+
+    python benchmarks/bench_analysis_model.py [--number 20000]
+"""
+import argparse
+import json
+import timeit
+
+import common  # noqa: F401  (settings for the app imports below)
+
+from app.schemas.schemas import Analysis
+
+RAW = {
+    "detected_objects": ["saxophone", "musician", "microphone"],
+    "instruments": ["saxophone", "piano"],
+    "musician_count": 2,
+    "scene_type": "live_performance",
+    "genre": "jazz",
+    "subgenre": "bebop",
+    "mood": "warm",
+    "lighting": "stage",
+    "dominant_colors": ["#111111", "#eeeeee"],
+    "composition_quality": "good",
+    "suggested_filters": ["Juno"],
+    "suggested_tags": ["#jazz", "#live", "#bebop", "#saxophone", "#piano", "#duo", "#nightlife"] * 2,
+    "confidence": 0.9,
+    "caption_angle": "energy",
+    "description": "A duo on stage"
+}
+
+def main(args):
+    analysis = Analysis.from_response(RAW)
+    encoded = analysis.to_json()
+    cases = [
+        ("Analysis.from_response", lambda: Analysis.from_response(RAW)),
+        ("Analysis.to_dict", analysis.to_dict),
+        ("Analysis.to_json", analysis.to_json),
+        ("json.dumps(dict)", lambda: json.dumps(RAW)),
+        ("Analysis.model_validate_json", lambda: Analysis.model_validate_json(encoded)),
+        ("json.loads", lambda: json.loads(encoded)),
+    ]
+    for name, call in cases:
+        elapsed = timeit.timeit(call, number=args.number) / args.number
+        print(f"{name:30s} {elapsed * 1e6:7.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Database concurrency benchmark: /my-captions under concurrent load
+N clients page through a user's caption history while a probe keeps
+calling a route that does not touch the database. With the async engine
+the probe stays fast; --blocking serves the same query through the sync
+Session on the event loop (how the handlers ran before), so every query
+stalls every other request on the worker
+
+    python benchmarks/bench_db_concurrency.py [--clients 32] [--pages 20] [--captions 50000] [--blocking]
+"""
+import argparse
+import asyncio
+import time
+
+from common import LoopLag, api_client, auth_headers, percentile, report
+
+from fastapi import Depends, Query
+from sqlalchemy import insert, select, tuple_
+
+from app.api.deps import get_current_user
+from app.api.pagination import decode_cursor, encode_cursor
+from app.core.database import SessionLocal, engine
+from app.main_enhanced import app
+from app.models import Caption
+
+def seed(user_id: int, count: int) -> None:
+    rows = [
+        {
+            "user_id": user_id,
+            "caption_text": f"Set {i}: late night trio 🎷 #jazz #live",
+            "detected_objects": '["saxophone", "stage"]',
+            "suggested_tags": '["#jazz", "#live"]',
+            "style": ("casual", "professional", "poetic")[i % 3]
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Caption), rows)
+
+@app.get("/bench/my-captions-blocking", include_in_schema=False)
+async def my_captions_blocking(
+    cursor: str = None,
+    limit: int = Query(50),
+    current_user=Depends(get_current_user)
+):
+    """The /my-captions query run through the sync Session inside the async handler"""
+    db = SessionLocal()
+    try:
+        query = select(Caption).where(Caption.user_id == current_user.id)
+        if cursor:
+            created_at, caption_id = decode_cursor(cursor)
+            query = query.where(
+                tuple_(Caption.created_at, Caption.id)
+                < tuple_(created_at, caption_id, types=(Caption.created_at.type, Caption.id.type))
+            )
+        captions = db.scalars(query.order_by(Caption.created_at.desc(), Caption.id.desc()).limit(limit + 1)).all()
+        next_cursor = None
+        if len(captions) > limit:
+            captions = captions[:limit]
+            next_cursor = encode_cursor(captions[-1].created_at, captions[-1].id)
+        return {"items": [{"id": c.id, "caption_text": c.caption_text} for c in captions], "next_cursor": next_cursor}
+    finally:
+        db.close()
+
+async def main(args):
+    path = "/bench/my-captions-blocking" if args.blocking else "/my-captions"
+
+    async with api_client() as client:
+        headers = await auth_headers(client)
+        user_id = (await client.get("/me", headers=headers)).json()["id"]
+        seed(user_id, args.captions)
+
+        page_latencies, probe_latencies = [], []
+        done = asyncio.Event()
+
+        async def pager():
+            cursor = None
+            for _ in range(args.pages):
+                start = time.perf_counter()
+                response = await client.get(path, params={"limit": 50, **({"cursor": cursor} if cursor else {})}, headers=headers)
+                response.raise_for_status()
+                page_latencies.append(time.perf_counter() - start)
+                cursor = response.json()["next_cursor"]
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                (await client.get("/")).raise_for_status()
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        with LoopLag() as lag:
+            probe_task = asyncio.ensure_future(probe())
+            start = time.perf_counter()
+            await asyncio.gather(*(pager() for _ in range(args.clients)))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await probe_task
+
+    mode = "blocking session" if args.blocking else "async session"
+    report(f"my-captions ({mode})", page_latencies, elapsed)
+    print(
+        f"{'probe GET /':28s} n={len(probe_latencies):4d}  p50 {percentile(probe_latencies, 50) * 1000:.1f} ms  "
+        f"p95 {percentile(probe_latencies, 95) * 1000:.1f} ms  max loop lag {lag.max_ms:.1f} ms"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--captions", type=int, default=50000)
+    parser.add_argument("--blocking", action="store_true", help="run the query through the sync Session")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""
+Image preprocessing benchmark over a fixture corpus
+For every fixture and vision profile, reports the bytes a provider call
+would send (base64) before and after prepare_image, and the time it took.
+The corpus is generated deterministically, so no large binaries are kept
+in the repo
+
+    python benchmarks/bench_image_preprocessing.py [--repeat 3]
+"""
+import argparse
+import io
+import tempfile
+import time
+
+import common  # noqa: F401  (settings for the app imports below)
+from PIL import Image
+
+from app.services.image_preprocessing import CLAUDE_VISION_PROFILE, OPENAI_VISION_PROFILE, prepare_image
+
+PROFILES = {"openai": OPENAI_VISION_PROFILE, "claude": CLAUDE_VISION_PROFILE}
+
+def _photo(size, quality=95, exif_orientation=None, fmt="JPEG", mode="RGB") -> bytes:
+    img = Image.effect_noise(size, 60).convert(mode)
+    buffer = io.BytesIO()
+    options = {"quality": quality} if fmt in ("JPEG", "WEBP") else {}
+    if exif_orientation:
+        exif = Image.Exif()
+        exif[0x0112] = exif_orientation
+        options["exif"] = exif
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+# name -> (filename, generator)
+CORPUS = {
+    "phone 12MP jpeg, rotated": ("phone.jpg", lambda: _photo((4032, 3024), exif_orientation=6)),
+    "dslr 24MP jpeg": ("dslr.jpg", lambda: _photo((6000, 4000), quality=92)),
+    "panorama jpeg": ("pano.jpg", lambda: _photo((8000, 1800), quality=90)),
+    "screenshot png with alpha": ("shot.png", lambda: _photo((1170, 2532), fmt="PNG", mode="RGBA")),
+    "small jpeg (already fits)": ("small.jpg", lambda: _photo((640, 480), quality=85)),
+    "webp": ("story.webp", lambda: _photo((1080, 1920), fmt="WEBP", quality=90)),
+}
+
+def _base64_size(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+def main(args):
+    print(f"{'fixture':28s} {'profile':7s} {'raw b64':>10s} {'sent b64':>10s} {'ratio':>6s} {'size':>11s} {'ms':>7s}")
+    totals = {name: [0, 0] for name in PROFILES}
+    for name, (filename, generate) in CORPUS.items():
+        data = generate()
+        # Uploads arrive as spooled files; decode from one like the API does
+        with tempfile.TemporaryFile() as spooled:
+            spooled.write(data)
+            for profile_name, profile in PROFILES.items():
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    spooled.seek(0)
+                    prepared = prepare_image(spooled, filename, profile)
+                elapsed = (time.perf_counter() - start) / args.repeat
+
+                raw, sent = _base64_size(len(data)), _base64_size(len(prepared.data))
+                totals[profile_name][0] += raw
+                totals[profile_name][1] += sent
+                print(
+                    f"{name:28s} {profile_name:7s} {raw / 1024:9.0f}K {sent / 1024:9.0f}K {raw / sent:6.1f} "
+                    f"{prepared.width or 0:5d}x{prepared.height or 0:<5d} {elapsed * 1000:7.1f}"
+                )
+
+    for profile_name, (raw, sent) in totals.items():
+        print(f"total {profile_name:7s} {raw / 1024 / 1024:7.1f} MB -> {sent / 1024 / 1024:5.2f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+"""
+Analysis response parsing benchmark over the messy-response corpus
+Reports the parse success rate of parse_json_object against the previous
+find('{') / rfind('}') + json.loads approach, and the time per parse for
+each corpus file (tests/fixtures/analysis_responses). For the analysis
+itself it compares parsing and validating the whole response once it has
+arrived with AnalysisStream fed in --chunk character deltas: total work,
+and the work left after the last delta
+
+    python benchmarks/bench_json_parsing.py [--number 2000] [--chunk 16]
+"""
+import argparse
+import json
+import timeit
+from pathlib import Path
+
+import common  # noqa: F401  (settings for the app imports below)
+
+from app.schemas.schemas import Analysis
+from app.services.ai_service import AnalysisStream
+from app.services.json_parsing import JSONParseError, parse_json_object
+
+CORPUS = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "analysis_responses"
+
+def previous_parser(content: str) -> dict:
+    """What _parse_analysis_response did before the tolerant parser"""
+    start = content.find('{')
+    end = content.rfind('}') + 1
+    return json.loads(content[start:end])
+
+def _parses(parse, text: str) -> bool:
+    try:
+        parse(text)
+        return True
+    except (JSONParseError, ValueError):
+        return False
+
+def _streamed(text: str, chunk: int) -> AnalysisStream:
+    stream = AnalysisStream()
+    for i in range(0, len(text), chunk):
+        stream.feed(text[i:i + chunk])
+    return stream
+
+def _us(call, number: int) -> float:
+    return timeit.timeit(call, number=number) / number * 1e6
+
+def main(args):
+    expected = json.loads((CORPUS / "expected.json").read_text(encoding="utf-8"))
+    recoverable = [name for name, value in expected.items() if value is not None]
+    new_ok = old_ok = 0
+
+    print(
+        f"{'response':26s} {'previous':>8s} {'tolerant':>8s} {'us/parse':>9s}  "
+        f"{'analysis us':>11s} {'streamed us':>11s} {'after end':>9s}"
+    )
+    for name in sorted(expected):
+        text = (CORPUS / name).read_text(encoding="utf-8")
+        old, new = _parses(previous_parser, text), _parses(parse_json_object, text)
+        old_ok += old and name in recoverable
+        new_ok += new and name in recoverable
+        parse = _us(lambda: _parses(parse_json_object, text), args.number)
+        if name not in recoverable:
+            print(f"{name:26s} {'ok' if old else '-':>8s} {'ok' if new else '-':>8s} {parse:9.1f}")
+            continue
+
+        one_shot = _us(lambda: Analysis.from_response(parse_json_object(text)), args.number)
+        streamed = _us(lambda: _streamed(text, args.chunk).result(), args.number)
+        fed = _streamed(text, args.chunk)
+        print(
+            f"{name:26s} {'ok' if old else '-':>8s} {'ok' if new else '-':>8s} {parse:9.1f}  "
+            f"{one_shot:11.1f} {streamed:11.1f} {_us(fed.result, args.number):9.1f}"
+        )
+
+    print(f"recovered {new_ok}/{len(recoverable)} (previous parser: {old_ok}/{len(recoverable)})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000, help="parses timed per response")
+    parser.add_argument("--chunk", type=int, default=16, help="characters per streamed delta")
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+Caption history pagination benchmark on a 1M-row synthetic table
+Page latency at increasing depth for the old offset pagination and the
+keyset (cursor) pagination of /my-captions, with and without the
+ix_captions_user_created_id index. The table is created from the Caption
+model's DDL in an in-memory SQLite database; one user owns every 20th row
+
+    python benchmarks/bench_pagination.py [--rows 1000000] [--page 50]
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+import common  # noqa: F401  (settings for the app imports below)
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.models import Caption
+
+DEPTHS = (0, 1_000, 10_000, 40_000)
+
+def build(rows: int) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:")
+    connection.execute(str(CreateTable(Caption.__table__).compile(dialect=sqlite.dialect())))
+    random.seed(0)
+    base = 1_700_000_000
+    connection.executemany(
+        "INSERT INTO captions (id, user_id, caption_text, created_at) VALUES (?, ?, ?, ?)",
+        (
+            (i, 1 if i % 20 == 0 else random.randint(2, 5000), "caption text",
+             time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(base + i // 3)))
+            for i in range(1, rows + 1)
+        )
+    )
+    connection.commit()
+    return connection
+
+def _ms(connection, sql: str, params: tuple, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        connection.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def run(connection, label: str, page: int) -> None:
+    for depth in DEPTHS:
+        offset = _ms(
+            connection,
+            "SELECT * FROM captions WHERE user_id = 1 ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (page, depth)
+        )
+        # The cursor a client would hold after reading `depth` rows
+        created_at, caption_id = connection.execute(
+            "SELECT created_at, id FROM captions WHERE user_id = 1 ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?",
+            (max(depth - 1, 0),)
+        ).fetchone()
+        keyset = _ms(
+            connection,
+            "SELECT * FROM captions WHERE user_id = 1 AND (created_at, id) < (?, ?) "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (created_at, caption_id, page + 1)
+        )
+        print(f"{label:10s} depth {depth:6d}: offset {offset:8.2f} ms   keyset {keyset:6.2f} ms")
+
+def main(args):
+    start = time.perf_counter()
+    connection = build(args.rows)
+    owned = connection.execute("SELECT count(*) FROM captions WHERE user_id = 1").fetchone()[0]
+    print(f"{args.rows} rows ({owned} for the paged user) built in {time.perf_counter() - start:.1f} s")
+
+    run(connection, "no index", args.page)
+    for index in Caption.__table__.indexes:
+        connection.execute(str(CreateIndex(index).compile(dialect=sqlite.dialect())))
+    run(connection, "index", args.page)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=50)
+    main(parser.parse_args())
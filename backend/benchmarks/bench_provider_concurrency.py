@@ -0,0 +1,47 @@
+"""
+Load benchmark: concurrent /ai/analyze-advanced requests
+Fires N uploads at once against fake providers with a fixed latency. With
+async clients the provider calls overlap and the wall time stays close to
+one call; --blocking simulates the old sync SDK clients, which serialize them
+
+    python benchmarks/bench_provider_concurrency.py [--requests 16] [--latency 0.5] [--blocking]
+"""
+import argparse
+import asyncio
+import time
+
+from common import FakeProviders, api_client, jpeg, report
+
+async def main(args):
+    providers = FakeProviders(latency=args.latency, blocking=args.blocking).install()
+    # Distinct images: identical uploads would be coalesced into one provider call
+    images = [jpeg((800, 600), seed=i) for i in range(args.requests + 1)]
+
+    async with api_client() as client:
+        async def one(i: int) -> float:
+            start = time.perf_counter()
+            response = await client.post(
+                "/ai/analyze-advanced",
+                params={"model": args.model},
+                files={"file": (f"photo{i}.jpg", images[i], "image/jpeg")}
+            )
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        await one(args.requests)  # warm up (imports, pools, first table access)
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    mode = "blocking clients" if args.blocking else "async clients"
+    report(f"analyze-advanced ({mode})", latencies, elapsed)
+    print(f"provider calls {providers.calls - 1}")
+    print(f"provider latency {args.latency * 1000:.0f} ms; serial lower bound {args.requests * args.latency * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake provider call")
+    parser.add_argument("--model", default="gpt-4-vision-preview")
+    parser.add_argument("--blocking", action="store_true", help="fake providers block the event loop")
+    asyncio.run(main(parser.parse_args()))
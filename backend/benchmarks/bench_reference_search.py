@@ -0,0 +1,93 @@
+"""
+Musician / venue search benchmark on synthetic data
+Seeds --rows musicians and venues (random names plus a few well-known ones),
+builds the search indexes the API builds at startup (FTS5 on SQLite,
+pg_trgm when DATABASE_URL is PostgreSQL) and times ranked searches from
+short prefixes to full names, next to the unindexed LIKE scan. The target
+is under 10 ms per query at 100k rows
+
+    python benchmarks/bench_reference_search.py [--rows 100000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+
+from common import percentile
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.models import Base, Musician, Venue
+from app.services.reference_search import LIKE, reference_search
+
+KNOWN_MUSICIANS = [("John Coltrane", "Saxophone", "Jazz"), ("Miles Davis", "Trumpet", "Jazz"), ("Joni Mitchell", "Guitar", "Folk")]
+KNOWN_VENUES = [("Blue Note", "New York", "Jazz Club"), ("New Morning", "Paris", "Jazz Club")]
+
+QUERIES = [
+    ("musicians", "jo"),  # 2-letter prefix: many matches
+    ("musicians", "coltr"),
+    ("musicians", "miles dav"),
+    ("musicians", "john coltrane"),
+    ("musicians", "sax"),  # instrument
+    ("musicians", "xyzzy"),  # no match
+    ("venues", "bl"),
+    ("venues", "new mor"),
+    ("venues", "paris"),  # city
+]
+
+def seed(rows: int) -> None:
+    random.seed(0)
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9))) for _ in range(5000)]
+    instruments = ["saxophone", "trumpet", "piano", "double bass", "drums", "guitar", "violin", "vocals"]
+    styles = ["jazz", "bebop", "fusion", "folk", "blues", "soul", "funk", "latin"]
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(Musician.__table__.insert(), [
+            {"name": name, "instrument": instrument, "style": style} for name, instrument, style in KNOWN_MUSICIANS
+        ] + [
+            {
+                "name": f"{random.choice(words).title()} {random.choice(words).title()}",
+                "instrument": random.choice(instruments),
+                "style": random.choice(styles)
+            }
+            for _ in range(rows - len(KNOWN_MUSICIANS))
+        ])
+        connection.execute(Venue.__table__.insert(), [
+            {"name": name, "city": city, "type": kind} for name, city, kind in KNOWN_VENUES
+        ] + [
+            {"name": f"{random.choice(words).title()} Club", "city": random.choice(words).title(), "type": "Club"}
+            for _ in range(rows - len(KNOWN_VENUES))
+        ])
+        reference_search.ensure_indexes(connection)
+
+async def run(backend: str, repeat: int) -> None:
+    reference_search.backend = backend
+    async with AsyncSessionLocal() as db:
+        for kind, query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results = await reference_search.search(db, kind, query, 10)
+                timings.append(time.perf_counter() - start)
+            top = results[0].name if results else "-"
+            print(
+                f"{backend:8s} {kind:9s} {query!r:16s} p50 {percentile(timings, 50) * 1000:6.2f} ms  "
+                f"p95 {percentile(timings, 95) * 1000:6.2f} ms  {len(results):2d} results, top {top!r}"
+            )
+
+def main(args):
+    start = time.perf_counter()
+    seed(args.rows)
+    indexed = reference_search.backend
+    print(f"{args.rows} musicians + {args.rows} venues seeded and indexed ({indexed}) in {time.perf_counter() - start:.1f} s")
+
+    asyncio.run(run(indexed, args.repeat))
+    if indexed != LIKE:
+        asyncio.run(run(LIKE, max(1, args.repeat // 10)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
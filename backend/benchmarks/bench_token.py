@@ -0,0 +1,79 @@
+"""
+/token throughput benchmark under concurrent logins
+N clients log in repeatedly while a probe calls a route that does no
+hashing. bcrypt runs in the bounded password pool, so logins scale with
+PASSWORD_HASH_WORKERS and the probe stays fast; --blocking verifies on the
+event loop (how login ran before), so every login stalls the worker
+
+    python benchmarks/bench_token.py [--clients 32] [--logins 4] [--rounds 12] [--workers 4] [--blocking]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# Read by app.core.config on import, so set before the harness loads the app
+_options = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+_options.add_argument("--clients", type=int, default=32)
+_options.add_argument("--logins", type=int, default=4, help="logins per client")
+_options.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS")
+_options.add_argument("--workers", type=int, default=4, help="PASSWORD_HASH_WORKERS")
+_options.add_argument("--blocking", action="store_true", help="verify passwords on the event loop")
+ARGS = _options.parse_args()
+os.environ["BCRYPT_ROUNDS"] = str(ARGS.rounds)
+os.environ["PASSWORD_HASH_WORKERS"] = str(ARGS.workers)
+
+from common import LoopLag, api_client, auth_headers, percentile, report  # noqa: E402
+
+import app.main_enhanced  # noqa: E402
+from app.core.security import pwd_context  # noqa: E402
+
+async def _verify_on_loop(plain_password, hashed_password):
+    if hashed_password is None:
+        pwd_context.dummy_verify()
+        return False, None
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def main(args):
+    if args.blocking:
+        app.main_enhanced.verify_and_update_password_async = _verify_on_loop
+
+    async with api_client() as client:
+        users = [f"user{i}" for i in range(args.clients)]
+        for username in users:
+            await auth_headers(client, username, "correct horse battery")
+
+        login_latencies, probe_latencies = [], []
+        done = asyncio.Event()
+
+        async def login(username: str):
+            for _ in range(args.logins):
+                start = time.perf_counter()
+                response = await client.post("/token", data={"username": username, "password": "correct horse battery"})
+                response.raise_for_status()
+                login_latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                (await client.get("/")).raise_for_status()
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        with LoopLag() as lag:
+            probe_task = asyncio.ensure_future(probe())
+            start = time.perf_counter()
+            await asyncio.gather(*(login(username) for username in users))
+            elapsed = time.perf_counter() - start
+            done.set()
+            await probe_task
+
+    mode = "on the loop" if args.blocking else f"pool of {args.workers}"
+    report(f"/token ({mode})", login_latencies, elapsed)
+    print(
+        f"{'probe GET /':28s} n={len(probe_latencies):4d}  p50 {percentile(probe_latencies, 50) * 1000:.1f} ms  "
+        f"p95 {percentile(probe_latencies, 95) * 1000:.1f} ms  max loop lag {lag.max_ms:.1f} ms"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main(ARGS))
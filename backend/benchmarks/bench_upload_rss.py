@@ -0,0 +1,147 @@
+"""
+Upload memory benchmark: server RSS under concurrent large uploads
+Starts the API in a separate uvicorn process with fake providers, sends N
+concurrent uploads of a ~20 MB JPEG (streamed from disk by the client) and
+samples the server's resident memory. --buffered targets a route that reads
+the upload and base64-encodes it in memory, as the handlers did before
+streaming ingestion
+
+    python benchmarks/bench_upload_rss.py [--uploads 20] [--megabytes 20] [--buffered]
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+def _rss_mb(pid: int, field: str = "VmRSS") -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(port: int) -> None:
+    # Uploads are decoded one CPU-bound image at a time; queue instead of shedding them
+    os.environ.setdefault("ADMISSION_QUEUE_TIMEOUT_SECONDS", "300")
+    from common import FakeProviders
+
+    import uvicorn
+    from fastapi import File, UploadFile
+
+    from app.main_enhanced import app
+
+    FakeProviders(latency=0.5).install()
+
+    @app.post("/bench/analyze-buffered", include_in_schema=False)
+    async def analyze_buffered(file: UploadFile = File(...)):
+        """The old ingestion: whole upload in memory plus its base64 copy"""
+        content = await file.read()
+        encoded = base64.b64encode(content).decode("utf-8")
+        await asyncio.sleep(0.5)
+        return {"bytes": len(content), "encoded": len(encoded)}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+def _photo(path: str, megabytes: int) -> None:
+    """A decodable JPEG of about the requested size"""
+    from PIL import Image
+
+    side = int((megabytes * 1024 * 1024 / 1.3) ** 0.5)
+    img = Image.effect_noise((side * 4 // 3, side * 3 // 4), 80).convert("RGB")
+    img.save(path, "JPEG", quality=98)
+
+class _Concat(io.RawIOBase):
+    """Read-only concatenation of file objects (streamed by httpx, never joined in memory)"""
+    def __init__(self, *parts):
+        self.parts = list(parts)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.parts:
+            data = self.parts[0].read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self.parts.pop(0)
+        return 0
+
+async def run(args, port: int, pid: int, path: str) -> None:
+    import httpx
+
+    route = "/bench/analyze-buffered" if args.buffered else "/ai/analyze-advanced"
+    samples = []
+    done = asyncio.Event()
+
+    async def sample():
+        while not done.is_set():
+            samples.append(_rss_mb(pid))
+            await asyncio.sleep(0.02)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+        async def upload(i: int):
+            with open(path, "rb") as photo:
+                # Distinct trailing bytes (ignored by decoders) so uploads are not coalesced
+                tail = io.BytesIO(f"upload-{i}".encode())
+                body = _Concat(photo, tail)
+                response = await client.post(route, files={"file": (f"photo{i}.jpg", body, "image/jpeg")})
+                response.raise_for_status()
+
+        idle = _rss_mb(pid)
+        sampler = asyncio.ensure_future(sample())
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(i) for i in range(args.uploads)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await sampler
+
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    mode = "buffered" if args.buffered else "streamed"
+    print(
+        f"{mode}: {args.uploads} x {size_mb:.1f} MB in {elapsed:.1f} s  "
+        f"RSS idle {idle:.0f} MB, peak {max(samples):.0f} MB (+{max(samples) - idle:.0f} MB), "
+        f"high-water {_rss_mb(pid, 'VmHWM'):.0f} MB"
+    )
+
+def main(args) -> None:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "photo.jpg")
+        _photo(path, args.megabytes)
+
+        server = subprocess.Popen([sys.executable, __file__, "--serve", str(port)], cwd=os.path.dirname(__file__))
+        try:
+            for _ in range(200):
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            asyncio.run(run(args, port, server.pid, path))
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--megabytes", type=int, default=20)
+    parser.add_argument("--buffered", action="store_true", help="read uploads into memory like the old handlers")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.serve:
+        serve(options.serve)
+    else:
+        main(options)
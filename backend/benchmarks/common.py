@@ -0,0 +1,168 @@
+"""
+Benchmark harness
+Runs the API in-process against a throwaway SQLite database and fake AI
+providers with a configurable latency; these variables are read when
+app.core.config is first imported, so import this module first
+"""
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+os.environ.setdefault("ANALYSIS_CACHE_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Load generators are one client: measure the service, not the per-user limits
+os.environ.setdefault("ADMISSION_USER_RATE_PER_MINUTE", "1000000")
+os.environ.setdefault("ADMISSION_USER_BURST", "1000000")
+
+ANALYSIS = {
+    "detected_objects": ["saxophone", "microphone", "stage lights"],
+    "instruments": ["saxophone", "piano"],
+    "musician_count": 2,
+    "scene_type": "live_performance",
+    "genre": "jazz",
+    "mood": "warm",
+    "suggested_tags": ["#jazz", "#live", "#saxophone"],
+    "confidence": 0.9
+}
+CAPTION = "Late set, warm room 🎷 #jazz #live"
+
+def _is_vision(messages) -> bool:
+    return any(isinstance(message.get("content"), list) for message in messages)
+
+def _deltas(text: str, size: int = 16) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+async def _stream(events):
+    for event in events:
+        yield event
+
+class FakeProviders:
+    """
+    Stand-ins for the OpenAI and Anthropic create() methods
+    blocking=True sleeps with time.sleep, the way the sync SDK clients held
+    the event loop before the async provider layer
+    """
+    def __init__(self, latency: float = 0.5, blocking: bool = False):
+        self.latency = latency
+        self.blocking = blocking
+        self.calls = 0
+
+    async def _wait(self):
+        self.calls += 1
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+    async def openai(self, **kwargs):
+        await self._wait()
+        text = json.dumps(ANALYSIS) if _is_vision(kwargs["messages"]) else CAPTION
+        if kwargs.get("stream"):
+            return _stream([
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+                for part in _deltas(text)
+            ])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20)
+        )
+
+    async def claude(self, **kwargs):
+        await self._wait()
+        messages = kwargs["messages"]
+        text = json.dumps(ANALYSIS) if _is_vision(messages) else CAPTION
+        if messages[-1]["role"] == "assistant":
+            # Prefilled response: the provider continues after the prefill
+            text = text[len(messages[-1]["content"]):]
+        usage = SimpleNamespace(input_tokens=100, output_tokens=20)
+        if kwargs.get("stream"):
+            return _stream(
+                [SimpleNamespace(type="message_start", message=SimpleNamespace(usage=usage))]
+                + [SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=part)) for part in _deltas(text)]
+                + [SimpleNamespace(type="message_delta", usage=usage)]
+            )
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage)
+
+    def install(self) -> "FakeProviders":
+        from app.services import ai_clients
+        ai_clients.openai_client.chat.completions.create = self.openai
+        ai_clients.claude_client.messages.create = self.claude
+        return self
+
+def jpeg(size=(1024, 768), seed: int = 0, quality: int = 90) -> bytes:
+    """A noisy JPEG (noise keeps the encoded size realistic for a photo)"""
+    from PIL import Image
+    random.seed(seed)
+    img = Image.effect_noise(size, 40 + seed % 20).convert("RGB")
+    img = Image.merge("RGB", [band.point(lambda v, s=random.randint(0, 80): min(255, v + s)) for band in img.split()])
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+@asynccontextmanager
+async def api_client():
+    """httpx client calling the app in this process and on this event loop"""
+    import httpx
+    from app.main_enhanced import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        yield client
+
+async def auth_headers(client, username: str = "bench", password: str = "bench-password") -> dict:
+    # 400 when the user already exists; the login below still works
+    await client.post("/register", json={"email": f"{username}@example.com", "username": username, "password": password})
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+class LoopLag:
+    """Samples how late the event loop wakes a sleeping task (blocked loop = large lag)"""
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(loop.time() - start - self.interval)
+
+    def __enter__(self) -> "LoopLag":
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    @property
+    def max_ms(self) -> float:
+        return max(self.samples, default=0.0) * 1000
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def report(label: str, latencies: List[float], elapsed: float) -> None:
+    print(
+        f"{label:28s} n={len(latencies):4d}  wall {elapsed * 1000:8.1f} ms  "
+        f"p50 {percentile(latencies, 50) * 1000:8.1f} ms  p95 {percentile(latencies, 95) * 1000:8.1f} ms  "
+        f"{len(latencies) / elapsed:7.1f} req/s"
+    )
@@ -0,0 +1,15 @@
+"""
+Test settings
+Tests run against a throwaway SQLite database and fake AI providers; these
+variables are read when app.core.config is first imported
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+os.environ.setdefault("ANALYSIS_CACHE_ENABLED", "false")
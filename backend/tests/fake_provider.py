@@ -0,0 +1,87 @@
+"""
+Local fake AI provider
+Stands in for an SDK create() method: plays back a script of responses and
+errors, optionally after a delay, and counts calls and cancellations.
+Responses are streamed in small chunks when the call asks for stream=True
+"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+import anthropic
+import httpx
+import openai
+from PIL import Image
+
+SDK_ERRORS = {"openai": openai, "anthropic": anthropic}
+
+def _request(provider: str) -> httpx.Request:
+    return httpx.Request("POST", f"https://{provider}.test/v1")
+
+def connection_error(provider: str) -> Exception:
+    return SDK_ERRORS[provider].APIConnectionError(request=_request(provider))
+
+def status_error(provider: str, status_code: int, headers: dict = None) -> Exception:
+    response = httpx.Response(status_code, headers=headers, request=_request(provider))
+    return SDK_ERRORS[provider].APIStatusError(f"HTTP {status_code}", response=response, body=None)
+
+def openai_response(text: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20)
+    )
+
+def claude_response(text: str):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=100, output_tokens=20)
+    )
+
+async def _events(events):
+    for event in events:
+        await asyncio.sleep(0)
+        yield event
+
+def _chunks(text: str, size: int = 7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def as_stream(response, size: int = 7):
+    """The streamed form of an openai_response / claude_response"""
+    if hasattr(response, "choices"):
+        return _events([
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+            for part in _chunks(response.choices[0].message.content, size)
+        ])
+    return _events(
+        [SimpleNamespace(type="message_start", message=SimpleNamespace(usage=response.usage))]
+        + [
+            SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=part))
+            for part in _chunks(response.content[0].text, size)
+        ]
+        + [SimpleNamespace(type="message_delta", usage=response.usage)]
+    )
+
+def jpeg(size=(64, 48), color=(120, 20, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+class FakeProvider:
+    def __init__(self, *script, default=None, delay: float = 0.0):
+        self.script = list(script)
+        self.default = default
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, *args, **kwargs):
+        self.calls += 1
+        step = self.script.pop(0) if self.script else self.default
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(step, BaseException):
+            raise step
+        return as_stream(step) if kwargs.get("stream") else step
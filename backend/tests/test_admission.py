@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from app.api import admission as admission_api
+from app.api.admission import AdmissionControlMiddleware, request_providers
+from app.schemas.schemas import Analysis
+from app.services import video_keyframes
+from app.services.admission import AdmissionController, AdmissionRejected, MemoryAdmissionState
+from app.services.image_preprocessing import MediaPayload
+
+def _controller(**limits) -> AdmissionController:
+    options = dict(max_in_flight=1, max_queue=4, queue_timeout=0.2, rate_per_minute=600, burst=10)
+    options.update(limits)
+    return AdmissionController(MemoryAdmissionState(), **options)
+
+def test_compare_models_takes_one_slot_per_model():
+    assert request_providers("/ai/compare-models", {}) == ["anthropic", "openai"]
+    query = {"models": ["claude-3-5-sonnet-20241022", "claude-3-5-haiku-20241022", "claude-3-5-haiku-20241022"]}
+    assert request_providers("/ai/compare-models", query) == ["anthropic", "anthropic"]
+
+def test_sequential_phases_share_a_slot():
+    assert request_providers("/analyze-and-generate", {}) == ["openai"]
+    query = {"analysis_model": ["claude-3-5-haiku-20241022"], "caption_model": ["gpt-4"]}
+    assert request_providers("/ai/analyze-and-generate-pro", query) == ["anthropic", "openai"]
+    assert request_providers("/musicians", {}) == []
+
+def test_concurrent_calls_on_one_provider_need_free_slots():
+    async def scenario():
+        controller = _controller(max_in_flight=2)
+        leases = await controller.acquire("user:a", ["anthropic", "anthropic"])
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("user:b", ["anthropic"])
+        await controller.release(leases)
+        return await controller.state.in_flight("anthropic")
+
+    assert asyncio.run(scenario()) == 0
+
+def test_background_slots_share_the_in_flight_cap():
+    async def scenario():
+        controller = _controller()
+        leases = await controller.acquire("user:a", ["openai"])
+        entered = asyncio.Event()
+
+        async def batch_item():
+            async with controller.background_slot("openai"):
+                entered.set()
+                # Interactive requests see the slot as taken
+                with pytest.raises(AdmissionRejected):
+                    await controller.acquire("user:b", ["openai"])
+
+        item = asyncio.ensure_future(batch_item())
+        await asyncio.sleep(0.05)
+        assert not entered.is_set()  # waits for the request's slot instead of exceeding the cap
+        await controller.release(leases)
+        await asyncio.wait_for(item, 2)
+        return await controller.state.in_flight("openai")
+
+    assert asyncio.run(scenario()) == 0
+
+def test_background_slots_yield_to_queued_requests():
+    async def scenario():
+        controller = _controller(queue_timeout=2)
+        leases = await controller.acquire("user:a", ["openai"])
+        order = []
+
+        async def batch_item():
+            async with controller.background_slot("openai"):
+                order.append("batch")
+
+        async def request():
+            request_leases = await controller.acquire("user:b", ["openai"])
+            order.append("request")
+            await asyncio.sleep(0.05)
+            await controller.release(request_leases)
+
+        item = asyncio.ensure_future(batch_item())
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(request())
+        await asyncio.sleep(0.01)
+        await controller.release(leases)
+        await asyncio.wait_for(asyncio.gather(item, queued), 2)
+        return order
+
+    assert asyncio.run(scenario()) == ["request", "batch"]
+
+def test_batch_job_creation_is_rate_limited(monkeypatch):
+    monkeypatch.setattr(admission_api, "admission_controller", _controller(rate_per_minute=1, burst=1))
+    statuses = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 202, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    async def scenario():
+        middleware = AdmissionControlMiddleware(app)
+        scope = {
+            "type": "http", "method": "POST", "path": "/batch/jobs", "query_string": b"",
+            "headers": [], "client": ("10.0.0.1", 1234)
+        }
+        for _ in range(2):
+            await middleware(scope, None, send)
+
+    asyncio.run(scenario())
+    assert statuses == [202, 429]
+
+def test_video_keyframes_only_use_spare_slots_beyond_their_own(monkeypatch):
+    frames = [video_keyframes.Keyframe(timestamp=float(i), data=b"jpeg", sharpness=1.0) for i in range(5)]
+
+    async def extract(payload):
+        return frames
+
+    async def scenario():
+        controller = _controller(max_in_flight=2)
+        monkeypatch.setattr(video_keyframes, "admission_controller", controller)
+        monkeypatch.setattr(video_keyframes, "extract_keyframes_async", extract)
+        leases = await controller.acquire("user:a", ["openai"])  # the video request's own slot
+        running, peak = 0, 0
+
+        async def analyze_frame(frame):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return Analysis(genre="jazz")
+
+        analysis = await video_keyframes.analyze_video(MediaPayload(b"video", "set.mp4"), analyze_frame, "openai")
+        await controller.release(leases)
+        return analysis, peak, await controller.state.in_flight("openai")
+
+    analysis, peak, in_flight = asyncio.run(scenario())
+    assert len(analysis.keyframes) == 5
+    assert peak == 2  # the request's slot plus the one spare slot
+    assert in_flight == 0
@@ -0,0 +1,34 @@
+import asyncio
+
+import httpx
+
+from app.core.database import AsyncSessionLocal
+from app.main_enhanced import app
+from app.services.caption_store import save_captions
+
+def test_analytics_entries_have_the_shape_the_dashboard_reads():
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            user = {"email": "analytics@example.com", "username": "analytics", "password": "analytics-password"}
+            user_id = (await client.post("/register", json=user)).json()["id"]
+            token = (await client.post("/token", data={"username": "analytics", "password": "analytics-password"})).json()
+
+            async with AsyncSessionLocal() as db:
+                await save_captions(db, [
+                    {"user_id": user_id, "caption_text": "Late set #jazz", "style": "casual", "venue": "Blue Note", "language": "en"},
+                    {"user_id": user_id, "caption_text": "Encore #jazz #live", "style": "casual", "venue": "Blue Note", "language": "fr"},
+                    {"user_id": user_id, "caption_text": "Soundcheck", "style": "poetic", "venue": "New Morning", "language": "fr"}
+                ])
+                await db.commit()
+
+            response = await client.get("/analytics", headers={"Authorization": f"Bearer {token['access_token']}"})
+            response.raise_for_status()
+            return response.json()
+
+    analytics = asyncio.run(scenario())
+    assert analytics["total_captions_generated"] == 3
+    assert analytics["total_hashtags_used"] == 3
+    assert analytics["most_used_styles"] == [{"style": "casual", "count": 2}, {"style": "poetic", "count": 1}]
+    assert analytics["top_venues"] == [{"name": "Blue Note", "count": 2}, {"name": "New Morning", "count": 1}]
+    assert analytics["languages"] == [{"language": "fr", "count": 2}, {"language": "en", "count": 1}]
@@ -0,0 +1,31 @@
+import asyncio
+
+import httpx
+from passlib.hash import bcrypt
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.main_enhanced import app
+from app.models.models import User
+
+def test_inactive_user_is_rejected_before_the_rehash():
+    # A hash made with another cost, which a successful login would rewrite
+    old_hash = bcrypt.using(rounds=4 if settings.BCRYPT_ROUNDS != 4 else 5).hash("inactive-password")
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            user = User(email="inactive@example.com", username="inactive", hashed_password=old_hash, is_active=False)
+            db.add(user)
+            await db.commit()
+            user_id = user.id
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/token", data={"username": "inactive", "password": "inactive-password"})
+
+        async with AsyncSessionLocal() as db:
+            return response, (await db.get(User, user_id)).hashed_password
+
+    response, stored_hash = asyncio.run(scenario())
+    assert response.status_code == 400
+    assert stored_hash == old_hash
@@ -0,0 +1,72 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from app.schemas.schemas import Analysis
+from app.services import ai_clients
+from app.services.ai_service import AIModel, AnalysisStream, multi_model_ai_service
+from app.services.json_parsing import JSONParseError, parse_json_object
+from app.services.resilience import breakers
+
+from fake_provider import FakeProvider, claude_response, jpeg, openai_response
+
+# Regression corpus of messy model responses; expected.json holds what each
+# one parses to (null: no object can be recovered)
+CORPUS = Path(__file__).parent / "fixtures" / "analysis_responses"
+EXPECTED = json.loads((CORPUS / "expected.json").read_text(encoding="utf-8"))
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_corpus(name):
+    text = (CORPUS / name).read_text(encoding="utf-8")
+    if EXPECTED[name] is None:
+        with pytest.raises(JSONParseError):
+            parse_json_object(text)
+    else:
+        assert parse_json_object(text) == EXPECTED[name]
+
+def test_every_corpus_file_has_an_expectation():
+    assert {path.name for path in CORPUS.glob("*.txt")} == set(EXPECTED)
+
+def test_truncated_response_keeps_completed_fields():
+    analysis = Analysis.from_response(parse_json_object((CORPUS / "truncated_after_key.txt").read_text(encoding="utf-8")))
+    assert analysis.genre == "jazz"
+    assert analysis.musician_count == 2
+    assert not analysis.failed
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_corpus_streamed(name, size):
+    text = (CORPUS / name).read_text(encoding="utf-8")
+    stream = AnalysisStream()
+    for i in range(0, len(text), size):
+        stream.feed(text[i:i + size])
+    if EXPECTED[name] is None:
+        with pytest.raises(JSONParseError):
+            stream.result()
+    else:
+        assert stream.result() == Analysis.from_response(EXPECTED[name])
+
+def test_fields_are_validated_as_they_arrive():
+    text = (CORPUS / "clean.txt").read_text(encoding="utf-8")
+    stream = AnalysisStream()
+    stream.feed(text[:text.index('"suggested_tags"')])
+    assert stream.fields["musician_count"] == 2
+    assert stream.fields["description"] == 'A {bright} night, with "quotes"'
+    assert "suggested_tags" not in stream.fields
+
+@pytest.mark.parametrize("model", [AIModel.GPT4_VISION, AIModel.CLAUDE_HAIKU])
+def test_provider_analysis_is_parsed_from_the_stream(model, monkeypatch):
+    text = (CORPUS / "trailing_commas.txt").read_text(encoding="utf-8")
+    if model.provider == "openai":
+        provider = FakeProvider(default=openai_response(text))
+        monkeypatch.setattr(ai_clients.openai_client.chat.completions, "create", provider)
+    else:
+        # Claude continues the prefilled "{"
+        provider = FakeProvider(default=claude_response(text[text.index("{") + 1:]))
+        monkeypatch.setattr(ai_clients.claude_client.messages, "create", provider)
+    breakers[model.provider].record_success()
+
+    analysis = asyncio.run(multi_model_ai_service.analyze_image_with_model(jpeg(), "set.jpg", model))
+    assert analysis == Analysis.from_response(EXPECTED["trailing_commas.txt"])
@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from app.core.metrics import add_call_observer
+from app.services import ai_clients
+from app.services.ai_service import AIModel
+from app.services.image_preprocessing import MediaPayload
+from app.services.model_router import ANALYZE, ModelRouter
+from app.services.resilience import breakers
+
+from fake_provider import FakeProvider, claude_response, jpeg, openai_response
+
+ANALYSIS = {"genre": "jazz", "instruments": ["saxophone"], "suggested_tags": ["#jazz"], "confidence": 0.9}
+
+def _router() -> ModelRouter:
+    router = ModelRouter()
+    add_call_observer(router.observe)
+    return router
+
+def test_timed_out_attempt_is_cancelled_and_recorded_once(monkeypatch):
+    hanging = FakeProvider(default=claude_response(json.dumps(ANALYSIS)[1:]), delay=10)
+    answering = FakeProvider(default=openai_response(json.dumps(ANALYSIS)))
+    monkeypatch.setattr(ai_clients.claude_client.messages, "create", hanging)
+    monkeypatch.setattr(ai_clients.openai_client.chat.completions, "create", answering)
+    for breaker in breakers.values():
+        breaker.record_success()
+
+    router = _router()
+    payload = MediaPayload(jpeg(), "gig.jpg")
+    analysis, decision = asyncio.run(router.route_analysis(payload, "gig.jpg", latency_budget_ms=200))
+
+    # Haiku ran over the budget and failed over to the other provider
+    assert [attempt["status"] for attempt in decision["attempts"]] == ["timeout", "ok"]
+    assert decision["selected"] == AIModel.GPT4_VISION.value
+    assert analysis.genre == "jazz"
+
+    # The abandoned provider call was cancelled rather than left running
+    assert hanging.calls == 1
+    assert hanging.cancelled == 1
+
+    # One failed sample for the timeout (from the call observer), one ok sample for the answer
+    haiku = router._stats[(ANALYZE, AIModel.CLAUDE_HAIKU)]
+    assert len(haiku._samples) == 1
+    assert haiku.error_rate == 1.0
+    assert len(router._stats[(ANALYZE, AIModel.GPT4_VISION)]._samples) == 1
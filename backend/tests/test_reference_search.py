@@ -0,0 +1,23 @@
+import asyncio
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.models import Base, Musician
+from app.services import reference_search as search_module
+from app.services.reference_search import FTS5, reference_search
+
+def test_name_prefix_ranks_first_beyond_the_candidate_cap(monkeypatch):
+    monkeypatch.setattr(search_module, "RANK_CANDIDATES", 5)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(Musician.__table__.insert(), [
+            {"name": f"Player {i}", "instrument": "Saxophone", "style": "Jazz"} for i in range(20)
+        ] + [{"name": "Saxon Grey", "instrument": "Piano", "style": "Jazz"}])
+        assert reference_search.ensure_indexes(connection) == FTS5
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await reference_search.search(db, "musicians", "sax", 10)
+
+    results = asyncio.run(scenario())
+    assert results[0].name == "Saxon Grey"
+    assert len(results) == 6  # the name match and the capped instrument matches
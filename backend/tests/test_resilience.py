@@ -0,0 +1,128 @@
+import asyncio
+import random
+
+import pytest
+
+from app.core.config import settings
+from app.services import ai_clients, resilience
+from app.services.ai_service import AIModel, multi_model_ai_service
+from app.services.openai_service import openai_service
+from app.services.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, backoff_delay, call_provider
+)
+
+from fake_provider import FakeProvider, connection_error, jpeg, openai_response, status_error
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_MAX_SECONDS", 0.01)
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A fresh openai breaker opening after 3 consecutive failures"""
+    fresh = CircuitBreaker("openai", failure_threshold=3, recovery_seconds=0.05)
+    monkeypatch.setitem(resilience.breakers, "openai", fresh)
+    return fresh
+
+def test_transient_errors_are_retried(breaker):
+    provider = FakeProvider(connection_error("openai"), status_error("openai", 503), default="ok")
+
+    assert asyncio.run(call_provider("openai", provider)) == "ok"
+    assert provider.calls == 3
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_BASE_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_MAX_SECONDS", 8)
+    random.seed(7)
+
+    delays = [backoff_delay(2) for _ in range(200)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 100
+    assert all(backoff_delay(10) <= 8 for _ in range(50))
+
+def test_short_retry_after_is_honoured(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_RETRY_MAX_SECONDS", 8)
+    assert backoff_delay(0, status_error("openai", 429, {"retry-after": "3"})) == 3.0
+
+@pytest.mark.parametrize("status_code", [400, 401, 404, 422])
+def test_client_errors_are_not_retried(breaker, status_code):
+    provider = FakeProvider(default=status_error("openai", status_code))
+
+    with pytest.raises(Exception) as raised:
+        asyncio.run(call_provider("openai", provider))
+    assert raised.value.status_code == status_code
+    assert provider.calls == 1
+    assert breaker.consecutive_failures == 0
+
+def test_rate_limits_are_retried(breaker):
+    provider = FakeProvider(status_error("openai", 429), default="ok")
+
+    assert asyncio.run(call_provider("openai", provider)) == "ok"
+    assert provider.calls == 2
+
+def test_breaker_opens_after_threshold_and_fails_fast(breaker):
+    provider = FakeProvider(default=connection_error("openai"))
+
+    with pytest.raises(Exception):
+        asyncio.run(call_provider("openai", provider))
+    assert provider.calls == 3
+    assert breaker.state == OPEN
+
+    # While open, calls are refused without reaching the provider
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_provider("openai", provider))
+    assert provider.calls == 3
+
+def test_half_open_allows_one_probe_and_closes_on_success(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        probe = FakeProvider(default="ok", delay=0.05)
+        first = asyncio.ensure_future(call_provider("openai", probe))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN
+        # Only one trial call at a time while half-open
+        with pytest.raises(CircuitOpenError):
+            await call_provider("openai", probe)
+        return await first, probe.calls
+
+    assert asyncio.run(scenario()) == ("ok", 1)
+    assert breaker.state == CLOSED
+
+def test_failed_probe_reopens(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        probe = FakeProvider(default=connection_error("openai"))
+        with pytest.raises(Exception):
+            await call_provider("openai", probe)
+        return probe.calls
+
+    # A failed trial reopens at once instead of retrying
+    assert asyncio.run(scenario()) == 1
+    assert breaker.state == OPEN
+
+def test_legacy_openai_service_shares_the_openai_breaker(breaker, monkeypatch):
+    provider = FakeProvider(default=connection_error("openai"))
+    monkeypatch.setattr(ai_clients.openai_client.chat.completions, "create", provider)
+
+    # One legacy call and its retries trip the provider-wide breaker...
+    legacy = asyncio.run(openai_service.analyze_image(jpeg(), "gig.jpg"))
+    assert legacy.failed
+    assert breaker.state == OPEN
+    calls = provider.calls
+
+    # ...so the multi-model OpenAI route falls back without calling the provider
+    provider.default = openai_response('{"genre": "jazz"}')
+    analysis = asyncio.run(multi_model_ai_service.analyze_image_with_model(jpeg(), "gig.jpg", AIModel.GPT4_VISION))
+    assert analysis.failed
+    assert provider.calls == calls
@@ -0,0 +1,89 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": 1}
+
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "cancelled": 0, "in_flight": 0}
+
+def test_cancelling_one_caller_keeps_the_call_for_the_others():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("k", fn))
+        follower = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return flight, await follower, leader.cancelled()
+
+    flight, result, leader_cancelled = asyncio.run(scenario())
+    assert result == "done"
+    assert leader_cancelled
+    assert flight.cancelled == 0
+
+def test_last_caller_going_away_cancels_the_call():
+    async def scenario():
+        flight = SingleFlight()
+        started, stopped = asyncio.Event(), asyncio.Event()
+
+        async def fn():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        callers = [asyncio.ensure_future(flight.do("k", fn)) for _ in range(2)]
+        await started.wait()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(stopped.wait(), 1)
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert flight.stats()["cancelled"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+def test_timeout_cancels_the_call():
+    async def scenario():
+        flight = SingleFlight()
+        stopped = asyncio.Event()
+
+        async def fn():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        try:
+            await asyncio.wait_for(flight.do("k", fn), 0.01)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.wait_for(stopped.wait(), 1)
+
+        # The key is free again: the next caller starts a fresh call
+        async def again():
+            return "fresh"
+        return await flight.do("k", again)
+
+    assert asyncio.run(scenario()) == "fresh"
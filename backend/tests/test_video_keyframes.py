@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from app.services import video_keyframes
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+def _video(path, frames=60, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 25, size)
+    for index in range(frames):
+        # Two scenes of different colours
+        colour = (200, 40, 40) if index < frames // 2 else (40, 40, 200)
+        frame = np.full((size[1], size[0], 3), colour, dtype=np.uint8)
+        cv2.putText(frame, str(index), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+def test_keyframes_one_per_scene(tmp_path):
+    keyframes = video_keyframes.extract_keyframes(_video(tmp_path / "gig.avi"), sampled_frames=20)
+    assert len(keyframes) == 2
+    assert keyframes[0].timestamp < keyframes[1].timestamp
+
+def test_extraction_stops_at_its_deadline(tmp_path):
+    with pytest.raises(TimeoutError):
+        video_keyframes.extract_keyframes(_video(tmp_path / "gig.avi"), deadline=time.time() - 1)
+
+def test_recycling_terminates_stuck_workers():
+    executor = video_keyframes._get_executor()
+    stuck = executor.submit(time.sleep, 60)
+    while not stuck.running():
+        time.sleep(0.05)
+    processes = list(executor._processes.values())
+
+    video_keyframes._recycle_executor()
+    for process in processes:
+        process.join(10)
+    assert not any(process.is_alive() for process in processes)
+    # The next extraction gets a fresh pool
+    assert video_keyframes._get_executor() is not executor
+    video_keyframes.shutdown_video_workers()